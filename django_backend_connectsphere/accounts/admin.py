@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import User, Role
+from .cache import invalidate_cached_users
+from .autocomplete import publish_user_change, user_entry
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -28,7 +30,12 @@ class CustomUserAdmin(UserAdmin):
     )
 
     def approve_users(self, request, queryset):
+        user_ids = list(queryset.values_list('id', flat=True))
         queryset.update(is_approved=True)
+        invalidate_cached_users(user_ids)
+        # update() skips the post_save signal that feeds the picker index.
+        for user in User.objects.filter(id__in=user_ids):
+            publish_user_change(user_entry(user))
     approve_users.short_description = "Mark selected users as approved"
 
     def get_queryset(self, request):
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from . import signals
+        pre_migrate.connect(signals.enable_trigram_extension, sender=self)
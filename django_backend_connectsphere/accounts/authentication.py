@@ -0,0 +1,84 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from connectsphere_backend.routers import PRIMARY, ause_primary_if_pinned, use_primary_if_pinned
+from .cache import acache_user, aget_cached_user, cache_user, get_cached_user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads the user, with their role, from the cache
+    and only falls back to the database on a miss. User.save() and
+    Role.save() clear the entries they affect once committed. Without a
+    shared cache (REDIS_URL) it reads the database every time. Also keeps the user's reads
+    on the primary if they wrote recently (see connectsphere_backend/routers.py).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            try:
+                # From the primary so a replica can't put a stale copy back
+                # into the cache right after User.save() cleared it.
+                user = self.user_model.objects.using(PRIMARY).select_related('role').get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache_user(user)
+
+        use_primary_if_pinned(user.pk)
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        # authenticate() for async views; the token checks need no I/O.
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = await aget_cached_user(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.using(PRIMARY).select_related('role').aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            await acache_user(user)
+
+        await ause_primary_if_pinned(user.pk)
+        return self.check_user(user, validated_token)
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,211 @@
+import bisect
+import logging
+import os
+import threading
+import time
+import unicodedata
+from array import array
+import orjson
+import redis
+from django.db import close_old_connections
+from connectsphere_backend.redis_client import redis_client
+from connectsphere_backend.renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+# Every worker keeps its own copy of the picker index, built from the
+# database when the worker starts and then updated from the user changes
+# published on this channel (by the User signals in accounts/signals.py).
+USER_CHANGES_CHANNEL = 'users:changed'
+
+
+def normalise(text):
+    # Case and accent insensitive: 'Zoë' and 'ZOE' both become 'zoe'.
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold().strip()
+
+
+def user_entry(user):
+    # What the index needs to know about a user, as published on the channel.
+    return {
+        'id': user.pk,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+        'profile_picture': user.profile_picture.name if user.profile_picture else '',
+        'pickable': user.is_active and user.is_approved and not user.is_deleted,
+    }
+
+
+class PrefixIndex:
+    """
+    Normalised first name, last name, full name and email local part of
+    every pickable user, kept sorted in a list next to an array of the
+    matching user ids. The keys starting with a prefix are one bisect away
+    and sit next to each other.
+    """
+
+    def __init__(self, entries=()):
+        self.lock = threading.Lock()
+        self.users = {}
+        pairs = []
+        for entry in entries:
+            if entry['pickable']:
+                record = self._record(entry)
+                self.users[entry['id']] = record
+                pairs.extend((key, entry['id']) for key in self._keys(record))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.ids = array('q', (user_id for _, user_id in pairs))
+
+    def __len__(self):
+        return len(self.users)
+
+    @staticmethod
+    def _record(entry):
+        return (entry['first_name'], entry['last_name'], entry['email'], entry['profile_picture'])
+
+    @staticmethod
+    def _keys(record):
+        first_name, last_name, email, _ = record
+        keys = {
+            normalise(first_name),
+            normalise(last_name),
+            normalise(f'{first_name} {last_name}'),
+            normalise(email.partition('@')[0]),
+        }
+        keys.discard('')
+        return keys
+
+    def search(self, prefix, limit=10, exclude=None):
+        prefix = normalise(prefix)
+        if not prefix:
+            return []
+
+        found = []
+        with self.lock:
+            i = bisect.bisect_left(self.keys, prefix)
+            while i < len(self.keys) and len(found) < limit and self.keys[i].startswith(prefix):
+                user_id = self.ids[i]
+                if user_id != exclude and user_id not in found:
+                    found.append(user_id)
+                i += 1
+            return [(user_id, self.users[user_id]) for user_id in found]
+
+    def update(self, entry):
+        with self.lock:
+            self._remove(entry['id'])
+            if entry.get('pickable'):
+                record = self._record(entry)
+                self.users[entry['id']] = record
+                for key in self._keys(record):
+                    i = bisect.bisect_right(self.keys, key)
+                    self.keys.insert(i, key)
+                    self.ids.insert(i, entry['id'])
+
+    def _remove(self, user_id):
+        record = self.users.pop(user_id, None)
+        if record is None:
+            return
+        for key in self._keys(record):
+            i = bisect.bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key:
+                if self.ids[i] == user_id:
+                    del self.keys[i]
+                    del self.ids[i]
+                    break
+                i += 1
+
+
+def build_index():
+    from .models import User
+
+    users = User.objects.filter(is_active=True, is_approved=True, is_deleted=False).only(
+        'id', 'first_name', 'last_name', 'email', 'profile_picture',
+        'is_active', 'is_approved', 'is_deleted'
+    )
+    return PrefixIndex(user_entry(user) for user in users.iterator(chunk_size=5000))
+
+
+def publish_user_change(entry):
+    try:
+        redis_client.publish(USER_CHANGES_CHANNEL, dumps(entry))
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Publishing user change failed: {e}")
+
+
+def publish_user_changes(entries):
+    # For bulk writes, which skip the post_save signal.
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for entry in entries:
+            pipe.publish(USER_CHANGES_CHANNEL, dumps(entry))
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Publishing user changes failed: {e}")
+
+
+_index = None
+_ready = threading.Event()
+_started_pid = None
+_start_lock = threading.Lock()
+
+
+def _load():
+    global _index
+    try:
+        _index = build_index()
+    finally:
+        close_old_connections()
+    _ready.set()
+
+
+def _listen():
+    backoff = 1
+    while True:
+        try:
+            pubsub = redis_client.pubsub()
+            pubsub.subscribe(USER_CHANGES_CHANNEL)
+            # Only (re)build once subscribed, so no change made during the
+            # build is lost; those published meanwhile are applied after.
+            while (pubsub.get_message(timeout=5) or {}).get('type') != 'subscribe':
+                pass
+            _load()
+            backoff = 1
+            for message in pubsub.listen():
+                if message['type'] == 'message':
+                    _index.update(orjson.loads(message['data']))
+        except redis.exceptions.RedisError as e:
+            logger.error(f"User change subscription lost, rebuilding on reconnect: {e}")
+            if not _ready.is_set():
+                # Serve from a snapshot until Redis is back.
+                try:
+                    _load()
+                except Exception as e:
+                    logger.exception(f"Building the user autocomplete index failed: {e}")
+        except Exception as e:
+            logger.exception(f"Building the user autocomplete index failed: {e}")
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 30)
+
+
+def start():
+    """
+    Start this worker's index: built in the background and then kept up to
+    date from USER_CHANGES_CHANNEL. Called from wsgi.py / asgi.py; also on
+    first use, e.g. after a fork.
+    """
+    global _started_pid
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+        _ready.clear()
+        threading.Thread(target=_listen, name='user-autocomplete', daemon=True).start()
+
+
+def get_index(timeout=10):
+    start()
+    if not _ready.wait(timeout):
+        return None
+    return _index
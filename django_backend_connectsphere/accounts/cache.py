@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+# Authenticated users are only cached in a cache all workers share (Redis,
+# see REDIS_URL). Without one Django falls back to a per-process
+# LocMemCache, where a save in one worker can't clear the copies held by
+# the others; CachedJWTAuthentication then reads the database every time.
+
+
+def user_cache_enabled():
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_cached_user(user_id):
+    if not user_cache_enabled():
+        return None
+    return cache.get(user_cache_key(user_id))
+
+
+async def aget_cached_user(user_id):
+    if not user_cache_enabled():
+        return None
+    return await cache.aget(user_cache_key(user_id))
+
+
+def cache_user(user):
+    if user_cache_enabled():
+        cache.set(user_cache_key(user.pk), user, settings.AUTH_USER_CACHE_SECONDS)
+
+
+async def acache_user(user):
+    if user_cache_enabled():
+        await cache.aset(user_cache_key(user.pk), user, settings.AUTH_USER_CACHE_SECONDS)
+
+
+def invalidate_cached_users(user_ids, using=None):
+    # After commit: cleared any earlier, a concurrent request could cache
+    # the old row again before the change is visible.
+    keys = [user_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys), using=using)
@@ -0,0 +1,59 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_api_key.models import APIKey
+from rest_framework_api_key.permissions import HasAPIKey
+from accounts import permissions
+from accounts.permissions import CachedHasAPIKey
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the CPU time and queries per request spent on the API key "
+        "check: HasAPIKey against CachedHasAPIKey with a warm process cache "
+        "and with only the Redis entry warm. Uses a temporary key."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        number = options['number']
+        api_key, key = APIKey.objects.create_key(name='bench_api_key')
+        request = RequestFactory().get('/', **{settings.API_KEY_CUSTOM_HEADER: key})
+
+        def drop_local():
+            permissions._verified.clear()
+
+        try:
+            cases = [
+                ('HasAPIKey', HasAPIKey(), None),
+                ('cached, redis hit', CachedHasAPIKey(), drop_local),
+                ('cached, local hit', CachedHasAPIKey(), None),
+            ]
+            self.stdout.write(f"{number} checks per case")
+            self.stdout.write(f"{'case':<20} {'cpu us':>9} {'wall us':>9} {'queries':>8}")
+
+            for name, permission, before_each in cases:
+                assert permission.has_permission(request, None), f"{name} rejected a valid key"
+
+                with CaptureQueriesContext(connection) as queries:
+                    cpu_started = time.process_time()
+                    wall_started = time.perf_counter()
+                    for _ in range(number):
+                        if before_each:
+                            before_each()
+                        permission.has_permission(request, None)
+                    wall = time.perf_counter() - wall_started
+                    cpu = time.process_time() - cpu_started
+
+                self.stdout.write(
+                    f"{name:<20} {cpu / number * 1e6:>9.1f} {wall / number * 1e6:>9.1f} "
+                    f"{len(queries) / number:>8.2f}"
+                )
+        finally:
+            # Deleting the key also drops its cache entries.
+            api_key.delete()
@@ -0,0 +1,75 @@
+import time
+import statistics
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a request-shaped database cycle (connection check, one small "
+        "query, end-of-request cleanup) with a new connection per request, "
+        "with persistent connections and with the psycopg 3 pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--query', default='SELECT 1')
+        parser.add_argument('--pool-size', type=int, default=4)
+
+    def handle(self, *args, **options):
+        base = connections.settings['default']
+        if base['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError("This benchmark needs the PostgreSQL backend.")
+        options_without_pool = {k: v for k, v in base['OPTIONS'].items() if k != 'pool'}
+
+        modes = [
+            ('new connection', {'CONN_MAX_AGE': 0, 'OPTIONS': options_without_pool}),
+            ('persistent', {'CONN_MAX_AGE': 600, 'OPTIONS': options_without_pool}),
+            ('pool', {'CONN_MAX_AGE': 0, 'OPTIONS': {
+                **options_without_pool,
+                'pool': {'min_size': 1, 'max_size': options['pool_size']},
+            }}),
+        ]
+
+        self.stdout.write(f"{options['requests']} requests per mode, query: {options['query']}")
+        self.stdout.write(f"{'mode':<16} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+
+        for name, overrides in modes:
+            try:
+                latencies = self.run(f'bench_{name.replace(" ", "_")}', {**base, **overrides}, options)
+            except Exception as e:
+                self.stdout.write(f"{name:<16} skipped: {e}")
+                continue
+
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f"{name:<16} {statistics.median(latencies):>8.2f} {p99:>8.2f} "
+                f"{statistics.mean(latencies):>8.2f}"
+            )
+
+    def run(self, alias, settings_dict, options):
+        backend = import_string(settings_dict['ENGINE'] + '.base.DatabaseWrapper')
+        connection = backend(settings_dict, alias)
+        latencies = []
+
+        try:
+            # One warm-up request so the persistent connection / pool exists.
+            for i in range(options['requests'] + 1):
+                started = time.perf_counter()
+                # What django.db.close_old_connections does on request_started
+                # and request_finished.
+                connection.close_if_unusable_or_obsolete()
+                with connection.cursor() as cursor:
+                    cursor.execute(options['query'])
+                    cursor.fetchall()
+                connection.close_if_unusable_or_obsolete()
+                if i:
+                    latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+            if settings_dict['OPTIONS'].get('pool'):
+                connection.close_pool()
+
+        return latencies
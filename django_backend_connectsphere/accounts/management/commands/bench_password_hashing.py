@@ -0,0 +1,68 @@
+import os
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import User
+from accounts.provisioning import hash_passwords, hash_workers
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time hashing passwords one after another, as User.objects.create_user "
+        "does, against hash_passwords() on 1, 2, 4 ... CPU count processes; "
+        "then User.objects.bulk_create_users() end to end on the "
+        "default pool, inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200,
+                            help='Passwords to hash per run.')
+        parser.add_argument('--workers', default='',
+                            help='Comma separated worker counts (default: 1, 2, 4 ... up to the CPU count).')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        cpus = os.cpu_count() or 1
+        if options['workers']:
+            worker_counts = [int(workers) for workers in options['workers'].split(',')]
+        else:
+            worker_counts = sorted({2 ** i for i in range(cpus.bit_length()) if 2 ** i <= cpus} | {cpus})
+
+        passwords = [f'bench-password-{i}' for i in range(count)]
+        self.stdout.write(f"{count} passwords, {cpus} CPUs")
+        self.stdout.write(f"{'run':>14} {'seconds':>9} {'hashes/s':>9} {'speed-up':>9}")
+
+        started = time.perf_counter()
+        for password in passwords:
+            make_password(password)
+        serial = time.perf_counter() - started
+        self.report('serial', serial, count, serial)
+
+        for workers in worker_counts:
+            started = time.perf_counter()
+            hash_passwords(passwords, workers=workers)
+            self.report(f'{workers} workers', time.perf_counter() - started, count, serial)
+
+        rows = [
+            {'email': f'bench_hash_{i}@example.com', 'first_name': 'Bench', 'last_name': str(i), 'password': password}
+            for i, password in enumerate(passwords)
+        ]
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                User.objects.bulk_create_users(rows, workers=hash_workers(count))
+                self.report('bulk_create', time.perf_counter() - started, count, serial)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if cpus == 1:
+            self.stdout.write("Only one CPU here: the pool can't beat the serial run.")
+
+    def report(self, name, seconds, count, serial):
+        self.stdout.write(f"{name:>14} {seconds:>9.3f} {count / seconds:>9.1f} {serial / seconds:>8.2f}x")
@@ -0,0 +1,63 @@
+import uuid
+import time
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from connectsphere_backend.redis_client import redis_client
+from connectsphere_backend.throttling import RedisUserRateThrottle
+
+
+def hammer(user_id, rate, threads, attempts):
+    class Throttle(RedisUserRateThrottle):
+        pass
+    Throttle.rate = rate
+
+    request = SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=user_id))
+
+    def attempt(_):
+        return Throttle().allow_request(request, None)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return sum(pool.map(attempt, range(attempts)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent requests for one user at RedisUserRateThrottle from "
+        "several processes (standing in for gunicorn workers) and check that "
+        "exactly the configured number are allowed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', default='500/hour')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=400, help='Attempts per process.')
+
+    def handle(self, *args, **options):
+        num_requests, _ = RedisUserRateThrottle.parse_rate(None, options['rate'])
+        total = options['processes'] * options['attempts']
+        if total <= num_requests:
+            raise CommandError(f"Need more than {num_requests} attempts in total to exceed the rate.")
+
+        # A user id nobody else has, so existing throttle state can't interfere.
+        user_id = f'check-{uuid.uuid4().hex}'
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=options['processes']) as pool:
+            futures = [
+                pool.submit(hammer, user_id, options['rate'], options['threads'], options['attempts'])
+                for _ in range(options['processes'])
+            ]
+            allowed = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+
+        redis_client.delete(RedisUserRateThrottle.cache_format % {'scope': 'user', 'ident': user_id})
+
+        self.stdout.write(f"allowed per process: {allowed}")
+        self.stdout.write(
+            f"{sum(allowed)} of {total} attempts allowed in {elapsed:.2f}s, limit {num_requests}"
+        )
+        if sum(allowed) != num_requests:
+            raise CommandError(f"Expected exactly {num_requests} allowed requests.")
+        self.stdout.write(self.style.SUCCESS("Throttle limit held across processes."))
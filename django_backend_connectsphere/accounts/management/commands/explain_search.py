@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from accounts.models import Role, User
+from connectsphere_backend.search import ranked_search
+from employees.models import Department, Employee
+from employees.queries import employee_directory_queryset
+
+SYLLABLES = ['ka', 'ri', 'to', 'mea', 'lun', 'sor', 'vi', 'pa', 'del', 'nor',
+             'ash', 'eth', 'im', 'ou', 'zan', 'bre', 'qui', 'fel', 'gor', 'tam']
+# A few real names among the generated ones, as a directory search would
+# look for them.
+PEOPLE = [('Priya', 'Sharma'), ('Rohan', 'Sharma'), ('Vikram', 'Iyer'), ('Ananya', 'Verma'), ('Meera', 'Nair')]
+
+
+def generated_name(n, salt):
+    return ''.join(SYLLABLES[(n // 20 ** i + salt * i) % 20] for i in range(4)).capitalize()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed users and employees inside a rolled-back transaction, then "
+        "EXPLAIN ANALYZE the user search and employee directory queries to "
+        "check they use the trigram indexes instead of scanning "
+        "accounts_user. PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Search term to explain (repeatable).')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Trigram search needs PostgreSQL.")
+
+        queries = options['queries'] or ['sharma', 'shrma', 'priya', 'iyer']
+        failures = []
+        try:
+            with transaction.atomic():
+                self.seed(options['users'])
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE accounts_user')
+                    cursor.execute('ANALYZE employees_employee')
+
+                for query in queries:
+                    users = ranked_search(
+                        User.objects.filter(is_deleted=False), query, ['first_name', 'last_name', 'email']
+                    ).order_by('-search_order')[:20]
+                    employees = employee_directory_queryset(search_query=query)[:11]
+
+                    for name, queryset in (('user search', users), ('employee directory', employees)):
+                        plan = queryset.explain(analyze=True)
+                        uses_index = '_trgm' in plan and 'Seq Scan on accounts_user' not in plan
+                        self.stdout.write(f"--- {name}: {query!r} ({len(list(queryset))} results)")
+                        self.stdout.write(plan)
+                        if not uses_index:
+                            failures.append(f"{name}: {query!r}")
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"Sequential scan on accounts_user for: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All searches used the trigram indexes."))
+
+    def seed(self, count, batch_size=2000):
+        role, _ = Role.objects.get_or_create(name='EMPLOYEE')
+        department = Department.objects.create(name='explain_search')
+
+        for offset in range(0, count, batch_size):
+            numbers = range(offset, min(count, offset + batch_size))
+            names = [
+                PEOPLE[n // 1000 % len(PEOPLE)] if n % 1000 == 0 else (generated_name(n, 3), generated_name(n, 7))
+                for n in numbers
+            ]
+            users = User.objects.bulk_create([
+                User(
+                    first_name=first_name, last_name=last_name,
+                    email=f'{first_name}.{last_name}{n}@example.com'.lower(),
+                    username=f'explain_search{n}', password='!', role=role,
+                )
+                for n, (first_name, last_name) in zip(numbers, names)
+            ])
+            Employee.objects.bulk_create([
+                Employee(
+                    user=user, department=department, employee_id=f'EXPLAIN{n}',
+                    designation='Engineer', joining_date='2024-01-01',
+                    contact_number='0', emergency_contact='0', address='',
+                )
+                for n, user in zip(numbers, users)
+            ])
@@ -0,0 +1,77 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.autocomplete import publish_user_changes, user_entry
+from accounts.models import User
+from accounts.provisioning import hash_workers
+from accounts.serializers import BulkUserProvisionSerializer
+from connectsphere_backend.exports import batched
+from connectsphere_backend.imports import clean, detect_format, iter_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users in bulk from a CSV or JSON Lines file with the fields "
+        "POST /users/bulk/ takes (email, first_name, last_name, role, "
+        "password), for batches too large for a request. Rows are created "
+        "a batch at a time, each batch in its own transaction, with "
+        "passwords hashed on a process pool; progress is printed after "
+        "each batch. A batch with an invalid row is skipped and reported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--approved-by', help='Email of the user recorded as approving the new users.')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Password hashing processes (default: PASSWORD_HASH_WORKERS, or one per CPU).')
+
+    def handle(self, *args, **options):
+        approved_by = None
+        if options['approved_by']:
+            try:
+                approved_by = User.objects.get(email=options['approved_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user with email {options['approved_by']}.")
+
+        workers = options['workers'] or hash_workers(options['batch_size'])
+        context = {'limit': False, 'approved_by': approved_by, 'hash_workers': workers}
+        started = time.perf_counter()
+        rows = created = failed = 0
+
+        with open(options['path'], 'rb') as stream:
+            lines = iter_rows(stream, options['format'] or detect_format(options['path']))
+            for batch in batched(lines, options['batch_size']):
+                rows += len(batch)
+                serializer = BulkUserProvisionSerializer(
+                    data={
+                        'users': [{key: clean(value) for key, value in row.items() if key and value} for _, row in batch],
+                        'approve': approved_by is not None,
+                    },
+                    context=context,
+                )
+                if serializer.is_valid():
+                    with transaction.atomic():
+                        users = serializer.save()
+                    publish_user_changes([user_entry(user) for user in users])
+                    created += len(users)
+                else:
+                    failed += len(batch)
+                    self.report_errors(batch, serializer.errors)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{rows} rows read, {created} created, {failed} failed "
+                    f"({elapsed:.1f}s, {created / elapsed if elapsed else 0:.0f} users/s)"
+                )
+
+    def report_errors(self, batch, errors):
+        row_errors = errors.get('users', [])
+        if not isinstance(row_errors, list) or len(row_errors) != len(batch):
+            self.stderr.write(f"lines {batch[0][0]}-{batch[-1][0]}: {row_errors or errors}")
+            return
+        for (line, _), error in zip(batch, row_errors):
+            if error:
+                details = '; '.join(f"{field}: {' '.join(map(str, messages))}" for field, messages in error.items())
+                self.stderr.write(f"line {line}: {details}")
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import UserManager
 from django.apps import apps
+from .provisioning import hash_passwords
 
 class CustomUserManager(UserManager):
     def _get_role_model(self):
@@ -24,3 +25,35 @@ class CustomUserManager(UserManager):
         if 'role' in extra_fields:
             extra_fields['role'] = self._resolve_role(extra_fields['role'])
         return super()._create_user(username, email, password, **extra_fields)
+
+    def bulk_create_users(self, rows, workers=1, batch_size=1000):
+        """
+        Create users from dicts of field values (with an optional password)
+        in bulk: roles resolved once per distinct value, passwords hashed
+        with hash_passwords() on `workers` processes, rows inserted with
+        bulk_create. No signals are sent; the caller handles what post_save
+        would have done.
+        """
+        Role = self._get_role_model()
+        Role.objects.get_or_create(name='EMPLOYEE')
+        roles = {}
+        users = []
+        for row in rows:
+            fields = dict(row)
+            password = fields.pop('password', None)
+            # Same default as User.save().
+            role = fields.get('role') or 'EMPLOYEE'
+            if not isinstance(role, Role):
+                if role not in roles:
+                    roles[role] = self._resolve_role(role)
+                role = roles[role]
+            fields['role'] = role
+            fields['email'] = self.normalize_email(fields.get('email'))
+            fields.setdefault('username', fields['email'])
+            users.append((self.model(**fields), password))
+
+        hashes = hash_passwords([password for _, password in users], workers=workers)
+        for (user, _), hashed in zip(users, hashes):
+            user.password = hashed
+
+        return self.bulk_create([user for user, _ in users], batch_size=batch_size)
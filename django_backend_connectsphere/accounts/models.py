@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
 from .managers import CustomUserManager
+from .cache import invalidate_cached_users
+from connectsphere_backend.search import trigram_index
 
 class Role(models.Model):
     ROLE_CHOICES = [
@@ -16,6 +18,11 @@ class Role(models.Model):
     def __str__(self):
         return self.get_name_display() 
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Authenticated users are cached together with their role.
+        invalidate_cached_users(self.user_set.values_list('id', flat=True), using=self._state.db)
+
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
@@ -32,6 +39,14 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name','role']
 
+    class Meta(AbstractUser.Meta):
+        # Directory search (connectsphere_backend/search.py).
+        indexes = [
+            trigram_index('first_name', 'user_first_name_trgm'),
+            trigram_index('last_name', 'user_last_name_trgm'),
+            trigram_index('email', 'user_email_trgm'),
+        ]
+
     def soft_delete(self):
         self.is_deleted = True
         self.save()
@@ -44,3 +59,10 @@ class User(AbstractUser):
         if not self.role:
             self.role, _ = Role.objects.get_or_create(name='EMPLOYEE')
         super().save(*args, **kwargs)
+        invalidate_cached_users([self.pk], using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        user_id, using = self.pk, self._state.db
+        result = super().delete(*args, **kwargs)
+        invalidate_cached_users([user_id], using=using)
+        return result
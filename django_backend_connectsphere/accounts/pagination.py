@@ -1,4 +1,5 @@
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
 
 class CustomPagination(PageNumberPagination):
     page_size = 20  
@@ -0,0 +1,148 @@
+import hmac
+import time
+import hashlib
+import logging
+import threading
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_api_key.models import APIKey
+from rest_framework_api_key.permissions import HasAPIKey
+from connectsphere_backend.redis_client import async_redis_client, redis_client
+
+logger = logging.getLogger(__name__)
+
+# digest -> (expires_at, prefix), per process
+_verified = {}
+_verified_lock = threading.Lock()
+LOCAL_CACHE_MAX_ENTRIES = 1024
+
+
+def key_digest(key):
+    # Keyed with SECRET_KEY so the Redis entries are useless without it.
+    return hmac.new(settings.SECRET_KEY.encode(), key.encode(), hashlib.sha256).hexdigest()
+
+
+def verified_key(digest):
+    return f'apikey:verified:{digest}'
+
+
+def prefix_digests_key(prefix):
+    return f'apikey:digests:{prefix}'
+
+
+def remember_key(digest, api_key):
+    ttl = settings.API_KEY_CACHE_SECONDS
+    if api_key.expiry_date is not None:
+        ttl = min(ttl, int((api_key.expiry_date - timezone.now()).total_seconds()))
+    if ttl <= 0:
+        return
+
+    _remember_locally(digest, api_key.prefix, ttl)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(verified_key(digest), api_key.prefix, ex=ttl)
+        pipe.sadd(prefix_digests_key(api_key.prefix), digest)
+        pipe.expire(prefix_digests_key(api_key.prefix), settings.API_KEY_CACHE_SECONDS)
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Caching API key verification failed: {e}")
+
+
+def _remember_locally(digest, prefix, ttl):
+    ttl = min(ttl, settings.API_KEY_LOCAL_CACHE_SECONDS)
+    with _verified_lock:
+        if len(_verified) >= LOCAL_CACHE_MAX_ENTRIES:
+            _verified.clear()
+        _verified[digest] = (time.monotonic() + ttl, prefix)
+
+
+def forget_key(prefix):
+    """
+    Drop every cached verification of the key with this prefix. Other
+    processes still trust their local copy for at most
+    API_KEY_LOCAL_CACHE_SECONDS.
+    """
+    with _verified_lock:
+        for digest in [d for d, (_, p) in _verified.items() if p == prefix]:
+            del _verified[digest]
+
+    try:
+        digests = redis_client.smembers(prefix_digests_key(prefix))
+        keys = [verified_key(digest.decode()) for digest in digests]
+        redis_client.delete(prefix_digests_key(prefix), *keys)
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Dropping cached API key verifications failed: {e}")
+
+
+class CachedHasAPIKey(HasAPIKey):
+    """
+    HasAPIKey that remembers successful verifications, first in process
+    memory and then in Redis, keyed by an HMAC of the presented key. Only a
+    miss pays for the database lookup and hash check. Revoking, expiring or
+    deleting an APIKey drops its entries (see accounts/signals.py).
+    """
+
+    def has_permission(self, request, view):
+        key = self.get_key(request)
+        if not key:
+            return False
+
+        digest = key_digest(key)
+
+        cached = _verified.get(digest)
+        if cached is not None and cached[0] > time.monotonic():
+            return True
+
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(verified_key(digest))
+            pipe.ttl(verified_key(digest))
+            prefix, ttl = pipe.execute()
+        except redis.exceptions.RedisError as e:
+            logger.error(f"API key cache lookup failed: {e}")
+            prefix, ttl = None, 0
+
+        if prefix and ttl > 0:
+            _remember_locally(digest, prefix.decode(), ttl)
+            return True
+
+        return self.verify_key(key, digest)
+
+    async def ahas_permission(self, request, view):
+        # has_permission() for async views: the caches are read on the
+        # loop; only a miss leaves it, for the database and hash check.
+        key = self.get_key(request)
+        if not key:
+            return False
+
+        digest = key_digest(key)
+
+        cached = _verified.get(digest)
+        if cached is not None and cached[0] > time.monotonic():
+            return True
+
+        try:
+            async with async_redis_client().pipeline(transaction=False) as pipe:
+                prefix, ttl = await pipe.get(verified_key(digest)).ttl(verified_key(digest)).execute()
+        except redis.exceptions.RedisError as e:
+            logger.error(f"API key cache lookup failed: {e}")
+            prefix, ttl = None, 0
+
+        if prefix and ttl > 0:
+            _remember_locally(digest, prefix.decode(), ttl)
+            return True
+
+        return await sync_to_async(self.verify_key)(key, digest)
+
+    def verify_key(self, key, digest):
+        try:
+            api_key = APIKey.objects.get_from_key(key)
+        except APIKey.DoesNotExist:
+            return False
+        if api_key.has_expired:
+            return False
+
+        remember_key(digest, api_key)
+        return True
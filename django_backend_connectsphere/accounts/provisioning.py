@@ -0,0 +1,33 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+
+def _setup_worker():
+    # Forked workers inherit a configured Django; spawned ones need setup.
+    django.setup()
+
+
+def hash_workers(count):
+    return max(1, min(settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1, count))
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    make_password() for each password (None gives an unusable one). Returns
+    the hashes in order.
+
+    With workers > 1 they are spread over a process pool: PBKDF2 is pure
+    CPU and holds the GIL, so threads don't help. Only management commands
+    ask for that; forking a threaded web worker isn't safe, so requests
+    hash in-process and keep their batches small.
+    """
+    passwords = list(passwords)
+    workers = min(workers or 1, len(passwords))
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
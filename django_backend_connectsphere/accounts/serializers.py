@@ -4,6 +4,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.conf import settings
 
 class RoleSerializer(serializers.ModelSerializer):
     class Meta:
@@ -40,6 +41,79 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+class ProvisionUserSerializer(serializers.Serializer):
+    email = serializers.EmailField(max_length=150)
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+    role = serializers.CharField(default='EMPLOYEE')
+    password = serializers.CharField(write_only=True, required=False)
+
+    def validate_email(self, value):
+        return value.lower()
+
+    def validate_role(self, value):
+        return value.upper()
+
+    def validate_password(self, value):
+        try:
+            validate_password(value)
+        except ValidationError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+
+class BulkUserProvisionSerializer(serializers.Serializer):
+    users = ProvisionUserSerializer(many=True, allow_empty=False)
+    approve = serializers.BooleanField(default=False)
+
+    def validate_users(self, rows):
+        # Requests are capped by the BULK_PROVISION_* settings; the
+        # provision_users command lifts the caps with limit=False.
+        if self.context.get('limit', True):
+            if len(rows) > settings.BULK_PROVISION_MAX_USERS:
+                raise serializers.ValidationError(
+                    f'At most {settings.BULK_PROVISION_MAX_USERS} users per request; '
+                    'use the provision_users command for larger batches.'
+                )
+            passwords = sum(1 for row in rows if row.get('password'))
+            if passwords > settings.BULK_PROVISION_MAX_PASSWORDS:
+                raise serializers.ValidationError(
+                    f'At most {settings.BULK_PROVISION_MAX_PASSWORDS} users with a password per request; '
+                    'use the provision_users command for larger batches.'
+                )
+
+        # One query each for every row's email and role, instead of the
+        # per-row UniqueValidator and role lookups.
+        errors = [{} for _ in rows]
+        emails = [row['email'] for row in rows]
+        existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        roles = set(Role.objects.filter(name__in={row['role'] for row in rows}).values_list('name', flat=True))
+        roles.add('EMPLOYEE')
+
+        seen = set()
+        for row, row_errors in zip(rows, errors):
+            if row['email'] in existing:
+                row_errors['email'] = ['A user with this email already exists.']
+            elif row['email'] in seen:
+                row_errors['email'] = ['Duplicate email in this request.']
+            seen.add(row['email'])
+            if row['role'] not in roles:
+                row_errors['role'] = ['Invalid role value']
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rows
+
+    def create(self, validated_data):
+        approved_by = None
+        if validated_data['approve']:
+            approved_by = self.context['approved_by'] if 'approved_by' in self.context else self.context['request'].user
+        rows = [
+            {**row, 'is_approved': validated_data['approve'], 'approved_by': approved_by}
+            for row in validated_data['users']
+        ]
+        return User.objects.bulk_create_users(rows, workers=self.context.get('hash_workers', 1))
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         # try:
@@ -0,0 +1,42 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_api_key.models import APIKey
+from .autocomplete import publish_user_change, user_entry
+from .models import User
+from .permissions import forget_key
+
+
+@receiver(post_save, sender=APIKey)
+def forget_changed_api_key(sender, instance, **kwargs):
+    # Revocation and a new expiry date must apply straight away, not when
+    # the cached verification runs out.
+    forget_key(instance.prefix)
+
+
+@receiver(post_delete, sender=APIKey)
+def forget_deleted_api_key(sender, instance, **kwargs):
+    forget_key(instance.prefix)
+
+
+@receiver(post_save, sender=User)
+def publish_changed_user(sender, instance, **kwargs):
+    # Keeps every worker's participant picker index up to date.
+    entry = user_entry(instance)
+    transaction.on_commit(lambda: publish_user_change(entry))
+
+
+@receiver(post_delete, sender=User)
+def publish_deleted_user(sender, instance, **kwargs):
+    entry = {'id': instance.pk, 'pickable': False}
+    transaction.on_commit(lambda: publish_user_change(entry))
+
+
+def enable_trigram_extension(sender, using, **kwargs):
+    # Connected to pre_migrate in AccountsConfig.ready(): the trigram
+    # indexes on User need pg_trgm before the migration creating them runs.
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
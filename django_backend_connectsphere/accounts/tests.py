@@ -1,3 +1,255 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import time
+import unittest
+from unittest import mock
+import orjson
+import redis
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_api_key.models import APIKey
+from connectsphere_backend.throttling import RedisUserRateThrottle
+from connectsphere_backend.redis_client import redis_client
+from . import autocomplete, permissions
+from .autocomplete import PrefixIndex, publish_user_change
+from .cache import user_cache_key
+from .models import Role, User
+from .permissions import CachedHasAPIKey, key_digest
+from .views import USER_EXPORT_FIELDS
 
-# Create your tests here.
+
+def entry(user_id, first_name, last_name, email=None, pickable=True):
+    return {
+        'id': user_id,
+        'first_name': first_name,
+        'last_name': last_name,
+        'email': email or f'{first_name}.{last_name}@example.com'.lower(),
+        'profile_picture': '',
+        'pickable': pickable,
+    }
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex([
+            entry(1, 'Zoë', 'Adams'),
+            entry(2, 'Zoe', 'Baker', email='zb@example.com'),
+            entry(3, 'Adam', 'Zimmer'),
+            entry(4, 'Hidden', 'User', pickable=False),
+        ])
+
+    def ids(self, prefix, **kwargs):
+        return sorted(user_id for user_id, _ in self.index.search(prefix, **kwargs))
+
+    def test_matches_names_and_email_prefixes(self):
+        self.assertEqual(self.ids('zo'), [1, 2])
+        self.assertEqual(self.ids('ZOË'), [1, 2])
+        self.assertEqual(self.ids('adam'), [1, 3])
+        self.assertEqual(self.ids('zoe bak'), [2])
+        self.assertEqual(self.ids('zb'), [2])
+        self.assertEqual(self.ids('z'), [1, 2, 3])
+        self.assertEqual(self.ids('nobody'), [])
+        self.assertEqual(self.ids(''), [])
+
+    def test_unpickable_users_are_left_out(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.ids('hidden'), [])
+
+    def test_limit_and_exclude(self):
+        self.assertEqual(len(self.index.search('z', limit=2)), 2)
+        self.assertEqual(self.ids('zo', exclude=1), [2])
+
+    def test_update_adds_renames_and_removes(self):
+        self.index.update(entry(5, 'Yusuf', 'Okafor'))
+        self.assertEqual(self.ids('yus'), [5])
+
+        self.index.update(entry(2, 'Zoe', 'Carter', email='zc@example.com'))
+        self.assertEqual(self.ids('baker'), [])
+        self.assertEqual(self.ids('zb'), [])
+        self.assertEqual(self.ids('cart'), [2])
+        self.assertEqual(self.ids('zo'), [1, 2])
+
+        self.index.update(entry(1, 'Zoë', 'Adams', pickable=False))
+        self.assertEqual(self.ids('zo'), [2])
+        self.assertEqual(self.ids('adam'), [3])
+        self.assertEqual(len(self.index), 3)
+
+    def test_update_keeps_keys_sorted(self):
+        for user_id, name in enumerate(['mia', 'al', 'zed', 'bo', 'al'], start=10):
+            self.index.update(entry(user_id, name, 'Test'))
+        self.assertEqual(self.index.keys, sorted(self.index.keys))
+        self.assertEqual(len(self.index.keys), len(self.index.ids))
+
+
+class IndexSubscriptionTests(TransactionTestCase):
+    # The worker's index, kept up to date through the Redis at REDIS_URL.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            redis_client.ping()
+        except redis.exceptions.RedisError:
+            raise unittest.SkipTest('The index subscription tests need the Redis at REDIS_URL.')
+
+    def search(self, prefix, found):
+        # Changes arrive asynchronously: wait a little for them.
+        deadline = time.monotonic() + 5
+        while True:
+            ids = [user_id for user_id, _ in autocomplete.get_index().search(prefix)]
+            if (5001 in ids) == found or time.monotonic() > deadline:
+                return ids
+            time.sleep(0.05)
+
+    def test_published_changes_update_the_index(self):
+        self.assertIsNotNone(autocomplete.get_index())
+
+        publish_user_change(entry(5001, 'Quintessa', 'Marlowe'))
+        self.assertIn(5001, self.search('quintes', found=True))
+
+        publish_user_change(entry(5001, 'Quintessa', 'Marlowe', pickable=False))
+        self.assertNotIn(5001, self.search('quintes', found=False))
+
+
+class UserCacheInvalidationTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(name='EMPLOYEE')
+        self.user = User.objects.create_user(
+            username='cache@example.com', email='cache@example.com', password=None, role=role
+        )
+        cache.set(user_cache_key(self.user.pk), 'cached')
+
+    def test_user_save_clears_the_entry_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Changed'
+            self.user.save()
+            self.assertEqual(cache.get(user_cache_key(self.user.pk)), 'cached')
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_role_save_clears_its_users_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            role = Role.objects.get(name='EMPLOYEE')
+            role.permissions = {'changed': True}
+            role.save()
+            self.assertEqual(cache.get(user_cache_key(self.user.pk)), 'cached')
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_nothing_is_cleared_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.user.soft_delete()
+        self.assertEqual(cache.get(user_cache_key(self.user.pk)), 'cached')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Trigram search needs PostgreSQL.')
+class TrigramSearchPlanTests(TestCase):
+    def test_searches_use_the_trigram_indexes(self):
+        # Seeds users and employees, then fails unless every search plan
+        # uses a _trgm index and none scans accounts_user.
+        out = io.StringIO()
+        call_command('explain_search', users=20000, stdout=out)
+        self.assertIn('All searches used the trigram indexes.', out.getvalue())
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+@mock.patch.object(RedisUserRateThrottle, 'THROTTLE_RATES', {'user': None})
+class UserExportTests(TestCase):
+    def setUp(self):
+        ceo = User.objects.create_user(
+            username='ceo@example.com', email='ceo@example.com', password=None, role=Role.objects.create(name='CEO')
+        )
+        role = Role.objects.create(name='EMPLOYEE')
+        for first_name in ['Ann', '=HYPERLINK("http://x")', 'Bo', '+1', '@sum', 'Cy']:
+            User.objects.create_user(
+                username=f'{len(first_name)}{first_name}', email=f'{first_name.lower()}@example.com', password=None,
+                role=role, first_name=first_name,
+            )
+        _, key = APIKey.objects.create_key(name='export-tests')
+        self.client = APIClient(headers={'X-Api-Key': key})
+        self.client.force_authenticate(ceo)
+
+    def export(self, **params):
+        response = self.client.get('/api/accounts/users/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.streaming_content)
+
+    def test_csv_streams_in_chunks_after_a_bom_and_header(self):
+        blocks = self.export(file_format='csv')
+        # The header, then one block per EXPORT_CHUNK_SIZE rows.
+        self.assertEqual(len(blocks), 1 + 4)
+        content = b''.join(blocks).decode()
+        self.assertTrue(content.startswith('\ufeff'))
+        lines = content.removeprefix('\ufeff').splitlines()
+        self.assertEqual(lines[0].split(','), [column for column, _ in USER_EXPORT_FIELDS])
+        self.assertEqual(len(lines), 1 + 7)
+
+    def test_csv_escapes_formulas(self):
+        rows = list(csv.DictReader(io.StringIO(b''.join(self.export()).decode().removeprefix('\ufeff'))))
+        first_names = [row['first_name'] for row in rows]
+        self.assertIn("'=HYPERLINK(\"http://x\")", first_names)
+        self.assertIn("'+1", first_names)
+        self.assertIn("'@sum", first_names)
+        self.assertIn('Ann', first_names)
+
+    def test_jsonl_has_a_line_per_user(self):
+        lines = b''.join(self.export(file_format='jsonl')).splitlines()
+        self.assertEqual(len(lines), 7)
+        rows = [orjson.loads(line) for line in lines]
+        self.assertEqual(list(rows[0]), [column for column, _ in USER_EXPORT_FIELDS])
+        # Not escaped: JSON isn't opened as a spreadsheet.
+        self.assertIn('=HYPERLINK("http://x")', [row['first_name'] for row in rows])
+
+    def test_unknown_formats_are_refused(self):
+        response = self.client.get('/api/accounts/users/export/', {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'file_format must be csv or jsonl.'})
+
+
+class ApiKeyRevocationTests(TestCase):
+    def setUp(self):
+        self.api_key, self.key = APIKey.objects.create_key(name='revocation-tests')
+        permissions._verified.clear()
+        self.addCleanup(permissions._verified.clear)
+
+    def allowed(self, key=None):
+        request = RequestFactory().get('/', headers={'X-Api-Key': key or self.key})
+        return CachedHasAPIKey().has_permission(request, None)
+
+    def warm(self):
+        self.assertTrue(self.allowed())
+        self.assertIn(key_digest(self.key), permissions._verified)
+        # Answered from process memory: the database isn't asked again.
+        with mock.patch.object(APIKey.objects, 'get_from_key') as get_from_key:
+            self.assertTrue(self.allowed())
+        get_from_key.assert_not_called()
+
+    def test_revoking_rejects_the_next_request(self):
+        self.warm()
+        self.api_key.revoked = True
+        self.api_key.save()
+        self.assertFalse(self.allowed())
+
+    def test_deleting_rejects_the_next_request(self):
+        self.warm()
+        self.api_key.delete()
+        self.assertFalse(self.allowed())
+
+    def test_expiring_rejects_the_next_request(self):
+        self.warm()
+        self.api_key.expiry_date = timezone.now() - datetime.timedelta(seconds=1)
+        self.api_key.save()
+        self.assertFalse(self.allowed())
+
+    def test_other_keys_stay_cached(self):
+        _, other = APIKey.objects.create_key(name='other')
+        self.warm()
+        self.assertTrue(self.allowed(other))
+
+        self.api_key.revoked = True
+        self.api_key.save()
+        self.assertIn(key_digest(other), permissions._verified)
+        self.assertNotIn(key_digest(self.key), permissions._verified)
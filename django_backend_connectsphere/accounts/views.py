@@ -3,23 +3,41 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView,TokenRefreshView
 from .models import User, Role
-from .serializers import UserSerializer,CustomTokenObtainPairSerializer
+from .serializers import UserSerializer,CustomTokenObtainPairSerializer,BulkUserProvisionSerializer
 from .pagination import CustomPagination
 from rest_framework.exceptions import PermissionDenied
-from rest_framework_api_key.permissions import HasAPIKey
+from .permissions import CachedHasAPIKey
+from .autocomplete import get_index as get_picker_index, publish_user_changes, user_entry
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.throttling import UserRateThrottle
+from connectsphere_backend.throttling import RedisScopedRateThrottle, RedisUserRateThrottle
+from connectsphere_backend.search import ranked_search
+from connectsphere_backend.exports import ExportContentNegotiation, export_format, export_queryset
 from rest_framework.exceptions import NotFound
 from django.http import Http404
-from django.db import models
+
+USER_EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('email', 'email'),
+    ('username', 'username'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('role', 'role__name'),
+    ('is_active', 'is_active'),
+    ('is_approved', 'is_approved'),
+    ('approved_by', 'approved_by__email'),
+    ('date_joined', 'date_joined'),
+    ('last_login', 'last_login'),
+]
 
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.filter(is_deleted=False).select_related("role")
     serializer_class = UserSerializer
-    permission_classes = [HasAPIKey,IsAuthenticated]
+    permission_classes = [CachedHasAPIKey,IsAuthenticated]
     pagination_class = CustomPagination
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [RedisUserRateThrottle]
+    # Rate for actions throttled with RedisScopedRateThrottle (autocomplete).
+    throttle_scope = 'autocomplete'
 
     def get_object_with_deleted(self):
         return User.objects.select_related("role").get(pk=self.kwargs["pk"])  
@@ -61,6 +79,37 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({"message": "User created successfully.", "user": serializer.data}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # {"users": [{"email", "first_name", "last_name", "role", "password"}, ...], "approve": false}
+        # Passwords are hashed here, in this worker: the process pool in
+        # accounts/provisioning.py is only used by the provision_users
+        # command, hence the small per-request limits.
+        if request.user.role.name != "CEO":
+            return Response({"error": "Only CEO can create users."}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = BulkUserProvisionSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        users = serializer.save()
+        publish_user_changes([user_entry(user) for user in users])
+        return Response(
+            {"message": f"{len(users)} users created successfully.", "users": UserSerializer(users, many=True).data},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['get'], content_negotiation_class=ExportContentNegotiation)
+    def export(self, request):
+        if request.user.role.name != 'CEO':
+            raise PermissionDenied('Only the CEO can export users.')
+
+        fmt = export_format(request)
+        if fmt is None:
+            return Response({"error": "file_format must be csv or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return export_queryset(request, self.get_queryset().order_by('id'), USER_EXPORT_FIELDS, fmt, 'users')
+
     def update(self, request, *args, **kwargs):
         return Response(
         {"detail": "Updating User is not permitted through this route."},
@@ -185,11 +234,7 @@ class UserViewSet(viewsets.ModelViewSet):
         
         users = self.queryset.order_by('id').select_related("role")
         if query:
-            users = users.filter(
-                models.Q(first_name__icontains=query) |
-                models.Q(last_name__icontains=query) |
-                models.Q(email__icontains=query)
-            )
+            users = ranked_search(users, query, ['first_name', 'last_name', 'email']).order_by('-search_order')
         if role:
             users = users.filter(role__name=role)
 
@@ -208,14 +253,41 @@ class UserViewSet(viewsets.ModelViewSet):
         # serializer = self.get_serializer(users, many=True)
         # return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], throttle_classes=[RedisScopedRateThrottle])
+    def autocomplete(self, request):
+        # Participant picker type-ahead, answered from this worker's
+        # in-memory index (accounts/autocomplete.py) without a query.
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 20)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        index = get_picker_index()
+        if index is None:
+            return Response({'error': 'User directory is still loading, try again shortly.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        storage = User._meta.get_field('profile_picture').storage
+        matches = index.search(request.query_params.get('q', ''), limit=max(limit, 1), exclude=request.user.pk)
+        return Response([
+            {
+                'id': user_id,
+                'first_name': first_name,
+                'last_name': last_name,
+                'profile_picture': storage.url(picture) if picture else None,
+            }
+            for user_id, (first_name, last_name, _, picture) in matches
+        ])
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
-    permission_classes = [HasAPIKey]
-    throttle_classes = [UserRateThrottle]
+    permission_classes = [CachedHasAPIKey]
+    throttle_classes = [RedisUserRateThrottle]
 
 class CustomTokenRefreshView(TokenRefreshView):
-    permission_classes = [HasAPIKey]
-    throttle_classes = [UserRateThrottle]
+    permission_classes = [CachedHasAPIKey]
+    throttle_classes = [RedisUserRateThrottle]
 
 
 
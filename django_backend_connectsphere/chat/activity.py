@@ -0,0 +1,217 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from accounts.models import User
+from employees.models import Employee
+from .models import ChatRoom, Message, RollupWatermark, RoomActivity, UserActivity
+from .sharding import message_shards
+
+# Daily message counts per room and per sender (RoomActivity, UserActivity),
+# so activity dashboards never scan chat_message. rollup_chat_activity only
+# reads messages past the watermark. Message ids come from one sequence
+# even when sharded (allocate_message_id), so a single id watermark covers
+# every shard and rooms moved by reshard_messages aren't counted twice.
+#
+# Ids are taken before commit, so a slow transaction can make an id below
+# already visible ones appear late. Only messages older than
+# CHAT_ROLLUP_LAG_SECONDS are rolled up, giving such transactions that long;
+# the watermark stops short of the first younger id, so it never passes a
+# message that hasn't been counted.
+#
+# Deleted messages are counted: they were sent that day, and a deletion
+# after the rollup couldn't take them back out anyway.
+
+WATERMARK = 'chat_activity'
+MAX_PERIOD_DAYS = 366
+GROUP_BY = ('department', 'room', 'user')
+
+
+def _last_message_id(after_id, cutoff):
+    # The newest id older than cutoff, short of the first one that isn't.
+    newest, first_young = 0, None
+    for alias in message_shards():
+        ids = Message.objects.using(alias).filter(id__gt=after_id).aggregate(
+            newest=Max('id', filter=Q(timestamp__lt=cutoff)),
+            first_young=Min('id', filter=Q(timestamp__gte=cutoff)),
+        )
+        newest = max(newest, ids['newest'] or 0)
+        if ids['first_young'] is not None:
+            first_young = min(first_young or ids['first_young'], ids['first_young'])
+    return min(newest, first_young - 1) if first_young is not None else newest
+
+
+def _count_messages(low, high, cutoff):
+    # {(room_id, day): count} and {(sender_id, day): count} for ids in
+    # (low, high] older than cutoff, deleted or not.
+    rooms, users = {}, {}
+    for alias in message_shards():
+        messages = Message.objects.using(alias).filter(id__gt=low, id__lte=high, timestamp__lt=cutoff).annotate(
+            day=TruncDate('timestamp')
+        ).order_by()
+        for counts, field in ((rooms, 'room_id'), (users, 'sender_id')):
+            for key, day, count in messages.values(field, 'day').annotate(count=Count('id')).values_list(
+                field, 'day', 'count'
+            ):
+                counts[key, day] = counts.get((key, day), 0) + count
+    return rooms, users
+
+
+def _add_counts(model, field, counts, **defaults):
+    # Adds {(key, day): count} onto the rollup rows, creating missing ones.
+    # Callers hold the watermark lock, so nothing else writes them meanwhile.
+    keys = {key for key, _ in counts}
+    existing = dict(
+        ((key, day), count)
+        for key, day, count in model.objects.filter(
+            **{f'{field}__in': keys}, day__in={day for _, day in counts}
+        ).values_list(field, 'day', 'message_count')
+    )
+    model.objects.bulk_create(
+        [
+            model(**{field: key}, day=day, message_count=existing.get((key, day), 0) + count,
+                  **{name: values.get(key) for name, values in defaults.items()})
+            for (key, day), count in counts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=[field.removesuffix('_id'), 'day'],
+        update_fields=['message_count'],
+        batch_size=1000,
+    )
+
+
+def _roll_up(low, high, cutoff):
+    rooms, users = _count_messages(low, high, cutoff)
+
+    # Messages whose room or sender has since been deleted outright.
+    room_ids = set(ChatRoom.objects.filter(id__in={room_id for room_id, _ in rooms}).values_list('id', flat=True))
+    rooms = {key: count for key, count in rooms.items() if key[0] in room_ids}
+    user_ids = {user_id for user_id, _ in users}
+    user_ids = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    users = {key: count for key, count in users.items() if key[0] in user_ids}
+    departments = dict(Employee.objects.filter(user_id__in=user_ids).values_list('user_id', 'department_id'))
+
+    _add_counts(RoomActivity, 'room_id', rooms)
+    _add_counts(UserActivity, 'user_id', users, department_id=departments)
+    return sum(rooms.values())
+
+
+def roll_up_activity(batch_size=50000, rebuild=False):
+    """
+    Add messages sent since the last run to the rollups, batch_size ids per
+    transaction. With rebuild, start again from the first message.
+    Returns the number of messages counted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHAT_ROLLUP_LAG_SECONDS)
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        if rebuild:
+            RoomActivity.objects.all().delete()
+            UserActivity.objects.all().delete()
+            watermark.last_message_id = 0
+            watermark.covered_until = None
+            watermark.save()
+    upper = _last_message_id(watermark.last_message_id, cutoff)
+
+    counted = 0
+    while True:
+        with transaction.atomic():
+            watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+            if watermark.last_message_id >= upper:
+                if watermark.covered_until is None or watermark.covered_until < cutoff:
+                    watermark.covered_until = cutoff
+                    watermark.save(update_fields=['covered_until'])
+                return counted
+
+            high = min(watermark.last_message_id + batch_size, upper)
+            counted += _roll_up(watermark.last_message_id, high, cutoff)
+            watermark.last_message_id = high
+            watermark.save(update_fields=['last_message_id'])
+
+
+def parse_period(params, default_days=30):
+    """(start, end) days from ?start=YYYY-MM-DD&end=YYYY-MM-DD, both inclusive."""
+    end = params.get('end')
+    end = date.fromisoformat(end) if end else timezone.localdate()
+    start = params.get('start')
+    start = date.fromisoformat(start) if start else end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValueError('start must not be after end')
+    if (end - start).days >= MAX_PERIOD_DAYS:
+        raise ValueError(f'The period can be at most {MAX_PERIOD_DAYS} days')
+    return start, end
+
+
+def _per_day(start, end, rows):
+    counts = dict(rows)
+    return [
+        {'day': (start + timedelta(days=offset)).isoformat(),
+         'messages': counts.get(start + timedelta(days=offset), 0)}
+        for offset in range((end - start).days + 1)
+    ]
+
+
+def _as_of():
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('covered_until', flat=True).first()
+
+
+def room_activity(room, start, end):
+    rows = RoomActivity.objects.filter(room=room, day__range=(start, end)).values_list('day', 'message_count')
+    per_day = _per_day(start, end, rows)
+    return {
+        'room_id': room.id,
+        'name': room.name,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'as_of': _as_of(),
+        'total': sum(day['messages'] for day in per_day),
+        'per_day': per_day,
+    }
+
+
+def activity_summary(start, end, group_by='department', limit=20):
+    """Messages per day, and per department, room or user, over a period."""
+    period = {'day__range': (start, end)}
+    per_day = _per_day(start, end, RoomActivity.objects.filter(**period).values('day').annotate(
+        messages=Sum('message_count')
+    ).values_list('day', 'messages').order_by())
+
+    if group_by == 'department':
+        rows = UserActivity.objects.filter(**period).values('department_id', 'department__name').annotate(
+            messages=Sum('message_count'), active_users=Count('user_id', distinct=True)
+        ).order_by('-messages', 'department__name')
+        groups = [
+            {'id': row['department_id'], 'name': row['department__name'] or 'No department',
+             'messages': row['messages'], 'active_users': row['active_users']}
+            for row in rows
+        ]
+    elif group_by == 'room':
+        rows = RoomActivity.objects.filter(**period).values('room_id', 'room__name').annotate(
+            messages=Sum('message_count'), active_days=Count('day')
+        ).order_by('-messages', 'room_id')[:limit]
+        groups = [
+            {'id': row['room_id'], 'name': row['room__name'], 'messages': row['messages'],
+             'active_days': row['active_days']}
+            for row in rows
+        ]
+    else:
+        rows = UserActivity.objects.filter(**period).values(
+            'user_id', 'user__first_name', 'user__last_name'
+        ).annotate(messages=Sum('message_count'), active_days=Count('day')).order_by('-messages', 'user_id')[:limit]
+        groups = [
+            {'id': row['user_id'], 'name': f"{row['user__first_name']} {row['user__last_name']}".strip(),
+             'messages': row['messages'], 'active_days': row['active_days']}
+            for row in rows
+        ]
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'as_of': _as_of(),
+        'total': sum(day['messages'] for day in per_day),
+        'per_day': per_day,
+        'group_by': group_by,
+        'groups': groups,
+    }
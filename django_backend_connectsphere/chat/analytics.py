@@ -0,0 +1,274 @@
+from datetime import datetime, time, timedelta
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import FloatField, Func
+from django.utils import timezone
+from connectsphere_backend.exports import batched
+from employees.models import Department, Employee
+from .models import ChatRoom, Message
+from .sharding import is_sharded, message_shards
+
+# CEO dashboard metrics over chat activity, per local calendar day:
+# messages per day and per room, response latency (the time from a
+# message to the next one in the same room by someone else) and distinct
+# active users, overall and per department.
+#
+# Message and Employee columns are read in bulk as plain numbers through
+# server-side cursors into NumPy arrays, and every metric is computed with
+# array operations instead of a Python loop over rows. Each day's results
+# are cached on their own; a past day's don't change, so a dashboard
+# showing the last 30 days only recomputes today.
+
+CHUNK_SIZE = 50000
+
+
+class EpochSeconds(Func):
+    # A datetime column as float seconds since the epoch, so rows come back
+    # as numbers rather than datetime objects.
+    template = 'CAST(EXTRACT(EPOCH FROM %(expressions)s) AS double precision)'
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template='((julianday(%(expressions)s) - 2440587.5) * 86400.0)', **extra_context
+        )
+
+
+def message_databases():
+    return list(message_shards()) if is_sharded() else [router.db_for_read(Message)]
+
+
+def load_messages(start, end):
+    """room, sender and timestamp (epoch seconds) arrays of messages sent in [start, end)."""
+    chunks = []
+    for alias in message_databases():
+        rows = Message.objects.using(alias).filter(timestamp__gte=start, timestamp__lt=end).values_list(
+            'room_id', 'sender_id', EpochSeconds('timestamp')
+        )
+        for batch in batched(rows.iterator(chunk_size=CHUNK_SIZE), CHUNK_SIZE):
+            chunks.append(np.array(batch, dtype=np.float64))
+
+    if not chunks:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64)
+    data = np.concatenate(chunks)
+    return data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2]
+
+
+def load_departments():
+    """Sorted user ids of employees, and the department id of each."""
+    rows = np.array(
+        list(Employee.objects.values_list('user_id', 'department_id').iterator(chunk_size=CHUNK_SIZE)),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    order = np.argsort(rows[:, 0])
+    return rows[order, 0], rows[order, 1]
+
+
+def day_bounds(days):
+    # Local midnights from the first day to the one after the last, as
+    # epoch seconds; zoneinfo gets the DST days right.
+    tz = timezone.get_current_timezone()
+    return np.array([
+        datetime.combine(day, time(), tzinfo=tz).timestamp()
+        for day in [*days, days[-1] + timedelta(days=1)]
+    ])
+
+
+def _group_order(groups, values):
+    # Indices sorting by (groups, values), groups being non-negative ints:
+    # rank the values, then one integer sort of groups * n + rank. Several
+    # times faster than np.lexsort.
+    rank = np.empty(len(values), np.int64)
+    rank[np.argsort(values)] = np.arange(len(values))
+    return np.argsort(groups * len(values) + rank)
+
+
+def _distinct(values):
+    # Sorted distinct values; faster than np.unique for large int arrays.
+    values = np.sort(values)
+    first = np.ones(len(values), bool)
+    first[1:] = values[1:] != values[:-1]
+    return values[first]
+
+
+def _group_quantiles(values, counts, q):
+    # q-quantile of values within each group, linearly interpolated like
+    # np.quantile; values must be sorted by (group, value).
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = starts + (counts - 1) * q
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, starts + counts - 1)
+    has = counts > 0
+    low, high = np.where(has, low, 0), np.where(has, high, 0)
+    fraction = position - np.floor(position)
+    result = values[low] * (1 - fraction) + values[high] * fraction if len(values) else np.zeros(len(counts))
+    return np.where(has, result, np.nan)
+
+
+def _departments_of(users, employee_users, employee_departments):
+    # Department id of each user; -1 for users without an Employee record.
+    if not len(employee_users):
+        return np.full(len(users), -1)
+    position = np.minimum(np.searchsorted(employee_users, users), len(employee_users) - 1)
+    return np.where(employee_users[position] == users, employee_departments[position], -1)
+
+
+def compute_daily_metrics(room, sender, ts, bounds, employee_users, employee_departments, response_window):
+    """
+    Per-day metrics for the days delimited by bounds, from message arrays
+    in any order. Messages before bounds[0] only serve as the message a
+    first response of the day answers.
+    """
+    days = len(bounds) - 1
+    results = [
+        {'messages': 0, 'rooms': {}, 'responses': 0, 'latency_sum': 0.0, 'latency_median': None,
+         'latency_p90': None, 'active_users': 0, 'departments': {}}
+        for _ in range(days)
+    ]
+    if not len(ts):
+        return results
+
+    # Messages with identical timestamps in a room keep an arbitrary order.
+    order = _group_order(room, ts)
+    room, sender, ts = room[order], sender[order], ts[order]
+    day = np.searchsorted(bounds, ts, side='right') - 1
+    counted = (day >= 0) & (day < days)
+
+    # Response latency: consecutive messages in a room by different people,
+    # at most response_window apart.
+    gap = np.diff(ts)
+    responses = (
+        (room[1:] == room[:-1]) & (sender[1:] != sender[:-1]) & (gap <= response_window) & counted[1:]
+    )
+    latency, latency_day = gap[responses], day[1:][responses]
+    latency_order = _group_order(latency_day, latency)
+    latency, latency_day = latency[latency_order], latency_day[latency_order]
+    response_counts = np.bincount(latency_day, minlength=days)
+    latency_sums = np.bincount(latency_day, weights=latency, minlength=days)
+    medians = _group_quantiles(latency, response_counts, 0.5)
+    p90s = _group_quantiles(latency, response_counts, 0.9)
+
+    room, sender, day = room[counted], sender[counted], day[counted]
+    per_day = np.bincount(day, minlength=days)
+
+    # Messages per day and room: rows are already grouped by (room, day),
+    # so each run of equal pairs is one count.
+    starts = np.ones(len(room), bool)
+    starts[1:] = (room[1:] != room[:-1]) | (day[1:] != day[:-1])
+    runs = np.flatnonzero(starts)
+    counts = np.diff(np.append(runs, len(room)))
+    for key_day, key_room, count in zip(day[runs].tolist(), room[runs].tolist(), counts.tolist()):
+        results[key_day]['rooms'][key_room] = count
+
+    # Distinct senders per day, and per department of the sender.
+    active = _distinct(sender * days + day)
+    active_sender, active_day = active // days, active % days
+    active_counts = np.bincount(active_day, minlength=days)
+
+    departments = _departments_of(active_sender, employee_users, employee_departments)
+    department_ids = _distinct(departments)
+    by_department = np.bincount(
+        active_day * len(department_ids) + np.searchsorted(department_ids, departments),
+        minlength=days * len(department_ids),
+    ).reshape(days, len(department_ids))
+    for key_day, index in zip(*np.nonzero(by_department)):
+        department = int(department_ids[index])
+        results[key_day]['departments'][department if department >= 0 else None] = int(by_department[key_day, index])
+
+    for index, result in enumerate(results):
+        result['messages'] = int(per_day[index])
+        result['responses'] = int(response_counts[index])
+        result['latency_sum'] = float(latency_sums[index])
+        if response_counts[index]:
+            result['latency_median'] = round(float(medians[index]), 1)
+            result['latency_p90'] = round(float(p90s[index]), 1)
+        result['active_users'] = int(active_counts[index])
+    return results
+
+
+def day_cache_key(day):
+    return f'chat_analytics:day:{day.isoformat()}:{settings.CHAT_ANALYTICS_RESPONSE_WINDOW_SECONDS}'
+
+
+def daily_metrics(days):
+    """Per-day metrics for consecutive days, computing only the uncached ones."""
+    today = timezone.localdate()
+    keys = {day: day_cache_key(day) for day in days}
+    cached = cache.get_many(keys.values())
+    missing = [day for day in days if keys[day] not in cached]
+    if not missing:
+        return [cached[keys[day]] for day in days]
+
+    # One pass over the whole stretch of missing days.
+    span = [missing[0] + timedelta(days=offset) for offset in range((missing[-1] - missing[0]).days + 1)]
+    bounds = day_bounds(span)
+    window = settings.CHAT_ANALYTICS_RESPONSE_WINDOW_SECONDS
+    tz = timezone.get_current_timezone()
+    room, sender, ts = load_messages(
+        datetime.fromtimestamp(bounds[0] - window, tz), datetime.fromtimestamp(bounds[-1], tz)
+    )
+    results = compute_daily_metrics(room, sender, ts, bounds, *load_departments(), window)
+
+    for day, result in zip(span, results):
+        cached[keys[day]] = result
+        if day < today:
+            cache.set(keys[day], result, settings.CHAT_ANALYTICS_DAY_CACHE_SECONDS)
+        elif day == today:
+            cache.set(keys[day], result, settings.CHAT_ANALYTICS_TODAY_CACHE_SECONDS)
+    return [cached[keys[day]] for day in days]
+
+
+def chat_analytics(days=30, top_rooms=10):
+    today = timezone.localdate()
+    day_list = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    daily = daily_metrics(day_list)
+
+    room_totals = {}
+    for result in daily:
+        for room_id, count in result['rooms'].items():
+            room_totals[room_id] = room_totals.get(room_id, 0) + count
+    busiest = sorted(room_totals, key=lambda room_id: (-room_totals[room_id], room_id))[:top_rooms]
+    room_names = dict(ChatRoom.objects.filter(id__in=busiest).values_list('id', 'name'))
+
+    department_ids = {department for result in daily for department in result['departments']}
+    department_names = dict(Department.objects.filter(id__in=department_ids - {None}).values_list('id', 'name'))
+
+    responses = sum(result['responses'] for result in daily)
+    return {
+        'days': [day.isoformat() for day in day_list],
+        'messages_per_day': [result['messages'] for result in daily],
+        'top_rooms': [
+            {
+                'room_id': room_id,
+                'name': room_names.get(room_id),
+                'total': room_totals[room_id],
+                'per_day': [result['rooms'].get(room_id, 0) for result in daily],
+            }
+            for room_id in busiest
+        ],
+        'response_latency': {
+            'window_seconds': settings.CHAT_ANALYTICS_RESPONSE_WINDOW_SECONDS,
+            'mean_seconds': round(sum(result['latency_sum'] for result in daily) / responses, 1) if responses else None,
+            'per_day': [
+                {
+                    'responses': result['responses'],
+                    'median_seconds': result['latency_median'],
+                    'p90_seconds': result['latency_p90'],
+                }
+                for result in daily
+            ],
+        },
+        'active_users': {
+            'per_day': [result['active_users'] for result in daily],
+            'departments': [
+                {
+                    'id': department_id,
+                    'name': department_names.get(department_id, 'No department'),
+                    'per_day': [result['departments'].get(department_id, 0) for result in daily],
+                }
+                for department_id in sorted(department_ids, key=lambda d: department_names.get(d, '~'))
+            ],
+        },
+    }
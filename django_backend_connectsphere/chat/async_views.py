@@ -0,0 +1,240 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException, PermissionDenied
+from rest_framework.request import Request
+from accounts.authentication import CachedJWTAuthentication
+from accounts.permissions import CachedHasAPIKey
+from accounts.models import User
+from connectsphere_backend.renderers import ORJSONRenderer
+from .models import ChatRoom, Message
+from .serializers import ChatRoomSerializer, MessageSerializer
+from .pagination import CursorMessagePagination
+from .streams import hub, Subscription
+from .sharding import is_sharded, room_ordering
+from .queries import attach_last_messages, attach_readers, readers_queryset, sharded_user_messages
+from .views import ChatRoomViewSet, MessageViewSet, check_can_list_chatrooms
+
+
+class RequestRejected(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+async def authenticate(request, throttle_classes=()):
+    # Same checks as the DRF viewsets, with the same classes: a valid API
+    # key, a JWT user and the viewset's throttles, run on the loop.
+    if not await CachedHasAPIKey().ahas_permission(request, None):
+        raise RequestRejected('A valid API key is required.', 403)
+
+    try:
+        result = await CachedJWTAuthentication().aauthenticate(request)
+    except APIException as e:
+        raise RequestRejected(str(e.detail), 401)
+
+    if result is None:
+        raise RequestRejected('Authentication credentials were not provided.', 401)
+
+    user, _ = result
+    drf_request = Request(request)
+    drf_request.user = user
+    for throttle_class in throttle_classes:
+        if not await throttle_class().aallow_request(drf_request, None):
+            raise RequestRejected('Request was throttled.', 429)
+
+    return drf_request
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        ORJSONRenderer().render(data),
+        status=status,
+        content_type='application/json'
+    )
+
+
+def chatroom_queryset():
+    participants = User.objects.only('id', 'first_name', 'last_name')
+
+    # Everything the serializer touches is loaded up front: lazy queries are
+    # not allowed once we are back on the event loop. Sharded last messages
+    # are loaded afterwards by attach_last_messages.
+    chatrooms = ChatRoom.objects.filter(is_deleted=False).select_related(
+        'created_by'
+    ).prefetch_related(
+        Prefetch('participants', queryset=participants),
+    ).order_by(*room_ordering())
+
+    if is_sharded():
+        return chatrooms
+    return chatrooms.select_related('last_message__sender').prefetch_related(
+        Prefetch('last_message__read_by', queryset=participants),
+    )
+
+
+async def event_stream(subscription, last_event_id):
+    await hub.subscribe(subscription)
+    try:
+        yield f"retry: {settings.SSE_RETRY_MILLISECONDS}\n\n".encode()
+
+        if last_event_id:
+            in_window = await hub.replay(subscription, last_event_id)
+            subscription.finish_replay()
+            if not in_window:
+                yield b"event: resync\ndata: {}\n\n"
+
+        while not subscription.exhausted:
+            try:
+                _, frame = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    timeout=settings.SSE_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            yield frame
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def room_event_stream(request):
+    if request.method != 'GET':
+        return json_response({'error': 'Method not allowed.'}, status=405)
+
+    # Under WSGI Django would drain this endless generator with
+    # async_to_sync, never flushing the response and holding the worker.
+    if not isinstance(request, ASGIRequest):
+        return json_response({'error': 'The event stream is only served over ASGI.'}, status=501)
+
+    try:
+        drf_request = await authenticate(request)
+    except RequestRejected as e:
+        return json_response({'detail': e.message}, status=e.status)
+
+    user = drf_request.user
+    room_ids = [
+        room_id async for room_id in ChatRoom.objects.filter(
+            participants=user, is_deleted=False
+        ).values_list('id', flat=True)
+    ]
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    subscription = Subscription(user.id, room_ids, resuming=bool(last_event_id))
+
+    response = StreamingHttpResponse(
+        event_stream(subscription, last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def chatroom_list(request):
+    if request.method != 'GET':
+        return json_response({'error': 'Method not allowed.'}, status=405)
+
+    try:
+        drf_request = await authenticate(
+            request, ChatRoomViewSet.throttle_classes
+        )
+    except RequestRejected as e:
+        return json_response({'detail': e.message}, status=e.status)
+
+    try:
+        # The role comes with the authenticated user: no query.
+        check_can_list_chatrooms(drf_request.user)
+    except PermissionDenied as e:
+        return json_response({'detail': str(e.detail)}, status=403)
+
+    queryset = chatroom_queryset().filter(participants=drf_request.user)
+    chatrooms = [room async for room in queryset]
+    if is_sharded():
+        await sync_to_async(attach_last_messages)(chatrooms)
+    serializer = ChatRoomSerializer(chatrooms, many=True, context={'request': drf_request})
+
+    return json_response({
+        'results': serializer.data,
+        'count': len(chatrooms)
+    })
+
+
+async def chatroom_detail(request, pk):
+    if request.method != 'GET':
+        return json_response({'error': 'Method not allowed.'}, status=405)
+
+    try:
+        drf_request = await authenticate(
+            request, ChatRoomViewSet.throttle_classes
+        )
+    except RequestRejected as e:
+        return json_response({'detail': e.message}, status=e.status)
+
+    user = drf_request.user
+    chatroom = await chatroom_queryset().filter(pk=pk).afirst()
+
+    if chatroom is None:
+        return json_response({'detail': 'No ChatRoom matches the given query.'}, status=404)
+
+    if user not in chatroom.participants.all():
+        return json_response(
+            {'error': 'You are not a participant of this chatroom'},
+            status=403
+        )
+
+    if is_sharded():
+        await sync_to_async(attach_last_messages)([chatroom])
+    serializer = ChatRoomSerializer(chatroom, context={'request': drf_request})
+    return json_response(serializer.data)
+
+
+async def message_list(request):
+    if request.method != 'GET':
+        return json_response({'error': 'Method not allowed.'}, status=405)
+
+    try:
+        drf_request = await authenticate(
+            request, MessageViewSet.throttle_classes
+        )
+    except RequestRejected as e:
+        return json_response({'detail': e.message}, status=e.status)
+
+    user = drf_request.user
+    room_id = request.GET.get('room_id')
+
+    if is_sharded():
+        try:
+            messages = await sync_to_async(sharded_user_messages)(user, room_id)
+        except APIException as e:
+            return json_response(e.detail, status=e.status_code)
+
+        messages = messages.prefetch_related(
+            Prefetch('sender', queryset=readers_queryset()),
+            'room',
+            Prefetch('room__participants', queryset=User.objects.only('id')),
+        ).order_by('-timestamp')
+    else:
+        messages = Message.objects.filter(room__participants=user)
+        if room_id:
+            messages = messages.filter(room_id=room_id)
+
+        messages = messages.select_related('sender', 'room').prefetch_related(
+            Prefetch('read_by', queryset=User.objects.only('id', 'first_name', 'last_name')),
+            Prefetch('room__participants', queryset=User.objects.only('id')),
+        ).order_by('-timestamp')
+
+    paginator = CursorMessagePagination()
+    if is_sharded():
+        # Shard queries and read receipts are fetched by sync helpers.
+        page = await sync_to_async(paginator.paginate_queryset)(messages, drf_request)
+        await sync_to_async(attach_readers)(page)
+    else:
+        page = await paginator.apaginate_queryset(messages, drf_request)
+    serializer = MessageSerializer(page, many=True, context={'request': drf_request})
+
+    return json_response(paginator.get_paginated_response(serializer.data).data)
@@ -0,0 +1,32 @@
+import logging
+import redis
+from django.conf import settings
+from connectsphere_backend.redis_client import redis_client
+from connectsphere_backend.renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+# Every event published for the Socket.IO relay is also appended to this
+# capped Redis stream, so ASGI subscribers can replay what they missed.
+EVENT_STREAM_KEY = 'chat:events'
+
+
+def publish_event(channel, event, room_id, data):
+    payload = dumps({
+        'event': event,
+        'roomId': str(room_id),
+        'data': data
+    })
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.publish(channel, payload)
+        pipe.xadd(
+            EVENT_STREAM_KEY,
+            {'payload': payload},
+            maxlen=settings.CHAT_EVENT_STREAM_MAXLEN,
+            approximate=True
+        )
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Redis publish failed: {e}")
@@ -0,0 +1,70 @@
+from django.utils import timezone
+from accounts.models import User
+from chat.models import ChatRoom, Message
+from chat.serializers import ChatRoomSerializer, MessageSerializer
+
+
+def prefetched(model, objects):
+    # A queryset that already holds its rows, as prefetch_related leaves it.
+    queryset = model.objects.none()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    return queryset
+
+
+def add_payload_arguments(parser):
+    parser.add_argument('--rooms', type=int, default=20, help='Rooms in the room list payload.')
+    parser.add_argument('--participants', type=int, default=8, help='Participants per room.')
+    parser.add_argument('--messages', type=int, default=50, help='Messages in the message page payload.')
+    parser.add_argument('--readers', type=int, default=5, help='read_by users per message.')
+
+
+def sample_payloads(options):
+    """
+    ChatRoomViewSet.list and MessageViewSet.list response bodies, produced by
+    the real serializers over in-memory instances.
+    """
+    now = timezone.now()
+    users = [
+        User(id=i, first_name=f'First{i}', last_name=f'Last{i}', email=f'user{i}@example.com')
+        for i in range(1, max(options['participants'], options['readers']) + 2)
+    ]
+    me = users[0]
+
+    rooms = []
+    for room_id in range(1, options['rooms'] + 1):
+        room = ChatRoom(
+            id=room_id, name=f'Project room {room_id}', type='GROUP',
+            created_by=me, created_at=now, is_active=True
+        )
+        room._prefetched_objects_cache = {'participants': prefetched(User, users[:options['participants']])}
+        last_message = Message(
+            id=room_id * 1000, room=room, sender=users[1],
+            content='Sounds good, I will push the changes tonight.', timestamp=now
+        )
+        last_message._prefetched_objects_cache = {'read_by': prefetched(User, users[:options['readers']])}
+        room.last_message = last_message
+        rooms.append(room)
+
+    messages = []
+    for message_id in range(1, options['messages'] + 1):
+        message = Message(
+            id=message_id, room=rooms[0], sender=users[message_id % len(users)],
+            content=f'Message number {message_id} with a realistic amount of chat text in it.',
+            timestamp=now, is_sent=True, is_delivered=True
+        )
+        message._prefetched_objects_cache = {'read_by': prefetched(User, users[:options['readers']])}
+        messages.append(message)
+
+    request = type('Request', (), {'user': me})()
+    return {
+        'rooms list': {
+            'results': ChatRoomSerializer(rooms, many=True, context={'request': request}).data,
+            'count': len(rooms),
+        },
+        'messages page': {
+            'next': '/api/chat/messages/?cursor=cD0yMDI1LTAx&room_id=1',
+            'previous': None,
+            'results': MessageSerializer(messages, many=True).data,
+        },
+    }
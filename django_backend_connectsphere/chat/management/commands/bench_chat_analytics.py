@@ -0,0 +1,174 @@
+import bisect
+import math
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from chat.analytics import compute_daily_metrics, day_bounds, load_departments, load_messages
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the vectorised chat analytics on synthetic messages "
+        "(10M by default, generated in memory with the shape of real chat: "
+        "bursts of replies in rooms of a few participants, a few busy rooms "
+        "and many quiet ones) against the same metrics computed row by row "
+        "in Python, which runs on a sample and is extrapolated. Both are "
+        "checked to agree on the sample. With --database, also time loading "
+        "and computing the last --days days from the message databases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10_000_000)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--rooms', type=int, default=20_000)
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--departments', type=int, default=40)
+        parser.add_argument('--python-sample', type=int, default=1_000_000,
+                            help='Messages the row-by-row baseline runs on (0 to skip it).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['messages'] < 1 or options['days'] < 1:
+            raise CommandError("--messages and --days must be positive")
+        window = settings.CHAT_ANALYTICS_RESPONSE_WINDOW_SECONDS
+        today = timezone.localdate()
+        days = [today - timedelta(days=offset) for offset in range(options['days'] - 1, -1, -1)]
+        bounds = day_bounds(days)
+
+        started = time.perf_counter()
+        room, sender, ts, employee_users, employee_departments = self.synthetic(options, bounds)
+        self.stdout.write(
+            f"{len(ts):,} messages over {len(days)} days generated in {time.perf_counter() - started:.1f}s"
+        )
+
+        started = time.perf_counter()
+        compute_daily_metrics(room, sender, ts, bounds, employee_users, employee_departments, window)
+        vectorised = time.perf_counter() - started
+        self.stdout.write(f"vectorised: {vectorised:.2f}s, {len(ts) / vectorised:,.0f} messages/s")
+
+        sample = min(options['python_sample'], len(ts))
+        if sample:
+            # A random sample keeps the mix of rooms and days of the full set.
+            picked = np.random.default_rng(options['seed']).choice(len(ts), sample, replace=False)
+            args = (room[picked], sender[picked], ts[picked])
+            departments = dict(zip(employee_users.tolist(), employee_departments.tolist()))
+
+            started = time.perf_counter()
+            expected = python_daily_metrics(*args, bounds.tolist(), departments, window)
+            baseline = (time.perf_counter() - started) * len(ts) / sample
+            actual = compute_daily_metrics(*args, bounds, employee_users, employee_departments, window)
+            self.check_equal(expected, actual)
+            self.stdout.write(
+                f"row by row: {baseline:.2f}s (extrapolated from {sample:,} messages), "
+                f"{baseline / vectorised:.1f}x slower; results match on the sample"
+            )
+
+        if options['database']:
+            tz = timezone.get_current_timezone()
+            started = time.perf_counter()
+            room, sender, ts = load_messages(
+                datetime.fromtimestamp(bounds[0] - window, tz),
+                datetime.fromtimestamp(bounds[-1], tz),
+            )
+            employees = load_departments()
+            loaded = time.perf_counter() - started
+            compute_daily_metrics(room, sender, ts, bounds, *employees, window)
+            self.stdout.write(
+                f"database: {len(ts):,} messages loaded in {loaded:.2f}s, "
+                f"computed in {time.perf_counter() - started - loaded:.2f}s"
+            )
+
+    def synthetic(self, options, bounds):
+        rng = np.random.default_rng(options['seed'])
+        total, rooms, users = options['messages'], options['rooms'], options['users']
+
+        # Conversations of ~10 messages a couple of minutes apart, started at
+        # random times in rooms picked with a heavy tail of activity.
+        lengths = rng.geometric(0.1, size=total // 5)
+        lengths = lengths[:np.searchsorted(np.cumsum(lengths), total) + 1]
+        lengths[-1] -= lengths.sum() - total
+        lengths = lengths[lengths > 0]
+        activity = rng.pareto(1.2, rooms) + 1
+        thread_room = rng.choice(rooms, len(lengths), p=activity / activity.sum())
+        thread_start = rng.uniform(bounds[0], bounds[-1], len(lengths))
+
+        thread = np.repeat(np.arange(len(lengths)), lengths)
+        gaps = rng.exponential(120.0, total)
+        elapsed = np.cumsum(gaps)
+        first = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        offsets = elapsed - elapsed[first][thread] + gaps[first][thread]
+
+        participants = rng.integers(1, users + 1, size=(rooms, 8))
+        room = thread_room[thread] + 1
+        sender = participants[room - 1, rng.integers(0, 8, total)]
+        # Conversations running past the last day wrap round to the first.
+        ts = bounds[0] + (thread_start[thread] + offsets - bounds[0]) % (bounds[-1] - bounds[0])
+
+        # Most users are employees; the rest have no department.
+        employee_users = np.sort(rng.choice(np.arange(1, users + 1), int(users * 0.9), replace=False))
+        employee_departments = rng.integers(1, options['departments'] + 1, len(employee_users))
+
+        order = rng.permutation(total)
+        return room[order], sender[order], ts[order], employee_users, employee_departments
+
+    def check_equal(self, expected, actual):
+        for day, (want, got) in enumerate(zip(expected, actual)):
+            for key in want:
+                same = (
+                    math.isclose(want[key], got[key], rel_tol=1e-9)
+                    if key == 'latency_sum' else want[key] == got[key]
+                )
+                if not same:
+                    raise CommandError(f"day {day}: {key} differs: {want[key]!r} != {got[key]!r}")
+
+
+def _quantile(values, q):
+    position = (len(values) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    fraction = position - low
+    return values[low] * (1 - fraction) + values[high] * fraction
+
+
+def python_daily_metrics(room, sender, ts, bounds, departments, window):
+    # The same metrics as compute_daily_metrics, one message at a time.
+    days = len(bounds) - 1
+    rooms = [{} for _ in range(days)]
+    latencies = [[] for _ in range(days)]
+    active = [set() for _ in range(days)]
+
+    previous = None
+    for message_room, message_ts, message_sender in sorted(zip(room.tolist(), ts.tolist(), sender.tolist())):
+        day = bisect.bisect_right(bounds, message_ts) - 1
+        if 0 <= day < days:
+            rooms[day][message_room] = rooms[day].get(message_room, 0) + 1
+            active[day].add(message_sender)
+            if (
+                previous and previous[0] == message_room and previous[1] != message_sender
+                and message_ts - previous[2] <= window
+            ):
+                latencies[day].append(message_ts - previous[2])
+        previous = (message_room, message_sender, message_ts)
+
+    results = []
+    for day in range(days):
+        values = sorted(latencies[day])
+        per_department = {}
+        for user in active[day]:
+            department = departments.get(user)
+            per_department[department] = per_department.get(department, 0) + 1
+        results.append({
+            'messages': sum(rooms[day].values()),
+            'rooms': rooms[day],
+            'responses': len(values),
+            'latency_sum': sum(values),
+            'latency_median': round(_quantile(values, 0.5), 1) if values else None,
+            'latency_p90': round(_quantile(values, 0.9), 1) if values else None,
+            'active_users': len(active[day]),
+            'departments': per_department,
+        })
+    return results
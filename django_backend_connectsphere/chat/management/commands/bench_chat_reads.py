@@ -0,0 +1,80 @@
+import time
+import statistics
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+
+READ_PATHS = {
+    'rooms': ('/api/chat/rooms/', '/api/chat/async/rooms/'),
+    'room': ('/api/chat/rooms/{room_id}/', '/api/chat/async/rooms/{room_id}/'),
+    'messages': ('/api/chat/messages/?room_id={room_id}', '/api/chat/async/messages/?room_id={room_id}'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the chat read endpoints on a WSGI and an ASGI deployment "
+        "running the same number of workers, e.g.\n"
+        "  gunicorn -w 4 connectsphere_backend.wsgi --bind :8000\n"
+        "  gunicorn -w 4 -k uvicorn.workers.UvicornWorker "
+        "connectsphere_backend.asgi:application --bind :8001\n"
+        "and report requests per second and latency percentiles for each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001')
+        parser.add_argument('--token', required=True, help='JWT access token of a room participant.')
+        parser.add_argument('--api-key', required=True)
+        parser.add_argument('--room-id', type=int, required=True)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--endpoints', nargs='+', choices=READ_PATHS, default=list(READ_PATHS))
+
+    def handle(self, *args, **options):
+        headers = {
+            'Authorization': f"Bearer {options['token']}",
+            'X-Api-Key': options['api_key'],
+        }
+
+        self.stdout.write(
+            f"{options['requests']} requests per run, concurrency {options['concurrency']}"
+        )
+        self.stdout.write(f"{'endpoint':<10} {'server':<6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+
+        for name in options['endpoints']:
+            for server, base_url, path in (
+                ('wsgi', options['wsgi_url'], READ_PATHS[name][0]),
+                ('asgi', options['asgi_url'], READ_PATHS[name][1]),
+            ):
+                url = base_url.rstrip('/') + path.format(room_id=options['room_id'])
+                rps, p50, p99, errors = self.run(url, headers, options['requests'], options['concurrency'])
+                self.stdout.write(f"{name:<10} {server:<6} {rps:>9.1f} {p50:>8.1f} {p99:>8.1f} {errors:>7}")
+
+    def run(self, url, headers, total, concurrency):
+        def fetch(_):
+            request = urllib.request.Request(url, headers=headers)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - started, ok
+
+        # Warm up connections, caches and the ORM before timing anything.
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch, range(concurrency)))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+        return total / elapsed, statistics.median(latencies), p99, errors
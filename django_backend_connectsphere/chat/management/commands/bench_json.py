@@ -0,0 +1,61 @@
+import io
+import json
+import timeit
+import datetime
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from connectsphere_backend.parsers import ORJSONParser
+from connectsphere_backend.renderers import ORJSONRenderer, dumps
+from ._payloads import add_payload_arguments, sample_payloads
+
+
+def stdlib_event_dumps(payload):
+    # What the publishers did before: json.dumps with an isoformat fallback.
+    def default(obj):
+        if isinstance(obj, datetime.datetime):
+            return obj.isoformat()
+        raise TypeError(f"Type {type(obj)} not serializable")
+    return json.dumps(payload, default=default)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer/JSONParser and the stdlib event encoding "
+        "with the orjson versions on ChatRoomSerializer and MessageSerializer "
+        "payloads. Builds model instances in memory; no database needed."
+    )
+
+    def add_arguments(self, parser):
+        add_payload_arguments(parser)
+        parser.add_argument('--number', type=int, default=500, help='Iterations per measurement.')
+
+    def handle(self, *args, **options):
+        payloads = sample_payloads(options)
+
+        number = options['number']
+        self.stdout.write(f"{'payload':<14} {'operation':<14} {'stdlib us':>10} {'orjson us':>10} {'speedup':>8}")
+
+        for name, payload in payloads.items():
+            stdlib_bytes = JSONRenderer().render(payload)
+            orjson_bytes = ORJSONRenderer().render(payload)
+            if json.loads(stdlib_bytes) != json.loads(orjson_bytes):
+                self.stderr.write(f"{name}: orjson output differs from JSONRenderer")
+
+            event = {'event': 'room_created', 'roomId': '1', 'data': payload['results'][0]}
+            cases = [
+                ('render', lambda: JSONRenderer().render(payload), lambda: ORJSONRenderer().render(payload)),
+                ('parse', lambda: JSONParser().parse(io.BytesIO(stdlib_bytes)),
+                          lambda: ORJSONParser().parse(io.BytesIO(stdlib_bytes))),
+                ('event encode', lambda: stdlib_event_dumps(event), lambda: dumps(event)),
+            ]
+
+            for operation, baseline, candidate in cases:
+                baseline_us = timeit.timeit(baseline, number=number) / number * 1e6
+                candidate_us = timeit.timeit(candidate, number=number) / number * 1e6
+                self.stdout.write(
+                    f"{name:<14} {operation:<14} {baseline_us:>10.1f} {candidate_us:>10.1f} "
+                    f"{baseline_us / candidate_us:>7.1f}x"
+                )
+
+            self.stdout.write(f"{name:<14} {'size bytes':<14} {len(stdlib_bytes):>10} {len(orjson_bytes):>10}")
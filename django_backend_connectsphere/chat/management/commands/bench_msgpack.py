@@ -0,0 +1,53 @@
+import gzip
+import timeit
+import msgpack
+import orjson
+from django.core.management.base import BaseCommand
+from connectsphere_backend.renderers import ORJSONRenderer, MessagePackRenderer
+from ._payloads import add_payload_arguments, sample_payloads
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare JSON and MessagePack responses for ChatRoomViewSet.list and "
+        "MessageViewSet.list: body size (raw and gzipped), server-side render "
+        "time and client-side decode time."
+    )
+
+    def add_arguments(self, parser):
+        add_payload_arguments(parser)
+        parser.add_argument('--number', type=int, default=500, help='Iterations per measurement.')
+
+    def handle(self, *args, **options):
+        payloads = sample_payloads(options)
+        number = options['number']
+
+        self.stdout.write(
+            f"{'payload':<14} {'format':<8} {'bytes':>7} {'gzip':>7} {'render us':>10} {'decode us':>10}"
+        )
+
+        for name, payload in payloads.items():
+            json_body = ORJSONRenderer().render(payload)
+            msgpack_body = MessagePackRenderer().render(payload)
+            if msgpack.unpackb(msgpack_body, raw=False) != orjson.loads(json_body):
+                self.stderr.write(f"{name}: MessagePack body differs from the JSON body")
+
+            rows = []
+            for label, renderer, body, decode in (
+                ('json', ORJSONRenderer(), json_body, orjson.loads),
+                ('msgpack', MessagePackRenderer(), msgpack_body, lambda b: msgpack.unpackb(b, raw=False)),
+            ):
+                render_us = timeit.timeit(lambda: renderer.render(payload), number=number) / number * 1e6
+                decode_us = timeit.timeit(lambda: decode(body), number=number) / number * 1e6
+                rows.append((label, len(body), len(gzip.compress(body)), render_us, decode_us))
+
+            for label, size, gzipped, render_us, decode_us in rows:
+                self.stdout.write(
+                    f"{name:<14} {label:<8} {size:>7} {gzipped:>7} {render_us:>10.1f} {decode_us:>10.1f}"
+                )
+
+            (_, json_size, _, json_render, json_decode), (_, mp_size, _, mp_render, mp_decode) = rows
+            self.stdout.write(
+                f"{name:<14} {'saving':<8} {1 - mp_size / json_size:>7.0%} {'':>7} "
+                f"{1 - mp_render / json_render:>10.0%} {1 - mp_decode / json_decode:>10.0%}"
+            )
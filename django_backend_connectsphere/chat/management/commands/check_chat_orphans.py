@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from accounts.models import User
+from connectsphere_backend.exports import batched
+from chat.models import ChatRoom, Message
+from chat.sharding import PRIMARY, shard_databases
+
+
+class Command(BaseCommand):
+    help = (
+        "Find chat rows pointing at rows that no longer exist, which the "
+        "database doesn't prevent: messages may live on other databases "
+        "(see chat/sharding.py), so their foreign keys have no constraints. "
+        "Reports messages whose room or sender is gone, read receipts whose "
+        "message or user is gone, and rooms whose last message is gone. "
+        "Run it daily (e.g. from cron). With --delete, remove the "
+        "messages and receipts and clear the rooms' last message. Exits "
+        "with an error when orphans are left."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true')
+
+    def handle(self, *args, **options):
+        MessageRead = Message.read_by.through
+        room_ids = set(ChatRoom.objects.using(PRIMARY).values_list('id', flat=True))
+        user_ids = set(User.objects.using(PRIMARY).values_list('id', flat=True))
+        found = 0
+
+        for alias in shard_databases():
+            messages = Message.objects.using(alias)
+            rooms = set(messages.values_list('room_id', flat=True).distinct().order_by()) - room_ids
+            senders = set(messages.values_list('sender_id', flat=True).distinct().order_by()) - user_ids
+            orphans = messages.filter(Q(room_id__in=rooms) | Q(sender_id__in=senders))
+
+            receipts = MessageRead.objects.using(alias)
+            readers = set(receipts.values_list('user_id', flat=True).distinct().order_by()) - user_ids
+            orphan_receipts = (
+                receipts.filter(~Q(message_id__in=messages.values('id')) | Q(user_id__in=readers))
+            )
+
+            counts = (orphans.count(), orphan_receipts.count())
+            found += sum(counts)
+            self.stdout.write(
+                f"{alias}: {counts[0]} messages without their room or sender, "
+                f"{counts[1]} read receipts without their message or user"
+            )
+            if options['delete'] and any(counts):
+                with transaction.atomic(using=alias):
+                    # Receipts of the orphaned messages first, or they'd be left behind.
+                    receipts.filter(message_id__in=orphans.values('id')).delete()
+                    orphan_receipts.delete()
+                    orphans._raw_delete(alias)
+
+        # A room's last message may be on any shard while rooms move.
+        last_messages = dict(
+            ChatRoom.objects.using(PRIMARY).filter(last_message_id__isnull=False).values_list('last_message_id', 'id')
+        )
+        for batch in batched(list(last_messages), 10000):
+            for alias in shard_databases():
+                for message_id in Message.objects.using(alias).filter(id__in=batch).values_list('id', flat=True):
+                    last_messages.pop(message_id, None)
+        found += len(last_messages)
+        self.stdout.write(f"{PRIMARY}: {len(last_messages)} rooms whose last message is gone")
+        if options['delete'] and last_messages:
+            for batch in batched(list(last_messages.values()), 10000):
+                ChatRoom.objects.using(PRIMARY).filter(id__in=batch).update(last_message=None)
+
+        if options['delete']:
+            self.stdout.write(self.style.SUCCESS(f"{found} orphaned rows removed or cleared."))
+        elif found:
+            raise CommandError(f"{found} orphaned rows; run with --delete to remove them.")
+        else:
+            self.stdout.write(self.style.SUCCESS("No orphaned rows."))
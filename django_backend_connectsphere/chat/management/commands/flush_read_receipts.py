@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from chat.receipts import flush_due_reads
+
+
+class Command(BaseCommand):
+    help = (
+        "Write read receipts merged by mark_as_read whose coalescing window "
+        "has closed. mark_as_read requests flush them too, but a pair nobody "
+        "marks again waits for this: run it with --interval 1 as a "
+        "long-lived process next to the web workers, or from cron without "
+        "(merged receipts then land up to a cron period late)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, sweeping every this many seconds.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        while True:
+            written = 0
+            while True:
+                flushed = flush_due_reads(limit=options['batch_size'])
+                written += flushed
+                if flushed < options['batch_size']:
+                    break
+            if written or not options['interval']:
+                self.stdout.write(f"{written} pending read receipts written")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
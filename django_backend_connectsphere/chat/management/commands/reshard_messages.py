@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from chat.models import ChatRoom, Message
+from chat.sharding import PRIMARY, shard_for_room
+
+
+def alias_list(value):
+    return [alias for alias in value.split(',') if alias]
+
+
+class Command(BaseCommand):
+    help = (
+        "Move chat rooms' messages and read receipts between message shards "
+        "when the hash ring changes. Rooms are moved in batches; the copy is "
+        "an upsert, so it can be re-run at any time.\n\n"
+        "To add a shard: add its host to CHAT_MESSAGE_SHARD_HOSTS but keep "
+        "CHAT_MESSAGE_SHARDS on the current ring, run migrate --database for "
+        "it, then\n"
+        "  reshard_messages --to default,messages_1,messages_2\n"
+        "switch CHAT_MESSAGE_SHARDS to the new ring and deploy, run the same "
+        "command with --from set to the old ring to catch up writes made "
+        "meanwhile, and finally once more with --cleanup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='source', type=alias_list,
+                            help='Ring the rooms are placed on now (default: CHAT_MESSAGE_SHARDS).')
+        parser.add_argument('--to', dest='target', type=alias_list,
+                            help='Ring to place rooms on (default: CHAT_MESSAGE_SHARDS).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete moved rooms from their old shard instead of copying.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        source = options['source'] or settings.CHAT_MESSAGE_SHARDS
+        target = options['target'] or settings.CHAT_MESSAGE_SHARDS
+        if source == target:
+            raise CommandError("--from and --to describe the same ring; nothing to move.")
+
+        unknown = set(source + target) - set(settings.DATABASES)
+        if unknown:
+            raise CommandError(f"Not configured in DATABASES: {', '.join(sorted(unknown))}")
+
+        if options['cleanup'] and target != settings.CHAT_MESSAGE_SHARDS:
+            raise CommandError("Only clean up once CHAT_MESSAGE_SHARDS is the new ring (--to).")
+
+        self.batch_size = options['batch_size']
+
+        if not options['cleanup'] and not options['dry_run']:
+            self.backfill_last_message_at(source)
+
+        moves = {}
+        room_ids = ChatRoom.objects.using(PRIMARY).order_by('id').values_list('id', flat=True)
+        for room_id in room_ids.iterator(chunk_size=self.batch_size):
+            old, new = shard_for_room(room_id, source), shard_for_room(room_id, target)
+            if old != new:
+                moves.setdefault((old, new), []).append(room_id)
+
+        for (old, new), rooms in sorted(moves.items()):
+            self.stdout.write(f"{old} -> {new}: {len(rooms)} rooms")
+            if options['dry_run']:
+                continue
+
+            moved = 0
+            for room_id in rooms:
+                if options['cleanup']:
+                    moved += self.delete_room(old, room_id)
+                else:
+                    moved += self.copy_room(old, new, room_id)
+            action = 'deleted from' if options['cleanup'] else 'copied from'
+            self.stdout.write(f"  {moved} messages {action} {old}")
+
+        if not moves:
+            self.stdout.write("No rooms change shard.")
+
+    def backfill_last_message_at(self, ring):
+        # Rooms are ordered by last_message_at once sharded; fill it in for
+        # rooms whose last message predates the column.
+        rooms = list(ChatRoom.objects.using(PRIMARY).filter(
+            last_message__isnull=False, last_message_at__isnull=True
+        ).only('id', 'last_message_id'))
+
+        for start in range(0, len(rooms), self.batch_size):
+            batch = rooms[start:start + self.batch_size]
+            by_shard = {}
+            for room in batch:
+                by_shard.setdefault(shard_for_room(room.id, ring), []).append(room.last_message_id)
+
+            timestamps = {}
+            for alias, ids in by_shard.items():
+                timestamps.update(
+                    Message.objects.using(alias).filter(id__in=ids).values_list('id', 'timestamp')
+                )
+            for room in batch:
+                room.last_message_at = timestamps.get(room.last_message_id)
+            ChatRoom.objects.using(PRIMARY).bulk_update(batch, ['last_message_at'])
+
+        if rooms:
+            self.stdout.write(f"Backfilled last_message_at for {len(rooms)} rooms")
+
+    def copy_room(self, old, new, room_id):
+        MessageRead = Message.read_by.through
+        fields = [f.name for f in Message._meta.concrete_fields if not f.primary_key]
+        copied, last_id = 0, 0
+
+        while True:
+            batch = list(
+                Message.objects.using(old).filter(room_id=room_id, id__gt=last_id).order_by('id')[:self.batch_size]
+            )
+            if not batch:
+                return copied
+
+            ids = [message.id for message in batch]
+            reads = [
+                MessageRead(message_id=message_id, user_id=user_id)
+                for message_id, user_id in MessageRead.objects.using(old).filter(
+                    message_id__in=ids
+                ).values_list('message_id', 'user_id')
+            ]
+
+            with transaction.atomic(using=new):
+                # Upsert so re-runs pick up edits and deletions made on the
+                # old shard since the previous copy.
+                Message.objects.using(new).bulk_create(
+                    batch, update_conflicts=True, unique_fields=['id'], update_fields=fields
+                )
+                MessageRead.objects.using(new).bulk_create(reads, ignore_conflicts=True)
+
+            copied += len(batch)
+            last_id = ids[-1]
+
+    def delete_room(self, old, room_id):
+        MessageRead = Message.read_by.through
+        deleted = 0
+
+        while True:
+            ids = list(
+                Message.objects.using(old).filter(room_id=room_id).order_by('id').values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return deleted
+
+            with transaction.atomic(using=old):
+                MessageRead.objects.using(old).filter(message_id__in=ids).delete()
+                # A raw delete: the collector would also null out
+                # ChatRoom.last_message for rooms stored on this database,
+                # but those rows point at the copy on the new shard.
+                Message.objects.using(old).filter(id__in=ids)._raw_delete(old)
+
+            deleted += len(ids)
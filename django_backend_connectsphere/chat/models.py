@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from .sharding import is_sharded, shard_for_room, allocate_message_id
 
 class ChatRoom(models.Model):
     CHAT_TYPES = [
@@ -28,13 +29,18 @@ class ChatRoom(models.Model):
     last_restore_at = models.DateTimeField(null=True, blank=True)
     participants_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
 
+    # Messages may live on another database (see chat/sharding.py), so the
+    # foreign keys between them and the primary's tables are never enforced
+    # by the database: check_chat_orphans finds what they would have caught.
     last_message = models.ForeignKey(
         'Message', 
         on_delete=models.SET_NULL, 
         null=True, 
         blank=True, 
-        related_name='chatroom_last_message'
+        related_name='chatroom_last_message',
+        db_constraint=False
     )
+    last_message_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -49,10 +55,11 @@ class ChatRoom(models.Model):
         return f"{self.name} ({self.type})" if self.name else f"ChatRoom {self.id} ({self.type})"
 
 class Message(models.Model):
-    room = models.ForeignKey(ChatRoom,related_name="message", on_delete=models.CASCADE,db_index=True)
+    room = models.ForeignKey(ChatRoom,related_name="message", on_delete=models.CASCADE,db_index=True,db_constraint=False)
     sender = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_constraint=False
     )
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True,db_index=True)
@@ -68,12 +75,67 @@ class Message(models.Model):
 
     is_delivered = models.BooleanField(default=False)
     is_sent = models.BooleanField(default=False)
-    read_by = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='read_messages', blank=True,db_index=True)
+    read_by = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='read_messages', blank=True,db_index=True,db_constraint=False)
 
 
     def __str__(self):
         return f"Message {self.id} in {self.room.name} by {self.sender.username}"
 
+    def save(self, *args, **kwargs):
+        if is_sharded():
+            # Always the room's shard, even when a manager passes its own
+            # database (create() does).
+            kwargs['using'] = shard_for_room(self.room_id)
+            if self.pk is None:
+                self.pk = allocate_message_id()
+                kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+
+# Message counts per room and per sender per local day, kept up to date by
+# the rollup_chat_activity command (see chat/activity.py) so activity
+# dashboards read these instead of chat_message. They live on the primary
+# even when messages are sharded.
+
+class RoomActivity(models.Model):
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='activity')
+    day = models.DateField()
+    message_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'day'], name='room_activity_room_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='room_activity_day_idx'),
+        ]
+
+class UserActivity(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_activity')
+    day = models.DateField()
+    # The sender's department when the day was first rolled up, so moving
+    # departments doesn't rewrite past activity.
+    department = models.ForeignKey('employees.Department', on_delete=models.SET_NULL, null=True, blank=True)
+    message_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='user_activity_user_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'department'], name='user_activity_day_dept_idx'),
+        ]
+
+class RollupWatermark(models.Model):
+    # How far a rollup has got: every message with an id up to
+    # last_message_id is counted, and so is every message sent before
+    # covered_until.
+    name = models.CharField(max_length=50, unique=True)
+    last_message_id = models.BigIntegerField(default=0)
+    covered_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_message_id}"
+
 # class MessageRead(models.Model):
 #     message = models.ForeignKey(Message, on_delete=models.CASCADE)
 #     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -2,6 +2,7 @@ from rest_framework.pagination import PageNumberPagination
 # from rest_framework.response import Response
 from rest_framework.pagination import CursorPagination
 from urllib.parse import urlparse
+from .sharding import room_ordering
 
 # class CustomPagination(PageNumberPagination):
 #     page_size = 10 
@@ -29,8 +30,40 @@ from urllib.parse import urlparse
 #             'results': data
 #         })
 
+class _PageQuery:
+    # Stands in for the queryset while CursorPagination.paginate_queryset()
+    # runs: records the page's query when it slices, and hands back the
+    # rows if they have been fetched already.
+    def __init__(self, queryset, page):
+        self.queryset = queryset
+        self.page = page
+
+    def order_by(self, *fields):
+        return _PageQuery(self.queryset.order_by(*fields), self.page)
+
+    def filter(self, *args, **kwargs):
+        return _PageQuery(self.queryset.filter(*args, **kwargs), self.page)
+
+    def __getitem__(self, index):
+        self.page['query'] = self.queryset[index]
+        return self.page.get('rows', [])
+
+
 class BaseCursorPagination(CursorPagination):
     page_size = 10 
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, fetching the page through the
+        async ORM: a first pass only works out the page's query, the second
+        sets up the page from the rows.
+        """
+        page = {}
+        self.paginate_queryset(_PageQuery(queryset, page), request, view)
+        if 'query' not in page:
+            return None
+        page['rows'] = [row async for row in page['query']]
+        return self.paginate_queryset(_PageQuery(queryset, page), request, view)
     
     def _make_relative_url(self, link):
         if not link:
@@ -54,4 +87,7 @@ class CursorMessagePagination(BaseCursorPagination):
 
 class CursorChatroomPagination(BaseCursorPagination):
     ordering = ('-last_message__timestamp','-created_at', '-id')  
+
+    def get_ordering(self, request, queryset, view):
+        return room_ordering()
     # page_size = 6  # Uncomment to override default page size for this class
\ No newline at end of file
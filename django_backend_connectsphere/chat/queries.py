@@ -0,0 +1,237 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+from django.db.models import F, Prefetch, prefetch_related_objects
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from accounts.models import User
+from connectsphere_backend.exports import batched, pinned
+from .models import ChatRoom, Message
+from .sharding import is_sharded, message_db, message_shards, shard_for_room
+
+# Helpers for sharded messages (chat/sharding.py). A message's read
+# receipts live on its shard while the users live on the primary, so
+# Django can't join them; these fetch each side separately.
+
+
+def readers_queryset():
+    return User.objects.only('id', 'first_name', 'last_name')
+
+
+def attach_readers(messages):
+    """
+    Load read_by for messages from any shard into the prefetch cache, so
+    message.read_by.all() needs no further queries.
+    """
+    MessageRead = Message.read_by.through
+    ids_by_db = defaultdict(list)
+    for message in messages:
+        ids_by_db[message._state.db].append(message.pk)
+
+    pairs = []
+    for db, ids in ids_by_db.items():
+        pairs.extend(
+            MessageRead.objects.using(db).filter(message_id__in=ids).values_list('message_id', 'user_id')
+        )
+
+    users = readers_queryset().in_bulk({user_id for _, user_id in pairs})
+    readers = defaultdict(list)
+    for message_id, user_id in pairs:
+        if user_id in users:
+            readers[message_id].append(users[user_id])
+
+    for message in messages:
+        queryset = message.read_by.all()
+        queryset._result_cache = readers[message.pk]
+        queryset._prefetch_done = True
+        if not hasattr(message, '_prefetched_objects_cache'):
+            message._prefetched_objects_cache = {}
+        message._prefetched_objects_cache['read_by'] = queryset
+
+
+def message_readers(message):
+    if is_sharded() and 'read_by' not in getattr(message, '_prefetched_objects_cache', {}):
+        attach_readers([message])
+    return message.read_by.all()
+
+
+def attach_last_messages(rooms):
+    """
+    Load each room's last_message (with sender and readers) from the
+    room's shard; the sharded stand-in for select_related('last_message').
+    """
+    ids_by_db = defaultdict(list)
+    for room in rooms:
+        if room.last_message_id:
+            ids_by_db[shard_for_room(room.pk)].append(room.last_message_id)
+
+    messages = {}
+    for db, ids in ids_by_db.items():
+        messages.update(Message.objects.using(db).in_bulk(ids))
+
+    prefetch_related_objects(list(messages.values()), Prefetch('sender', queryset=readers_queryset()))
+    attach_readers(list(messages.values()))
+
+    field = ChatRoom._meta.get_field('last_message')
+    for room in rooms:
+        field.set_cached_value(room, messages.get(room.last_message_id))
+
+
+def find_message(message_id, room_id=None):
+    if not is_sharded():
+        return Message.objects.get(id=message_id)
+
+    # Look on the room's shard first; the others only matter if the
+    # caller's room_id is wrong.
+    shards = list(message_shards())
+    try:
+        shards.sort(key=lambda alias: alias != shard_for_room(room_id))
+    except (TypeError, ValueError):
+        pass
+
+    for alias in shards:
+        try:
+            return Message.objects.using(alias).get(id=message_id)
+        except Message.DoesNotExist:
+            continue
+    raise Message.DoesNotExist('Message matching query does not exist.')
+
+
+class ShardedMessages:
+    """
+    Messages from several shards, queried like one queryset by the
+    paginators: filter(), order_by() and prefetch_related() apply to every
+    shard, and a slice [start:stop] reads at most `stop` rows from each
+    shard and merges them in order. Orderings must go one way (all
+    ascending or all descending); nulls sort as the largest value, as
+    PostgreSQL does by default.
+    """
+    model = Message
+
+    def __init__(self, querysets, ordering=()):
+        self.querysets = querysets
+        self.ordering = ordering
+
+    def _apply(self, method, *args, **kwargs):
+        return ShardedMessages([getattr(queryset, method)(*args, **kwargs) for queryset in self.querysets], self.ordering)
+
+    def filter(self, *args, **kwargs):
+        return self._apply('filter', *args, **kwargs)
+
+    def prefetch_related(self, *lookups):
+        return self._apply('prefetch_related', *lookups)
+
+    def order_by(self, *fields):
+        if len({field.startswith('-') for field in fields}) > 1:
+            raise ValueError('Sharded messages can only be ordered one way.')
+        expressions = [
+            F(field[1:]).desc(nulls_first=True) if field.startswith('-') else F(field).asc(nulls_last=True)
+            for field in fields
+        ]
+        return ShardedMessages([queryset.order_by(*expressions) for queryset in self.querysets], fields)
+
+    def get(self, **kwargs):
+        for queryset in self.querysets:
+            try:
+                return queryset.get(**kwargs)
+            except Message.DoesNotExist:
+                continue
+        raise Message.DoesNotExist('Message matching query does not exist.')
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Sharded messages only support [start:stop] slices.')
+        start, stop = index.start or 0, index.stop
+        if not self.ordering:
+            raise TypeError('Order sharded messages before slicing them.')
+        names = [field.lstrip('-') for field in self.ordering]
+
+        def key(message):
+            return tuple((getattr(message, name) is None, getattr(message, name)) for name in names)
+
+        shards = [queryset if stop is None else queryset[:stop] for queryset in self.querysets]
+        merged = heapq.merge(*shards, key=key, reverse=self.ordering[0].startswith('-'))
+        return list(islice(merged, start, stop))
+
+
+def sharded_user_messages(user, room_id=None):
+    room_ids = set(ChatRoom.objects.filter(participants=user).values_list('id', flat=True))
+
+    if room_id:
+        try:
+            room_id = int(room_id)
+        except (TypeError, ValueError):
+            raise ValidationError({'room_id': 'A valid integer is required.'})
+        if room_id not in room_ids:
+            return Message.objects.none()
+        return Message.objects.using(shard_for_room(room_id)).filter(room_id=room_id)
+
+    rooms_by_shard = defaultdict(list)
+    for room in room_ids:
+        rooms_by_shard[shard_for_room(room)].append(room)
+    if not rooms_by_shard:
+        return Message.objects.none()
+
+    querysets = [Message.objects.using(alias).filter(room_id__in=rooms) for alias, rooms in rooms_by_shard.items()]
+    if len(querysets) == 1:
+        return querysets[0]
+    return ShardedMessages(querysets)
+
+
+def sharded_deleted_messages():
+    # Newest deletion first, as order_by('-last_deleted_at') on PostgreSQL;
+    # a page reads at most as many rows per shard as it ends at.
+    return ShardedMessages([
+        Message.objects.using(alias).filter(is_deleted=True) for alias in message_shards()
+    ]).order_by('-last_deleted_at', '-id')
+
+
+MESSAGE_EXPORT_COLUMNS = [
+    'id', 'timestamp', 'sender_id', 'sender_first_name', 'sender_last_name',
+    'content', 'is_deleted', 'is_modified', 'last_modified_at',
+]
+
+
+def room_message_rows(room_id):
+    """
+    A room's messages, oldest first, as rows of MESSAGE_EXPORT_COLUMNS read
+    through a server-side cursor. Senders are looked up on the primary a
+    chunk at a time, as the messages may be on another shard.
+    """
+    alias = message_db(room_id)
+    messages = Message.objects.filter(room_id=room_id)
+    messages = messages.using(alias) if alias else pinned(messages)
+    messages = messages.order_by('timestamp', 'id').values_list(
+        'id', 'timestamp', 'sender_id', 'content', 'is_deleted', 'is_modified', 'last_modified_at'
+    )
+    # Chosen now: the rows are read after the request's routing has ended.
+    users = pinned(User.objects.all())
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+
+    def rows():
+        senders = {}
+        for batch in batched(messages.iterator(chunk_size=chunk_size), chunk_size):
+            missing = {row[2] for row in batch} - senders.keys()
+            if missing:
+                senders.update(
+                    (user_id, (first_name, last_name))
+                    for user_id, first_name, last_name in users.filter(id__in=missing).values_list('id', 'first_name', 'last_name')
+                )
+            for message_id, timestamp, sender_id, content, is_deleted, is_modified, last_modified_at in batch:
+                first_name, last_name = senders.get(sender_id, ('', ''))
+                yield (
+                    message_id, timestamp, sender_id, first_name, last_name,
+                    "This message was deleted" if is_deleted else content,
+                    is_deleted, is_modified, last_modified_at,
+                )
+
+    return rows()
@@ -0,0 +1,226 @@
+import logging
+import time
+import redis
+from django.conf import settings
+from accounts.models import User
+from .models import Message
+from connectsphere_backend.redis_client import redis_client
+from .events import publish_event
+from .sharding import message_db
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = 'chat:read:metrics'
+
+# Marks absorbed into an open window are recorded in Redis, not in the
+# worker: PENDING_KEY holds each (room, user) pair's position to write and
+# DUE_KEY when its window closes (epoch ms). flush_due_reads() writes the
+# due ones; it runs on every mark_as_read request and from the
+# flush_read_receipts command, so nothing is lost when a worker exits.
+PENDING_KEY = 'chat:read:pending'
+DUE_KEY = 'chat:read:due'
+
+# A flusher leases the pairs it writes: their due time moves this far ahead
+# and they stay pending until the write is done. If the flusher dies or the
+# write fails, the pair comes due again when the lease runs out.
+CLAIM_LEASE_MS = 30000
+
+# Records the highest position asked for and opens a coalescing window for
+# the (room, user) pair. Returns {1, position} when the caller opened the
+# window and should write up to position now, which also covers anything
+# pending; {0, position} when the mark was absorbed and left pending.
+MARK_READ_SCRIPT = redis_client.register_script("""
+local position = tonumber(ARGV[1])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if position > current then
+    current = position
+end
+redis.call('SET', KEYS[1], current, 'PX', ARGV[3])
+redis.call('HINCRBY', KEYS[3], 'requests', 1)
+if redis.call('SET', KEYS[2], current, 'NX', 'PX', ARGV[2]) then
+    redis.call('HDEL', KEYS[4], ARGV[5])
+    redis.call('ZREM', KEYS[5], ARGV[5])
+    return {1, current}
+end
+redis.call('HINCRBY', KEYS[3], 'absorbed', 1)
+redis.call('HSET', KEYS[4], ARGV[5], current)
+local ttl = redis.call('PTTL', KEYS[2])
+redis.call('ZADD', KEYS[5], 'NX', tonumber(ARGV[4]) + math.max(ttl, 0), ARGV[5])
+return {0, current}
+""")
+
+# Leases a due pair until ARGV[3], returning its position, or nil if it
+# isn't due (another flusher holds it, or it was written meanwhile).
+CLAIM_SCRIPT = redis_client.register_script("""
+local due = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if not due or tonumber(due) > tonumber(ARGV[2]) then
+    return nil
+end
+local position = redis.call('HGET', KEYS[1], ARGV[1])
+if not position then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return nil
+end
+redis.call('ZADD', KEYS[2], 'XX', ARGV[3], ARGV[1])
+return position
+""")
+
+# Drops a leased pair once its position is written. A mark absorbed while
+# the write ran raised the position: that pair is left pending, due now.
+COMPLETE_SCRIPT = redis_client.register_script("""
+local position = redis.call('HGET', KEYS[1], ARGV[1])
+if not position then
+    return
+end
+if tonumber(position) == tonumber(ARGV[2]) then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+else
+    redis.call('ZADD', KEYS[2], 'XX', ARGV[3], ARGV[1])
+end
+""")
+
+
+def position_key(room_id, user_id):
+    return f'chat:read:{room_id}:{user_id}:position'
+
+
+def window_key(room_id, user_id):
+    return f'chat:read:{room_id}:{user_id}:window'
+
+
+def unread_messages(room_id, user, up_to):
+    return Message.objects.using(message_db(room_id)).filter(
+        room_id=room_id,
+        id__lte=up_to,
+        is_deleted=False
+    ).exclude(
+        read_by=user
+    )
+
+
+def mark_room_read(room_id, user, up_to):
+    db = message_db(room_id)
+    unread_message_ids = list(unread_messages(room_id, user, up_to).values_list('id', flat=True))
+
+    MessageRead = Message.read_by.through
+    batch_size = 500
+
+    for i in range(0, len(unread_message_ids), batch_size):
+        batch = unread_message_ids[i:i + batch_size]
+        objs = [
+            MessageRead(message_id=mid, user_id=user.id)
+            for mid in batch
+        ]
+        MessageRead.objects.using(db).bulk_create(objs, ignore_conflicts=True)
+
+    if unread_message_ids:
+        publish_event('room_events', 'mark_read', room_id, {
+            'user': {
+                'id': user.id,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+            },
+            'roomId': room_id,
+            'lastReadMessageId': up_to
+        })
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(METRICS_KEY, 'writes', 1)
+        if unread_message_ids:
+            pipe.hincrby(METRICS_KEY, 'events', 1)
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Redis metrics update failed: {e}")
+
+    return len(unread_message_ids)
+
+
+def pending_member(room_id, user_id):
+    return f'{room_id}:{user_id}'
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def flush_due_reads(limit=100):
+    """
+    Write the pending marks whose window has closed, at most `limit` of
+    them. Returns the number of pairs written.
+    """
+    now = now_ms()
+    due = redis_client.zrangebyscore(DUE_KEY, '-inf', now, start=0, num=limit)
+    claimed = []
+    for member in due:
+        position = CLAIM_SCRIPT(keys=[PENDING_KEY, DUE_KEY], args=[member, now, now + CLAIM_LEASE_MS])
+        if position is not None:
+            room_id, user_id = map(int, member.decode().split(':'))
+            claimed.append((member, room_id, user_id, int(position)))
+    if not claimed:
+        return 0
+
+    users = User.objects.only('id', 'first_name', 'last_name').in_bulk({user_id for _, _, user_id, _ in claimed})
+    written = 0
+    for member, room_id, user_id, position in claimed:
+        if user_id in users:
+            try:
+                mark_room_read(room_id, users[user_id], position)
+                written += 1
+            except Exception as e:
+                # Retried once the lease runs out.
+                logger.error(f"Deferred mark_read for room {room_id} failed: {e}")
+                continue
+        COMPLETE_SCRIPT(keys=[PENDING_KEY, DUE_KEY], args=[member, position, now_ms()])
+    return written
+
+
+def coalesce_mark_read(room_id, user, up_to):
+    """
+    Mark a room read up to message `up_to`, merging rapid repeats.
+
+    The first mark by a user in a room is written immediately and opens a
+    short window. Marks arriving during the window only raise the pending
+    position in Redis; once the window closes, the next flush_due_reads()
+    writes the highest position once, with a single mark_read event.
+    Returns the number of messages marked, counting those an absorbed mark
+    leaves for the flush to write.
+    """
+    window = settings.READ_RECEIPT_COALESCE_MS
+
+    try:
+        flush_due_reads(limit=settings.READ_RECEIPT_FLUSH_PER_REQUEST)
+        opened, position = MARK_READ_SCRIPT(
+            keys=[
+                position_key(room_id, user.id), window_key(room_id, user.id), METRICS_KEY,
+                PENDING_KEY, DUE_KEY,
+            ],
+            args=[up_to, window, window * 10, now_ms(), pending_member(room_id, user.id)]
+        )
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Read receipt coalescing unavailable: {e}")
+        return mark_room_read(room_id, user, up_to)
+
+    if not opened:
+        return unread_messages(room_id, user, int(position)).count()
+
+    return mark_room_read(room_id, user, int(position))
+
+
+def read_receipt_metrics():
+    raw = redis_client.hgetall(METRICS_KEY)
+    metrics = {key.decode(): int(value) for key, value in raw.items()}
+
+    requests = metrics.get('requests', 0)
+    writes = metrics.get('writes', 0)
+    events = metrics.get('events', 0)
+
+    return {
+        'requests': requests,
+        'absorbed': metrics.get('absorbed', 0),
+        'writes': writes,
+        'events': events,
+        'writes_saved': max(requests - writes, 0),
+        'events_saved': max(requests - events, 0),
+    }
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import ChatRoom, Message
+from .queries import message_readers
 from accounts.models import User
 from django.db.models import Count
 
@@ -66,7 +67,7 @@ class ChatRoomSerializer(serializers.ModelSerializer):
             'id': message.id,
             'content': "This message was deleted" if message.is_deleted else message.content,
             'timestamp': message.timestamp,
-            'read_by': UserSerializer(message.read_by.all(), many=True).data,
+            'read_by': UserSerializer(message_readers(message), many=True).data,
             'sender': {
                 'id': message.sender.id,
                 'first_name': message.sender.first_name,
@@ -94,7 +95,7 @@ class ChatRoomSerializer(serializers.ModelSerializer):
 
 class MessageSerializer(serializers.ModelSerializer):
     sender = UserSerializer(read_only=True) 
-    read_by = UserSerializer(many=True, read_only=True)  
+    read_by = serializers.SerializerMethodField()
     sender_exists = serializers.SerializerMethodField() 
 
     class Meta:
@@ -116,6 +117,9 @@ class MessageSerializer(serializers.ModelSerializer):
             'is_sent': {'read_only': True},
         }
 
+    def get_read_by(self, instance):
+        return UserSerializer(message_readers(instance), many=True).data
+
     def get_sender_exists(self, instance):
         return instance.sender in instance.room.participants.all()
 
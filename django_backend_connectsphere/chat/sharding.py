@@ -0,0 +1,129 @@
+import hashlib
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max
+
+PRIMARY = 'default'
+
+# Stored on the shard that owns the message's room. Everything else
+# (users, rooms, participants) stays on the primary.
+SHARDED_MODELS = {'chat.message', 'chat.message_read_by'}
+
+
+def message_shards():
+    # The hash ring: where rooms' messages live now.
+    return settings.CHAT_MESSAGE_SHARDS
+
+
+def shard_databases():
+    # Every database that may hold messages, including ones being filled
+    # by reshard_messages before they join the ring.
+    return settings.CHAT_MESSAGE_SHARD_DATABASES
+
+
+def is_sharded():
+    return len(message_shards()) > 1
+
+
+def jump_hash(key, buckets):
+    # Jump consistent hash (Lamping & Veach): growing from n to n + 1
+    # buckets only moves 1/(n + 1) of the keys, all of them to the new one.
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_room(room_id, shards=None):
+    shards = shards or message_shards()
+    digest = hashlib.blake2b(str(int(room_id)).encode(), digest_size=8).digest()
+    return shards[jump_hash(int.from_bytes(digest, 'big'), len(shards))]
+
+
+def message_db(room_id):
+    """
+    Database alias for a room's messages, or None when messages are not
+    sharded so the usual routing (e.g. read replicas) applies.
+    """
+    return shard_for_room(room_id) if is_sharded() else None
+
+
+def room_ordering():
+    # chat_message can't be joined from chat_chatroom across databases, so
+    # sharded deployments order by the denormalised timestamp instead.
+    if is_sharded():
+        return ('-last_message_at', '-created_at', '-id')
+    return ('-last_message__timestamp', '-created_at', '-id')
+
+
+def allocate_message_id():
+    # Ids must stay unique across shards and survive moving a room, so
+    # every shard takes them from the primary's sequence.
+    connection = connections[PRIMARY]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(pg_get_serial_sequence('chat_message', 'id'))")
+            return cursor.fetchone()[0]
+
+    # Local stand-ins (SQLite): not safe with concurrent writers.
+    Message = apps.get_model('chat', 'Message')
+    return max(
+        Message.objects.using(alias).aggregate(Max('id'))['id__max'] or 0
+        for alias in message_shards()
+    ) + 1
+
+
+def _room_id(instance):
+    label = instance._meta.label_lower
+    if label == 'chat.message':
+        return instance.room_id
+    if label == 'chat.chatroom':
+        return instance.pk
+    return None
+
+
+class MessageShardRouter:
+    """
+    Sends messages and their read receipts to the shard owning the room.
+    Queries with no instance to route by (e.g. Message.objects.filter())
+    must pick the shard with .using(message_db(room_id)).
+    """
+
+    def _db_for(self, model, **hints):
+        if not is_sharded():
+            return None
+
+        instance = hints.get('instance')
+        if model._meta.label_lower in SHARDED_MODELS:
+            if instance is not None:
+                room_id = _room_id(instance)
+                if room_id is not None:
+                    return shard_for_room(room_id)
+            return None
+
+        # Users and rooms reached from a message on another shard.
+        if instance is not None and instance._state.db not in (None, PRIMARY):
+            if instance._state.db in shard_databases():
+                return PRIMARY
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_sharded() and {obj1._meta.label_lower, obj2._meta.label_lower} & SHARDED_MODELS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards get the full schema so migrations apply unchanged; only
+        # the message tables are ever filled.
+        if db != PRIMARY and db in shard_databases():
+            return True
+        return None
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+from collections import defaultdict
+import orjson
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from connectsphere_backend.redis_client import REDIS_OPTIONS, REDIS_URL
+from connectsphere_backend.renderers import dumps
+from .events import EVENT_STREAM_KEY
+
+logger = logging.getLogger(__name__)
+
+
+def parse_event_id(event_id):
+    if isinstance(event_id, bytes):
+        event_id = event_id.decode()
+    try:
+        ms, _, seq = event_id.partition('-')
+        return int(ms), int(seq or 0)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_sse(event_id, event, data):
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (
+        event_id.encode(), event.encode(), dumps(data)
+    )
+
+
+def member_changes(event, data):
+    """Return (joined_user_ids, left_user_ids) carried by a room event."""
+    if event == 'room_created':
+        return {p['id'] for p in data.get('participants', [])}, set()
+    if event == 'participants_added':
+        return {u['id'] for u in data.get('users', [])}, set()
+    if event == 'participant_removed':
+        return set(), {data['user']['id']}
+    return set(), set()
+
+
+def closes_room(event):
+    # Delivered to the room's subscribers, who then stop following it.
+    return event == 'room_deleted'
+
+
+class Subscription:
+    def __init__(self, user_id, room_ids, resuming=False):
+        self.user_id = user_id
+        self.room_ids = {str(room_id) for room_id in room_ids}
+        self.queue = asyncio.Queue(maxsize=settings.SSE_QUEUE_SIZE)
+        self.overflowed = False
+        self.last_replayed = None
+        # Live events are held back while missed events are being replayed.
+        self.pending = [] if resuming else None
+
+    def offer(self, event_id, frame):
+        if self.pending is not None:
+            self.pending.append((event_id, frame))
+            return
+        self.put(event_id, frame)
+
+    def put(self, event_id, frame):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait((event_id, frame))
+        except asyncio.QueueFull:
+            # A client that can't keep up gets what is already queued and is
+            # then disconnected instead of letting its backlog grow; it
+            # resumes from the stream with Last-Event-ID.
+            self.overflowed = True
+
+    @property
+    def exhausted(self):
+        return self.overflowed and self.queue.empty()
+
+    def finish_replay(self):
+        pending, self.pending = self.pending or [], None
+        for event_id, frame in pending:
+            if self.last_replayed is None or parse_event_id(event_id) > self.last_replayed:
+                self.put(event_id, frame)
+
+
+class RoomEventHub:
+    """
+    Fans the shared `chat:events` stream out to every SSE connection held by
+    this worker. One XREAD loop serves all connections, so an idle client
+    costs a queue and a suspended task rather than a Redis connection.
+    """
+
+    def __init__(self):
+        self.client = None
+        self._reader = None
+        self._rooms = defaultdict(set)
+        self._users = defaultdict(set)
+
+    def get_client(self):
+        if self.client is None:
+            self.client = aioredis.Redis.from_url(REDIS_URL, **REDIS_OPTIONS)
+        return self.client
+
+    async def stream_tail(self):
+        # Id of the newest event in the stream, '0-0' if it is empty.
+        entries = await self.get_client().xrevrange(EVENT_STREAM_KEY, count=1)
+        return entries[0][0].decode() if entries else '0-0'
+
+    async def subscribe(self, subscription):
+        if self._reader is None or self._reader.done():
+            # Read on from the newest event as of now rather than from '$'
+            # when the reader first runs, which would drop whatever is
+            # published in between.
+            try:
+                last_id = await self.stream_tail()
+            except redis.exceptions.RedisError as e:
+                logger.error(f"Redis stream read failed: {e}")
+                last_id = '$'
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_forever(last_id))
+
+        for room_id in subscription.room_ids:
+            self._rooms[room_id].add(subscription)
+        self._users[subscription.user_id].add(subscription)
+
+    def unsubscribe(self, subscription):
+        for room_id in list(subscription.room_ids):
+            self._remove_room(subscription, room_id)
+
+        subscribers = self._users.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._users[subscription.user_id]
+
+    def _add_room(self, subscription, room_id):
+        subscription.room_ids.add(room_id)
+        self._rooms[room_id].add(subscription)
+
+    def _remove_room(self, subscription, room_id):
+        subscription.room_ids.discard(room_id)
+        subscribers = self._rooms.get(room_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._rooms[room_id]
+
+    def _join(self, user_id, room_id):
+        for subscription in self._users.get(user_id, ()):
+            self._add_room(subscription, room_id)
+
+    def _leave(self, user_id, room_id):
+        for subscription in list(self._users.get(user_id, ())):
+            self._remove_room(subscription, room_id)
+
+    def dispatch(self, event_id, payload):
+        try:
+            message = orjson.loads(payload)
+            event, room_id, data = message['event'], message['roomId'], message['data']
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            logger.warning(f"Skipping malformed chat event {event_id}")
+            return
+
+        joined, left = member_changes(event, data)
+        for user_id in joined:
+            self._join(user_id, room_id)
+
+        frame = format_sse(event_id, event, data)
+        for subscription in list(self._rooms.get(room_id, ())):
+            subscription.offer(event_id, frame)
+            if closes_room(event):
+                self._remove_room(subscription, room_id)
+
+        for user_id in left:
+            self._leave(user_id, room_id)
+
+    async def _read_forever(self, last_id):
+        client = self.get_client()
+
+        while self._users:
+            try:
+                entries = await client.xread(
+                    {EVENT_STREAM_KEY: last_id},
+                    block=settings.SSE_HEARTBEAT_SECONDS * 1000,
+                    count=500
+                )
+            except redis.exceptions.RedisError as e:
+                logger.error(f"Redis stream read failed: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for _, messages in entries or ():
+                for entry_id, fields in messages:
+                    last_id = entry_id
+                    self.dispatch(entry_id.decode(), fields[b'payload'])
+
+    async def replay(self, subscription, last_event_id):
+        """
+        Queue the events a reconnecting client missed since `last_event_id`.
+        Returns False when the stream has already been trimmed past that id,
+        meaning the client has to refetch its state instead.
+        """
+        after = parse_event_id(last_event_id)
+        if after is None:
+            return True
+
+        client = self.get_client()
+        oldest = await client.xrange(EVENT_STREAM_KEY, count=1)
+        if oldest and parse_event_id(oldest[0][0]) > after:
+            return False
+
+        entries = await client.xrange(
+            EVENT_STREAM_KEY,
+            min=f"({after[0]}-{after[1]}",
+            count=settings.SSE_REPLAY_LIMIT
+        )
+        if len(entries) >= settings.SSE_REPLAY_LIMIT:
+            return False
+
+        for entry_id, fields in entries:
+            entry_id = entry_id.decode()
+            try:
+                message = orjson.loads(fields[b'payload'])
+                event, room_id, data = message['event'], message['roomId'], message['data']
+            except (orjson.JSONDecodeError, KeyError, TypeError):
+                continue
+
+            joined, left = member_changes(event, data)
+            if subscription.user_id in joined:
+                self._add_room(subscription, room_id)
+            if room_id in subscription.room_ids:
+                subscription.put(entry_id, format_sse(entry_id, event, data))
+                if closes_room(event):
+                    self._remove_room(subscription, room_id)
+            if subscription.user_id in left:
+                self._remove_room(subscription, room_id)
+            subscription.last_replayed = parse_event_id(entry_id)
+
+        return True
+
+
+hub = RoomEventHub()
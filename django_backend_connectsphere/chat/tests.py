@@ -1,3 +1,633 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import datetime
+import unittest
+import uuid
+from unittest import mock
+import numpy as np
+import redis
+from asgiref.sync import sync_to_async
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework_api_key.models import APIKey
+from rest_framework_simplejwt.tokens import AccessToken
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from accounts.models import Role, User
+from employees.models import Department, Employee
+from connectsphere_backend.redis_client import redis_client
+from connectsphere_backend.renderers import dumps
+from connectsphere_backend.throttling import RedisUserRateThrottle
+from . import receipts
+from .analytics import chat_analytics, compute_daily_metrics
+from .activity import roll_up_activity
+from .async_views import room_event_stream
+from .models import ChatRoom, Message, RoomActivity, UserActivity
+from .pagination import CursorMessagePagination
+from .queries import ShardedMessages, sharded_user_messages
+from .sharding import MessageShardRouter, jump_hash, message_db, shard_for_room
+from .streams import RoomEventHub, Subscription
+from .views import check_can_list_chatrooms
 
-# Create your tests here.
+SHARDS = ['default', 'messages_1', 'messages_2']
+
+
+class JumpHashTests(SimpleTestCase):
+    def test_stable(self):
+        # Pinned: a different bucket for the same key would strand rooms'
+        # messages on the shard they were written to.
+        self.assertEqual([jump_hash(key, 10) for key in (0, 1, 2, 3, 2 ** 32, 2 ** 63)], [0, 6, 6, 8, 2, 5])
+        self.assertEqual([jump_hash(key, 1000) for key in (1, 12345, 2 ** 40 + 7)], [549, 938, 450])
+
+    def test_in_range(self):
+        for buckets in (1, 2, 7, 64):
+            for key in range(500):
+                self.assertIn(jump_hash(key, buckets), range(buckets))
+
+    def test_growing_only_moves_keys_to_the_new_bucket(self):
+        keys = range(10000)
+        for buckets in (1, 2, 3, 8):
+            moved = 0
+            for key in keys:
+                before, after = jump_hash(key, buckets), jump_hash(key, buckets + 1)
+                if before != after:
+                    self.assertEqual(after, buckets)
+                    moved += 1
+            # About 1/(n + 1) of the keys move.
+            self.assertAlmostEqual(moved / len(keys), 1 / (buckets + 1), delta=0.03)
+
+
+@override_settings(CHAT_MESSAGE_SHARDS=SHARDS, CHAT_MESSAGE_SHARD_DATABASES=SHARDS)
+class RoomRoutingTests(SimpleTestCase):
+    def test_rooms_are_spread_over_the_shards(self):
+        self.assertEqual(
+            [shard_for_room(room_id) for room_id in (1, 2, 3, 4, 5, 42, 1000)],
+            ['default', 'messages_2', 'messages_2', 'messages_2', 'default', 'messages_1', 'default'],
+        )
+        counts = {shard: 0 for shard in SHARDS}
+        for room_id in range(1, 3001):
+            counts[shard_for_room(room_id)] += 1
+        for count in counts.values():
+            self.assertAlmostEqual(count / 3000, 1 / 3, delta=0.05)
+
+    def test_room_ids_as_strings_route_the_same(self):
+        self.assertEqual(shard_for_room('42'), shard_for_room(42))
+        self.assertEqual(message_db(42), shard_for_room(42))
+
+    def test_messages_and_receipts_go_to_their_rooms_shard(self):
+        router = MessageShardRouter()
+        for room_id in (1, 2, 42):
+            message = Message(room_id=room_id)
+            self.assertEqual(router.db_for_write(Message, instance=message), shard_for_room(room_id))
+            self.assertEqual(router.db_for_read(Message, instance=message), shard_for_room(room_id))
+            self.assertEqual(
+                router.db_for_write(Message.read_by.through, instance=ChatRoom(pk=room_id)), shard_for_room(room_id)
+            )
+        # Nothing to route by: the caller has to pick with .using().
+        self.assertIsNone(router.db_for_read(Message))
+
+    def test_rooms_stay_on_the_primary(self):
+        router = MessageShardRouter()
+        self.assertIsNone(router.db_for_write(ChatRoom, instance=ChatRoom(pk=2)))
+
+    @override_settings(CHAT_MESSAGE_SHARDS=['default'])
+    def test_unsharded(self):
+        self.assertIsNone(message_db(42))
+        self.assertIsNone(MessageShardRouter().db_for_write(Message, instance=Message(room_id=42)))
+
+
+class ChatroomListAccessTests(SimpleTestCase):
+    # The check both the sync and the async chat room lists apply.
+
+    def test_users_without_a_role_are_refused(self):
+        with self.assertRaises(PermissionDenied):
+            check_can_list_chatrooms(User(pk=1))
+
+    def test_users_with_a_role_may_list(self):
+        check_can_list_chatrooms(User(pk=1, role=Role(name='EMPLOYEE')))
+
+
+class RoomEventHubTests(SimpleTestCase):
+    # Against the Redis at REDIS_URL, on a stream of their own.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            redis_client.ping()
+        except redis.exceptions.RedisError:
+            raise unittest.SkipTest('The event hub tests need the Redis at REDIS_URL.')
+
+    def setUp(self):
+        key = f'chat:events:test:{uuid.uuid4().hex}'
+        patcher = mock.patch('chat.streams.EVENT_STREAM_KEY', key)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(redis_client.delete, key)
+        self.key = key
+        self.hub = RoomEventHub()
+
+    def add(self, event, room_id, data=None):
+        payload = dumps({'event': event, 'roomId': str(room_id), 'data': data or {}})
+        return redis_client.xadd(self.key, {'payload': payload}).decode()
+
+    async def received(self, subscription, count=None, timeout=0.5):
+        # (event id, event name) of the frames queued, waiting up to
+        # timeout for `count` of them.
+        frames = []
+        deadline = asyncio.get_running_loop().time() + timeout
+        while count is None or len(frames) < count:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                event_id, frame = await asyncio.wait_for(subscription.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            frames.append((event_id, frame.split(b'\n')[1].removeprefix(b'event: ').decode()))
+        return frames
+
+    async def stop(self):
+        if self.hub._reader is not None:
+            self.hub._reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.hub._reader
+        await self.hub.get_client().aclose()
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=1)
+    async def test_events_go_to_the_rooms_subscribers(self):
+        first, second = Subscription(1, [10]), Subscription(2, [20])
+        await self.hub.subscribe(first)
+        await self.hub.subscribe(second)
+        try:
+            sent = self.add('new_message', 10, {'content': 'hi'})
+            self.assertEqual(await self.received(first, 1), [(sent, 'new_message')])
+            self.assertEqual(await self.received(second, timeout=0.2), [])
+        finally:
+            await self.stop()
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=1)
+    async def test_events_published_right_after_subscribing_are_delivered(self):
+        subscription = Subscription(1, [10])
+        await self.hub.subscribe(subscription)
+        try:
+            # Before the reader has had a chance to run.
+            sent = self.add('new_message', 10)
+            self.assertEqual(await self.received(subscription, 1), [(sent, 'new_message')])
+        finally:
+            await self.stop()
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=1)
+    async def test_unsubscribe(self):
+        subscription = Subscription(1, [10, 11])
+        await self.hub.subscribe(subscription)
+        try:
+            self.hub.unsubscribe(subscription)
+            self.assertEqual(dict(self.hub._rooms), {})
+            self.assertEqual(dict(self.hub._users), {})
+            self.add('new_message', 10)
+            self.assertEqual(await self.received(subscription, timeout=0.2), [])
+        finally:
+            await self.stop()
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=1)
+    async def test_membership_changes_and_room_deleted(self):
+        subscription = Subscription(2, [20])
+        await self.hub.subscribe(subscription)
+        try:
+            added = self.add('participants_added', 10, {'users': [{'id': 2}]})
+            message = self.add('new_message', 10)
+            deleted = self.add('room_deleted', 10, {'roomId': 10})
+            self.add('new_message', 10)
+            self.assertEqual(
+                await self.received(subscription, 4),
+                [(added, 'participants_added'), (message, 'new_message'), (deleted, 'room_deleted')],
+            )
+            self.assertEqual(subscription.room_ids, {'20'})
+            self.assertNotIn('10', self.hub._rooms)
+        finally:
+            await self.stop()
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=1)
+    async def test_resume_from_last_event_id(self):
+        seen = self.add('new_message', 10)
+        missed = [self.add('new_message', 10), self.add('edit_message', 10)]
+        self.add('new_message', 30)
+
+        subscription = Subscription(1, [10], resuming=True)
+        await self.hub.subscribe(subscription)
+        try:
+            self.assertTrue(await self.hub.replay(subscription, seen))
+            live = self.add('delete_message', 10)
+            # Held back until the replay is done, then queued once.
+            await asyncio.sleep(0.2)
+            subscription.finish_replay()
+            self.assertEqual(
+                [event_id for event_id, _ in await self.received(subscription, 3)], [*missed, live]
+            )
+        finally:
+            await self.stop()
+
+    async def test_resume_past_the_trimmed_stream_needs_a_resync(self):
+        self.add('new_message', 10)
+        self.add('new_message', 10)
+        redis_client.xtrim(self.key, maxlen=1)
+        try:
+            self.assertFalse(await self.hub.replay(Subscription(1, [10], resuming=True), '1-0'))
+        finally:
+            await self.hub.get_client().aclose()
+
+
+class RoomEventStreamTests(SimpleTestCase):
+    async def test_refused_outside_asgi(self):
+        response = await room_event_stream(RequestFactory().get('/api/chat/events/stream/'))
+        self.assertEqual(response.status_code, 501)
+
+
+class ReadReceiptCoalescingTests(TestCase):
+    # Against the Redis at REDIS_URL, on a pending queue of their own.
+
+    @classmethod
+    def setUpClass(cls):
+        # Before TestCase opens its class-wide transaction, which a skip
+        # raised afterwards would leave open.
+        try:
+            redis_client.ping()
+        except redis.exceptions.RedisError:
+            raise unittest.SkipTest('The read receipt tests need the Redis at REDIS_URL.')
+        super().setUpClass()
+
+    def setUp(self):
+        prefix = f'chat:read:test:{uuid.uuid4().hex}'
+        for name in ('PENDING_KEY', 'DUE_KEY', 'METRICS_KEY'):
+            patcher = mock.patch.object(receipts, name, f'{prefix}:{name.lower()}')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+            self.addCleanup(redis_client.delete, f'{prefix}:{name.lower()}')
+        patcher = mock.patch.object(receipts, 'publish_event')
+        self.published = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        role = Role.objects.create(name='EMPLOYEE')
+        sender = User.objects.create_user(username='sender@example.com', email='sender@example.com', password=None, role=role)
+        self.reader = User.objects.create_user(username='reader@example.com', email='reader@example.com', password=None, role=role)
+        self.room = ChatRoom.objects.create(name='Receipts', type='GROUP', created_by=sender)
+        self.messages = [Message.objects.create(room=self.room, sender=sender, content=str(n)) for n in range(3)]
+        self.member = receipts.pending_member(self.room.id, self.reader.id)
+        self.addCleanup(
+            redis_client.delete,
+            receipts.position_key(self.room.id, self.reader.id), receipts.window_key(self.room.id, self.reader.id),
+        )
+        self.started = receipts.now_ms()
+
+    def mark(self, index):
+        return receipts.coalesce_mark_read(self.room.id, self.reader, self.messages[index].id)
+
+    def flush(self, after_ms):
+        with mock.patch.object(receipts, 'now_ms', return_value=self.started + after_ms):
+            return receipts.flush_due_reads()
+
+    def read_count(self):
+        return Message.read_by.through.objects.filter(user=self.reader).count()
+
+    def pending(self):
+        position = redis_client.hget(receipts.PENDING_KEY, self.member)
+        return position and int(position)
+
+    def test_marks_in_the_window_are_merged_and_flushed_once(self):
+        self.assertEqual(self.mark(0), 1)
+        # Absorbed: counted, but left for the flush.
+        self.assertEqual(self.mark(1), 1)
+        self.assertEqual(self.mark(2), 2)
+        self.assertEqual(self.read_count(), 1)
+        self.assertEqual(self.pending(), self.messages[2].id)
+
+        self.assertEqual(self.flush(0), 0)
+        self.assertEqual(self.flush(60000), 1)
+        self.assertEqual(self.read_count(), 3)
+        self.assertEqual(self.published.call_count, 2)
+        self.assertIsNone(self.pending())
+        self.assertEqual(redis_client.zcard(receipts.DUE_KEY), 0)
+
+    def test_a_flusher_that_dies_after_claiming_is_retried(self):
+        self.mark(0)
+        self.mark(1)
+        now = self.started + 60000
+        # Claimed, then never written.
+        self.assertEqual(
+            int(receipts.CLAIM_SCRIPT(keys=[receipts.PENDING_KEY, receipts.DUE_KEY],
+                                      args=[self.member, now, now + receipts.CLAIM_LEASE_MS])),
+            self.messages[1].id,
+        )
+
+        self.assertEqual(self.flush(60000), 0)
+        self.assertEqual(self.flush(60001 + receipts.CLAIM_LEASE_MS), 1)
+        self.assertEqual(self.read_count(), 2)
+        self.assertIsNone(self.pending())
+
+    def test_failed_writes_are_retried(self):
+        self.mark(0)
+        self.mark(1)
+        with mock.patch.object(receipts, 'mark_room_read', side_effect=Exception('database down')):
+            with self.assertLogs('chat.receipts', 'ERROR'):
+                self.assertEqual(self.flush(60000), 0)
+        self.assertEqual(self.pending(), self.messages[1].id)
+
+        self.assertEqual(self.flush(60000), 0)
+        self.assertEqual(self.flush(60001 + receipts.CLAIM_LEASE_MS), 1)
+        self.assertEqual(self.read_count(), 2)
+
+    def test_marks_absorbed_during_a_flush_stay_pending(self):
+        self.mark(0)
+        self.mark(1)
+        mark_room_read = receipts.mark_room_read
+
+        def write(*args):
+            self.mark(2)
+            return mark_room_read(*args)
+
+        with mock.patch.object(receipts, 'mark_room_read', side_effect=write):
+            self.assertEqual(self.flush(60000), 1)
+        self.assertEqual(self.read_count(), 2)
+        self.assertEqual(self.pending(), self.messages[2].id)
+
+        self.assertEqual(self.flush(60000), 1)
+        self.assertEqual(self.read_count(), 3)
+        self.assertIsNone(self.pending())
+
+
+class ShardedMessagesTests(TestCase):
+    # Two rooms' messages on the one test database stand in for two shards.
+
+    def setUp(self):
+        role = Role.objects.create(name='EMPLOYEE')
+        self.user = User.objects.create_user(username='shards@example.com', email='shards@example.com', password=None, role=role)
+        self.rooms = [ChatRoom.objects.create(name=name, type='GROUP', created_by=self.user) for name in ('A', 'B')]
+        start = timezone.now()
+        # Interleaved in time, with a tie across the rooms.
+        for minutes, room in [(0, 0), (1, 1), (2, 1), (3, 0), (3, 1), (5, 0), (6, 1), (7, 0)]:
+            message = Message.objects.create(room=self.rooms[room], sender=self.user, content=str(minutes))
+            Message.objects.filter(pk=message.pk).update(timestamp=start + datetime.timedelta(minutes=minutes))
+        self.sharded = ShardedMessages([Message.objects.filter(room=room) for room in self.rooms])
+
+    def test_slices_merge_the_shards_in_order(self):
+        expected = list(Message.objects.order_by('-timestamp', 'room_id').values_list('content', flat=True))
+        messages = self.sharded.order_by('-timestamp')
+        self.assertEqual([message.content for message in messages[0:8]], expected)
+        self.assertEqual([message.content for message in messages[2:5]], expected[2:5])
+        self.assertEqual(messages.count(), 8)
+
+    def test_cursor_pages_cover_every_message_once(self):
+        seen, cursor = [], None
+        while True:
+            request = Request(APIRequestFactory().get('/api/chat/messages/', {'size': 3, **({'cursor': cursor} if cursor else {})}))
+            paginator = CursorMessagePagination()
+            paginator.page_size = 3
+            seen.extend(message.pk for message in paginator.paginate_queryset(self.sharded, request))
+            next_link = paginator.get_next_link()
+            if not next_link:
+                break
+            cursor = Request(APIRequestFactory().get(next_link)).query_params['cursor']
+        self.assertEqual(sorted(seen), sorted(Message.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(seen), 8)
+
+    def test_nulls_sort_first_when_descending(self):
+        deleted_at = timezone.now()
+        Message.objects.filter(content__in=['0', '6']).update(is_deleted=True, last_deleted_at=deleted_at)
+        Message.objects.filter(content='3', room=self.rooms[0]).update(is_deleted=True, last_deleted_at=None)
+        messages = self.sharded.filter(is_deleted=True).order_by('-last_deleted_at', '-id')
+        self.assertEqual([message.content for message in messages[0:3]], ['3', '6', '0'])
+
+    def test_get_looks_in_every_shard(self):
+        message = Message.objects.filter(room=self.rooms[1]).first()
+        self.assertEqual(self.sharded.get(pk=message.pk), message)
+        with self.assertRaises(Message.DoesNotExist):
+            self.sharded.get(pk=0)
+
+    @override_settings(CHAT_MESSAGE_SHARDS=SHARDS, CHAT_MESSAGE_SHARD_DATABASES=SHARDS)
+    def test_user_messages_span_the_users_shards(self):
+        for room in self.rooms:
+            room.participants.add(self.user)
+        shards = {room.pk: SHARDS[index] for index, room in enumerate(self.rooms)}
+        with mock.patch('chat.queries.shard_for_room', side_effect=lambda room_id: shards[int(room_id)]):
+            messages = sharded_user_messages(self.user)
+            self.assertIsInstance(messages, ShardedMessages)
+            self.assertEqual({queryset.db for queryset in messages.querysets}, set(SHARDS[:2]))
+            self.assertEqual(sharded_user_messages(self.user, self.rooms[1].pk).db, SHARDS[1])
+
+
+@override_settings(CHAT_ROLLUP_LAG_SECONDS=300)
+class ActivityRollupTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(name='EMPLOYEE')
+        self.users = [
+            User.objects.create_user(username=f'{name}@example.com', email=f'{name}@example.com', password=None, role=role)
+            for name in ('ann', 'bo')
+        ]
+        self.room = ChatRoom.objects.create(name='Team', type='GROUP', created_by=self.users[0])
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def send(self, sender, minutes_ago, **fields):
+        message = Message.objects.create(room=self.room, sender=self.users[sender], content='hi')
+        Message.objects.filter(pk=message.pk).update(
+            timestamp=self.now - datetime.timedelta(minutes=minutes_ago), **fields
+        )
+        return message
+
+    def roll_up(self, minutes_later=0):
+        with mock.patch.object(timezone, 'now', return_value=self.now + datetime.timedelta(minutes=minutes_later)):
+            return roll_up_activity(batch_size=2)
+
+    def counts(self):
+        return (
+            sum(RoomActivity.objects.values_list('message_count', flat=True)),
+            dict(UserActivity.objects.values_list('user__username', 'message_count')),
+        )
+
+    def test_reruns_count_each_message_once(self):
+        for sender in (0, 1, 0):
+            self.send(sender, minutes_ago=60)
+        # Deleted messages were still sent.
+        self.send(1, minutes_ago=60, is_deleted=True)
+
+        self.assertEqual(self.roll_up(), 4)
+        self.assertEqual(self.roll_up(), 0)
+        self.assertEqual(self.counts(), (4, {'ann@example.com': 2, 'bo@example.com': 2}))
+
+        self.send(0, minutes_ago=30)
+        self.assertEqual(self.roll_up(), 1)
+        self.assertEqual(self.roll_up(), 0)
+        self.assertEqual(self.counts(), (5, {'ann@example.com': 3, 'bo@example.com': 2}))
+
+    def test_messages_inside_the_lag_wait_for_a_later_run(self):
+        self.send(0, minutes_ago=60)
+        self.send(1, minutes_ago=1)
+        # An older message behind a younger id, as a slow commit leaves it.
+        self.send(0, minutes_ago=50)
+
+        self.assertEqual(self.roll_up(), 1)
+        self.assertEqual(self.counts(), (1, {'ann@example.com': 1}))
+
+        self.assertEqual(self.roll_up(minutes_later=10), 2)
+        self.assertEqual(self.roll_up(minutes_later=10), 0)
+        self.assertEqual(self.counts(), (3, {'ann@example.com': 2, 'bo@example.com': 1}))
+
+
+class DailyMetricsTests(SimpleTestCase):
+    DAY = 86400
+
+    def metrics(self, messages, employees=((1, 10), (3, 20))):
+        # messages: (room, sender, seconds from the first day's start), in any order.
+        room, sender, ts = (np.array(column) for column in zip(*messages))
+        employee_users, employee_departments = (np.array(column, dtype=np.int64) for column in zip(*employees))
+        bounds = np.array([0.0, self.DAY, 2 * self.DAY])
+        return compute_daily_metrics(
+            room.astype(np.int64), sender.astype(np.int64), ts.astype(np.float64), bounds,
+            employee_users, employee_departments, response_window=600,
+        )
+
+    def test_a_tiny_fixture(self):
+        first, second = self.metrics([
+            (1, 2, 5000),               # 3000 s after the previous one: too late to be a response
+            (2, 1, self.DAY + 70),      # answers user 3 after 60 s
+            (1, 1, 360),                # answers user 2 after 300 s
+            (1, 2, 50),                 # answers yesterday's message after 150 s
+            (1, 1, 2000),               # the same sender again
+            (2, 3, self.DAY + 10),
+            (1, 1, -100),               # before the first day: only answered
+            (1, 2, 60),                 # the same sender again
+        ])
+
+        self.assertEqual((first['messages'], first['rooms']), (5, {1: 5}))
+        self.assertEqual((first['responses'], first['latency_sum']), (2, 450.0))
+        self.assertEqual(first['latency_median'], np.quantile([150, 300], 0.5))
+        self.assertEqual(first['latency_p90'], np.quantile([150, 300], 0.9))
+        # User 2 has no Employee record.
+        self.assertEqual((first['active_users'], first['departments']), (2, {10: 1, None: 1}))
+
+        self.assertEqual((second['messages'], second['rooms']), (2, {2: 2}))
+        self.assertEqual((second['responses'], second['latency_median'], second['latency_p90']), (1, 60.0, 60.0))
+        self.assertEqual((second['active_users'], second['departments']), (2, {10: 1, 20: 1}))
+
+    def test_days_without_messages(self):
+        first, second = self.metrics([(1, 1, 10)])
+        self.assertEqual((first['messages'], first['active_users'], first['responses']), (1, 1, 0))
+        self.assertIsNone(first['latency_median'])
+        self.assertEqual(second, {
+            'messages': 0, 'rooms': {}, 'responses': 0, 'latency_sum': 0.0, 'latency_median': None,
+            'latency_p90': None, 'active_users': 0, 'departments': {},
+        })
+
+
+@override_settings(
+    CHAT_ANALYTICS_RESPONSE_WINDOW_SECONDS=600,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'chat-analytics-tests'}},
+)
+class ChatAnalyticsTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(name='EMPLOYEE')
+        self.ann, self.bo = (
+            User.objects.create_user(username=f'{name}@example.com', email=f'{name}@example.com', password=None, role=role)
+            for name in ('ann', 'bo')
+        )
+        self.sales = Department.objects.create(name='Sales')
+        Employee.objects.create(
+            user=self.ann, department=self.sales, designation='Rep', joining_date=datetime.date(2024, 1, 1),
+            contact_number='0123456789', emergency_contact='0123456789', address='1 Main St',
+        )
+        self.room = ChatRoom.objects.create(name='Deals', type='GROUP', created_by=self.ann)
+        self.yesterday = datetime.datetime.combine(
+            timezone.localdate() - datetime.timedelta(days=1), datetime.time(), tzinfo=timezone.get_current_timezone()
+        )
+
+    def send(self, sender, seconds):
+        message = Message.objects.create(room=self.room, sender=sender, content='hi')
+        Message.objects.filter(pk=message.pk).update(timestamp=self.yesterday + datetime.timedelta(seconds=seconds))
+
+    def test_per_day_latency_and_active_users(self):
+        self.send(self.ann, 3600)
+        self.send(self.bo, 3600 + 30)
+        self.send(self.ann, 3600 + 120)
+        self.send(self.bo, 86400 + 60)
+
+        analytics = chat_analytics(days=2)
+
+        self.assertEqual(analytics['messages_per_day'], [3, 1])
+        self.assertEqual(analytics['top_rooms'], [
+            {'room_id': self.room.pk, 'name': 'Deals', 'total': 4, 'per_day': [3, 1]},
+        ])
+        latency = analytics['response_latency']
+        self.assertEqual(latency['mean_seconds'], 60.0)
+        self.assertEqual(latency['per_day'], [
+            {'responses': 2, 'median_seconds': 60.0, 'p90_seconds': 84.0},
+            {'responses': 0, 'median_seconds': None, 'p90_seconds': None},
+        ])
+        self.assertEqual(analytics['active_users']['per_day'], [2, 1])
+        self.assertEqual(analytics['active_users']['departments'], [
+            {'id': self.sales.pk, 'name': 'Sales', 'per_day': [1, 0]},
+            {'id': None, 'name': 'No department', 'per_day': [1, 1]},
+        ])
+
+
+@mock.patch.object(RedisUserRateThrottle, 'THROTTLE_RATES', {'user': None})
+class AsyncReadViewTests(TestCase):
+    # The async/ routes answer exactly as the DRF views they stand in for.
+
+    def setUp(self):
+        role = Role.objects.create(name='EMPLOYEE')
+        self.user = User.objects.create_user(
+            username='async@example.com', email='async@example.com', password=None, role=role,
+            first_name='Ada', last_name='Async',
+        )
+        other = User.objects.create_user(
+            username='other@example.com', email='other@example.com', password=None, role=role,
+            first_name='Otto', last_name='Other',
+        )
+        self.room = ChatRoom.objects.create(name='Async', type='GROUP', created_by=self.user)
+        self.room.participants.add(self.user, other)
+        for n in range(12):
+            message = Message.objects.create(room=self.room, sender=other if n % 2 else self.user, content=str(n))
+            message.read_by.add(self.user)
+        self.room.last_message = message
+        self.room.save()
+
+        _, key = APIKey.objects.create_key(name='async-tests')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}', 'X-Api-Key': key}
+
+    def sync_get(self, path, **params):
+        return self.client.get(path, params, headers=self.headers)
+
+    async def async_get(self, path, **params):
+        return await self.async_client.get(path, params, headers=self.headers)
+
+    async def test_chatroom_detail(self):
+        expected = await sync_to_async(self.sync_get)(f'/api/chat/rooms/{self.room.pk}/')
+        response = await self.async_get(f'/api/chat/async/rooms/{self.room.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_chatroom_list(self):
+        expected = await sync_to_async(self.sync_get)('/api/chat/rooms/')
+        response = await self.async_get('/api/chat/async/rooms/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_message_list_pages(self):
+        expected = await sync_to_async(self.sync_get)('/api/chat/messages/', room_id=self.room.pk)
+        response = await self.async_get('/api/chat/async/messages/', room_id=self.room.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], expected.json()['results'])
+        self.assertEqual(len(response.json()['results']), 10)
+
+        cursor = Request(RequestFactory().get(response.json()['next'])).query_params['cursor']
+        expected = await sync_to_async(self.sync_get)('/api/chat/messages/', room_id=self.room.pk, cursor=cursor)
+        response = await self.async_get('/api/chat/async/messages/', room_id=self.room.pk, cursor=cursor)
+        self.assertEqual(response.json()['results'], expected.json()['results'])
+        self.assertEqual([message['content'] for message in response.json()['results']], ['1', '0'])
+
+    async def test_requests_without_credentials_are_refused(self):
+        response = await self.async_client.get('/api/chat/async/rooms/')
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get('/api/chat/async/rooms/', headers={'X-Api-Key': self.headers['X-Api-Key']})
+        self.assertEqual(response.status_code, 401)
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import ChatRoomViewSet, MessageViewSet
+from .async_views import room_event_stream, chatroom_list, chatroom_detail, message_list
 
 router = DefaultRouter()
 router.register(r'rooms', ChatRoomViewSet)
@@ -22,6 +23,7 @@ urlpatterns = [
 
     path('messages/', MessageViewSet.as_view({'get': 'list'}), name='list_messages_for_request_user'),
     path('messages/mark_as_read/', MessageViewSet.as_view({'post': 'mark_as_read'}), name='mark_as_read_messages_in_specific_chatroom_for_request_user'),
+    path('messages/read_receipt_metrics/', MessageViewSet.as_view({'get': 'read_receipt_metrics'}), name='read_receipt_metrics_for_CEO'),
     path('messages/create/', MessageViewSet.as_view({'post': 'create'}), name='create_message_in_chat_room_for_chatroom_participants'),
 
     path('messages/<int:pk>/', MessageViewSet.as_view({'get': 'retrieve'}), name='fetch_message_details_for_message_sender'),
@@ -30,4 +32,10 @@ urlpatterns = [
 
     path('messages/<int:pk>/restore/', MessageViewSet.as_view({'post': 'restore_message'}), name='restore_deleted_message_for_CEO'),
     path('messages/soft_deleted_messages/', MessageViewSet.as_view({'get': 'soft_deleted_messages'}), name='list_soft_deleted_messages_for_CEO'),
+
+    path('events/stream/', room_event_stream, name='room_event_stream_for_request_user'),
+
+    path('async/rooms/', chatroom_list, name='async_chatroom_list_for_request_user'),
+    path('async/rooms/<int:pk>/', chatroom_detail, name='async_chat_room_details_for_chatroom_participants'),
+    path('async/messages/', message_list, name='async_list_messages_for_request_user'),
 ]
\ No newline at end of file
@@ -1,37 +1,47 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied
 from .models import ChatRoom, Message
 from .serializers import ChatRoomSerializer, MessageSerializer
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_api_key.permissions import HasAPIKey
+from accounts.permissions import CachedHasAPIKey
 from .pagination import CursorMessagePagination,CursorChatroomPagination
-from rest_framework.throttling import UserRateThrottle
+from connectsphere_backend.throttling import RedisUserRateThrottle
+from rest_framework.settings import api_settings
+from connectsphere_backend.renderers import MessagePackRenderer
+from connectsphere_backend.parsers import MessagePackParser
+from connectsphere_backend.exports import ExportContentNegotiation, export_format, export_response
 from django.utils import timezone
-from django.db.models import OuterRef,Count,Subquery,Prefetch,IntegerField,Q
+from django.db.models import OuterRef,Count,Subquery,Prefetch,IntegerField,Q,Max
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 from accounts.models import User
-import os
+from accounts.pagination import CustomPagination
+from .events import publish_event
+from .receipts import coalesce_mark_read, read_receipt_metrics
+from .analytics import chat_analytics
+from .activity import GROUP_BY, activity_summary, parse_period, room_activity
+from .sharding import is_sharded, message_db, room_ordering
+from .queries import (
+    MESSAGE_EXPORT_COLUMNS, attach_last_messages, attach_readers, find_message, readers_queryset,
+    room_message_rows, sharded_deleted_messages, sharded_user_messages
+)
 import redis
-import json
-import datetime
 
-REDIS_URL = os.getenv("REDIS_URL")
-
-redis_client = redis.Redis.from_url(REDIS_URL,ssl_cert_reqs=None )
-
-def serialize_datetime(obj):
-    if isinstance(obj, datetime.datetime):  
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
+def check_can_list_chatrooms(user):
+    # Also enforced by the async chatroom_list (chat/async_views.py).
+    if not hasattr(user, 'role') or user.role is None:
+        raise PermissionDenied("You do not have permission to view chat rooms.")
 
 class ChatRoomViewSet(viewsets.ModelViewSet):
     queryset = ChatRoom.objects.all()
     serializer_class = ChatRoomSerializer
     pagination_class = CursorChatroomPagination
-    permission_classes = [HasAPIKey,IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    permission_classes = [CachedHasAPIKey,IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
 
     def get_queryset(self):
         request = self.request
@@ -42,22 +52,27 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         queryset=User.objects.only('id', 'first_name', 'last_name')
         )
 
-        chatrooms = ChatRoom.objects.prefetch_related(prefetch_users).select_related('last_message__sender').filter(is_deleted=False)
+        chatrooms = ChatRoom.objects.prefetch_related(prefetch_users).filter(is_deleted=False)
+        if not is_sharded():
+            chatrooms = chatrooms.select_related('last_message__sender')
         
-        return chatrooms.order_by('-last_message__timestamp','-created_at','-id')
+        return chatrooms.order_by(*room_ordering())
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
 
         queryset = queryset.filter(participants=request.user)
         
-        if not hasattr(request.user, 'role') or request.user.role is None:
-            raise PermissionDenied("You do not have permission to view chat rooms.")
+        check_can_list_chatrooms(request.user)
 
-        serializer = self.get_serializer(queryset, many=True)
+        chatrooms = list(queryset)
+        if is_sharded():
+            attach_last_messages(chatrooms)
+
+        serializer = self.get_serializer(chatrooms, many=True)
         return Response({
             'results': serializer.data,
-            'count': queryset.count()
+            'count': len(chatrooms)
         })
 
     def retrieve(self, request, *args, **kwargs):
@@ -73,6 +88,23 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def activity(self, request, pk=None):
+        chatroom = self.get_object()
+
+        if request.user.role.name != 'CEO' and not chatroom.participants.filter(pk=request.user.pk).exists():
+            return Response(
+                {'error': 'You are not a participant of this chatroom'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            start, end = parse_period(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(room_activity(chatroom, start, end), status=status.HTTP_200_OK)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -110,17 +142,7 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                     data = self.get_serializer(existing_chat).data
                     data['message'] = 'Chatroom already exists.'
 
-                try:
-                    redis_client.publish(
-                    'room_events',
-                        json.dumps({
-                            'event': 'room_created',
-                            'roomId':str(existing_chat.id),
-                            'data': data  
-                        },default=serialize_datetime))
-                    
-                except redis.exceptions.RedisError as e:
-                    logger.error(f"Redis publish failed: {e}") 
+                publish_event('room_events', 'room_created', existing_chat.id, data)
 
                 return Response(data, status=status.HTTP_200_OK)
             
@@ -129,17 +151,7 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
             chatroom.participants.add(user, other_user_id)
             data = self.get_serializer(chatroom).data
 
-            try:
-                redis_client.publish(
-                    'room_events',
-                    json.dumps({
-                        'event': 'room_created',
-                        'roomId': str(chatroom.id),
-                        'data': data  
-                    }, default=serialize_datetime)
-                )
-            except redis.exceptions.RedisError as e:
-                logger.error(f"Redis publish failed: {e}")
+            publish_event('room_events', 'room_created', chatroom.id, data)
 
             return Response(data, status=status.HTTP_201_CREATED)
 
@@ -164,17 +176,7 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
             chatroom.participants.add(user, *participants)
             data = self.get_serializer(chatroom).data
             
-            try:
-                redis_client.publish(
-                    'room_events',
-                    json.dumps({
-                        'event': 'room_created',
-                        'roomId':str(chatroom.id),
-                        'data': data
-                    }, default=serialize_datetime)
-                )
-            except redis.exceptions.RedisError as e:
-                logger.error(f"Redis publish failed: {e}")
+            publish_event('room_events', 'room_created', chatroom.id, data)
             
             return Response(data, status=status.HTTP_201_CREATED)
         else:
@@ -233,20 +235,10 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
             for user in new_users
         ]
         
-        try:
-            redis_client.publish(
-                'room_events',
-                json.dumps({
-                    'event': 'participants_added',
-                    'roomId': str(room.id),
-                    'data': {
-                        'users': users_info,
-                        'roomId': room.id
-                    }
-                })
-            )
-        except redis.exceptions.RedisError as e:
-            logger.error(f"Redis publish failed: {e}") 
+        publish_event('room_events', 'participants_added', room.id, {
+            'users': users_info,
+            'roomId': room.id
+        })
 
         return Response({'message': 'Participants added successfully'}, status=status.HTTP_200_OK)
 
@@ -288,17 +280,7 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         chatroom.is_restored = False
         chatroom.save()
 
-        try:    
-            redis_client.publish(
-                'room_events',
-                json.dumps({
-                    'event': 'room_deleted',
-                    'roomId': str(chatroom.id),
-                    'data': {'roomId': chatroom.id}
-                })
-            )
-        except redis.exceptions.ConnectionError as e:
-            print(f"Redis publish failed: {e}")  
+        publish_event('room_events', 'room_deleted', chatroom.id, {'roomId': chatroom.id})
 
         return Response({'message': 'Chatroom successfully deleted (soft delete)'},
                         status=status.HTTP_200_OK)
@@ -368,24 +350,14 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         chatroom.last_modified_at = timezone.now()
         chatroom.save()
         
-        try:
-            redis_client.publish(
-                'room_events',
-                json.dumps({
-                    'event': 'participant_removed',
-                    'roomId': str(chatroom.id),
-                    'data': {
-                            'user': {
-                                'id': user_to_remove.id,
-                                'first_name': user_to_remove.first_name,
-                                'last_name': user_to_remove.last_name,
-                            },
-                            'roomId': chatroom.id
-                        }
-                })
-            )
-        except redis.exceptions.RedisError as e:
-            logger.error(f"Redis publish failed: {e}")
+        publish_event('room_events', 'participant_removed', chatroom.id, {
+            'user': {
+                'id': user_to_remove.id,
+                'first_name': user_to_remove.first_name,
+                'last_name': user_to_remove.last_name,
+            },
+            'roomId': chatroom.id
+        })
 
         return Response(
             {'message': f'Participant {user_id} removed successfully'},
@@ -396,13 +368,21 @@ class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     pagination_class = CursorMessagePagination
-    permission_classes = [HasAPIKey,IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    permission_classes = [CachedHasAPIKey,IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
     
     def get_queryset(self):
         user = self.request.user
         room_id = self.request.query_params.get('room_id')
 
+        if is_sharded():
+            return sharded_user_messages(user, room_id).prefetch_related(
+                Prefetch('sender', queryset=readers_queryset()),
+                'room__participants'
+            ).order_by('-timestamp')
+
         user_chatrooms = ChatRoom.objects.filter(participants=user)
 
         messages = Message.objects.filter(room__in=user_chatrooms)
@@ -421,6 +401,8 @@ class MessageViewSet(viewsets.ModelViewSet):
         page = self.paginate_queryset(queryset)
         
         if page is not None:
+            if is_sharded():
+                attach_readers(page)
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
 
@@ -436,21 +418,12 @@ class MessageViewSet(viewsets.ModelViewSet):
         message = serializer.save(sender=self.request.user, is_sent=True, is_delivered=True)
         message.read_by.add(self.request.user)
         message.room.last_message = message
+        message.room.last_message_at = message.timestamp
         message.room.save()
 
         message_data = MessageSerializer(message).data
 
-        try:
-            redis_client.publish(
-                'message_events',
-                json.dumps({
-                    'event': 'new_message',
-                    'roomId': str(room_id),
-                    'data': message_data
-                })
-            )
-        except redis.exceptions.RedisError as e:
-            logger.error(f"Redis publish failed: {e}")
+        publish_event('message_events', 'new_message', room_id, message_data)
 
     def update(self, request, *args, **kwargs):
         message_id = kwargs.get('pk')
@@ -464,7 +437,7 @@ class MessageViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            message = Message.objects.get(id=message_id)
+            message = find_message(message_id, room_id)
         except Message.DoesNotExist:
             return Response(
                 {'error': 'Message not found'},
@@ -498,17 +471,7 @@ class MessageViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         serializer.save()
         
-        try:
-            redis_client.publish(
-                'message_events',
-                json.dumps({
-                    'event': 'edit_message',
-                    'roomId': str(room_id),
-                    'data': serializer.data
-                })
-            )
-        except redis.exceptions.RedisError as e:
-            logger.error(f"Redis publish failed: {e}")
+        publish_event('message_events', 'edit_message', room_id, serializer.data)
         
         return Response(serializer.data)
 
@@ -523,7 +486,7 @@ class MessageViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            message = Message.objects.get(id=message_id)
+            message = find_message(message_id, room_id)
         except Message.DoesNotExist:
             return Response(
                 {'error': 'Message not found'},
@@ -557,23 +520,30 @@ class MessageViewSet(viewsets.ModelViewSet):
 
         message_data = MessageSerializer(message).data
         
-        try:
-            redis_client.publish(
-                'message_events',
-                json.dumps({
-                    'event': 'delete_message',
-                    'roomId': str(room_id),
-                    'data': message_data
-                })
-            )
-        except redis.exceptions.RedisError as e:
-            logger.error(f"Redis publish failed: {e}")
+        publish_event('message_events', 'delete_message', room_id, message_data)
         
         return Response(
             {'message': 'Message soft deleted successfully'},
             status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=['get'], content_negotiation_class=ExportContentNegotiation)
+    def export(self, request):
+        room_id = request.query_params.get('room_id')
+        try:
+            room_id = int(room_id)
+        except (TypeError, ValueError):
+            return Response({"error": "room_id is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not ChatRoom.objects.filter(id=room_id, participants=request.user).exists():
+            raise PermissionDenied(detail="You are not a participant of this room.")
+
+        fmt = export_format(request)
+        if fmt is None:
+            return Response({"error": "file_format must be csv or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return export_response(request, room_message_rows(room_id), MESSAGE_EXPORT_COLUMNS, fmt, f'room_{room_id}_messages')
+
     @action(detail=False, methods=['post'])
     def mark_as_read(self, request):
         user = request.user
@@ -593,70 +563,95 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        unread_message_ids = Message.objects.filter(
-            room=room,
-            is_deleted=False
-        ).exclude(
-            read_by=user
-        ).values_list('id', flat=True)
+        up_to = room.last_message_id or Message.objects.using(message_db(room.id)).filter(
+            room=room
+        ).aggregate(Max('id'))['id__max']
 
-        if not unread_message_ids:
+        if not up_to:
             return Response(
                 {'message': 'No unread messages found.'},
                 status=status.HTTP_200_OK
             )
 
-        MessageRead = Message.read_by.through
-        batch_size = 500  
-        
         try:
-            for i in range(0, len(unread_message_ids), batch_size):
-                batch = unread_message_ids[i:i + batch_size]
-                objs = [
-                    MessageRead(message_id=mid, user_id=user.id)
-                    for mid in batch
-                ]
-                MessageRead.objects.bulk_create(objs, ignore_conflicts=True)
-
-            # redis_client.publish(
-            #     'room_events',
-            #     json.dumps({
-            #         'event': 'mark_read',
-            #         # 'roomId': str(room_id),
-            #         'data': {'user': user,'roomId': room_id}
-            #     })
-            # )
-
-            redis_client.publish(
-                'room_events',
-                json.dumps({
-                    'event': 'mark_read',
-                    'roomId': str(room_id),
-                    'data': {
-                        'user': {
-                            'id': user.id,
-                            'first_name': user.first_name,
-                            'last_name': user.last_name,
-                        },
-                        'roomId': room_id
-                    }
-                })
-            )
-                
+            count = coalesce_mark_read(room.id, user, up_to)
         except Exception as e:
             return Response(
                 {'error': f'Error marking messages as read: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        if not count:
+            return Response(
+                {'message': 'No unread messages found.'},
+                status=status.HTTP_200_OK
+            )
+
         return Response(
             {
                 'message': 'Messages marked as read successfully.',
-                'count': len(unread_message_ids)
+                'count': count
             },
             status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=['get'])
+    def read_receipt_metrics(self, request):
+        if request.user.role.name != 'CEO':
+            return Response(
+                {'error': 'Only the CEO can view read receipt metrics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            metrics = read_receipt_metrics()
+        except redis.exceptions.RedisError as e:
+            return Response(
+                {'error': f'Read receipt metrics unavailable: {str(e)}'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        return Response(metrics, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        if request.user.role.name != 'CEO':
+            return Response(
+                {'error': 'Only the CEO can view chat analytics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= 90:
+            return Response({'error': 'days must be between 1 and 90'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(chat_analytics(days), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def activity(self, request):
+        if request.user.role.name != 'CEO':
+            return Response(
+                {'error': 'Only the CEO can view chat activity'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        group_by = request.query_params.get('group_by', 'department')
+        if group_by not in GROUP_BY:
+            return Response(
+                {'error': f"group_by must be one of: {', '.join(GROUP_BY)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start, end = parse_period(request.query_params)
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(activity_summary(start, end, group_by, limit), status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def restore_message(self, request, pk=None):
         if request.user.role.name != 'CEO':
@@ -666,7 +661,7 @@ class MessageViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            message = Message.objects.get(id=pk)
+            message = find_message(pk)
         except Message.DoesNotExist:
             return Response(
                 {'error': 'Message not found'},
@@ -691,11 +686,16 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        queryset = Message.objects.filter(is_deleted=True).order_by('-last_deleted_at')
+        if is_sharded():
+            queryset = sharded_deleted_messages()
+        else:
+            queryset = Message.objects.filter(is_deleted=True).order_by('-last_deleted_at')
         paginator = CustomPagination()
         paginated_queryset = paginator.paginate_queryset(queryset, request)
 
         if paginated_queryset is not None:
+            if is_sharded():
+                attach_readers(paginated_queryset)
             serializer = self.get_serializer(paginated_queryset, many=True)
             return paginator.get_paginated_response(serializer.data)
 
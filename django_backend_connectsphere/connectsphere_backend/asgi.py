@@ -3,6 +3,10 @@ ASGI config for connectsphere_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async chat endpoints (the Server-Sent Events stream in ``chat.async_views``)
+only run without tying up a thread per connection when served from here, e.g.
+``uvicorn connectsphere_backend.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -14,3 +18,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'connectsphere_backend.settings')
 
 application = get_asgi_application()
+
+# Start building this worker's participant picker index in the background.
+from accounts import autocomplete  # noqa: E402
+
+autocomplete.start()
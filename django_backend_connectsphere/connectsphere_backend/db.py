@@ -0,0 +1,52 @@
+import os
+import threading
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Per process: how often a request had to open a new database connection.
+_opened = 0
+_opened_lock = threading.Lock()
+
+
+def count_connection(sender, connection, **kwargs):
+    global _opened
+    with _opened_lock:
+        _opened += 1
+
+
+connection_created.connect(count_connection)
+
+
+def connection_metrics(alias='default'):
+    connection = connections[alias]
+    metrics = {
+        'pid': os.getpid(),
+        'connections_opened': _opened,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'pool': None,
+    }
+
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        stats = pool.get_stats()
+        metrics['pool'] = {
+            'min_size': pool.min_size,
+            'max_size': pool.max_size,
+            'size': stats.get('pool_size', 0),
+            'available': stats.get('pool_available', 0),
+            'waiting': stats.get('requests_waiting', 0),
+            'requests': stats.get('requests_num', 0),
+            'requests_queued': stats.get('requests_queued', 0),
+            'wait_ms_total': stats.get('requests_wait_ms', 0),
+            'wait_timeouts': stats.get('requests_errors', 0),
+            'connections_opened': stats.get('connections_num', 0),
+            'connection_errors': stats.get('connections_errors', 0),
+            'connections_lost': stats.get('connections_lost', 0),
+        }
+        queued = metrics['pool']['requests_queued']
+        metrics['pool']['avg_wait_ms'] = (
+            round(metrics['pool']['wait_ms_total'] / queued, 2) if queued else 0
+        )
+
+    return metrics
@@ -0,0 +1,36 @@
+import csv
+import io
+import orjson
+
+# Streaming CSV / JSON Lines imports, the counterpart of exports.py: rows
+# are read one at a time from the upload or file, so callers can validate
+# and write them in batches (exports.batched) with flat memory use.
+
+
+def detect_format(name):
+    return 'jsonl' if name.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def iter_rows(stream, fmt):
+    """Yield (line number, row dict) from a binary or text stream."""
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            row = None
+        yield line, row if isinstance(row, dict) else {'__invalid__': 'Not a JSON object.'}
+
+
+def clean(value):
+    return value.strip() if isinstance(value, str) else value
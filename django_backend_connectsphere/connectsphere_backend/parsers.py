@@ -0,0 +1,29 @@
+import msgpack
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser backed by orjson.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses `application/msgpack` request bodies.
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (msgpack.UnpackException, ValueError) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
@@ -0,0 +1,24 @@
+import os
+import weakref
+import asyncio
+import redis
+import redis.asyncio as aioredis
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Only TLS connections take ssl_cert_reqs; plain redis:// ones reject it.
+REDIS_OPTIONS = {"ssl_cert_reqs": None} if REDIS_URL and REDIS_URL.startswith("rediss://") else {}
+
+redis_client = redis.Redis.from_url(REDIS_URL, **REDIS_OPTIONS)
+
+# asyncio connections belong to the loop that opened them: one client per
+# running loop (a single one under an ASGI server).
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def async_redis_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = aioredis.Redis.from_url(REDIS_URL, **REDIS_OPTIONS)
+    return client
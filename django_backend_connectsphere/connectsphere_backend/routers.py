@@ -0,0 +1,93 @@
+import random
+import contextvars
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+PRIMARY = 'default'
+
+# Set per request by ReplicaRoutingMiddleware. Reads go to a replica unless
+# the request is a write, has written, or belongs to a user who wrote in
+# the last REPLICA_PIN_SECONDS. Pins live in the default cache, so they
+# only reach every worker when that cache is shared (REDIS_URL); with the
+# per-process fallback a user's next request may land on a worker that
+# never saw the pin and read a lagging replica.
+_routing = contextvars.ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, use_primary=False):
+        self.use_primary = use_primary
+        self.wrote = False
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def pin_user(user_id):
+    cache.set(pin_key(user_id), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def use_primary_if_pinned(user_id):
+    state = _routing.get()
+    if state is None or state.use_primary:
+        return
+    if cache.get(pin_key(user_id)):
+        state.use_primary = True
+
+
+async def ause_primary_if_pinned(user_id):
+    state = _routing.get()
+    if state is None or state.use_primary:
+        return
+    if await cache.aget(pin_key(user_id)):
+        state.use_primary = True
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.use_primary:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(replica_aliases())
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # Later reads in this request must see the write.
+            state.use_primary = True
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(use_primary=request.method not in ('GET', 'HEAD', 'OPTIONS'))
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin_user(user.pk)
+
+        return response
@@ -0,0 +1,58 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import BigIntegerField, ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.functions import Cast, Greatest, Upper
+
+# Directory search ranked by pg_trgm word similarity. Every searched column
+# has a GIN trigram index on UPPER(column) (trigram_index below), which
+# serves both the substring match Django generates for icontains
+# (UPPER(col) LIKE UPPER('%q%')) and the fuzzy `<%` match, so neither
+# needs a sequential scan.
+#
+# The fuzzy match uses pg_trgm.word_similarity_threshold, which every
+# connection sets to SEARCH_MIN_SIMILARITY (see DATABASES in settings).
+#
+# Ranks tie often (every exact substring match, for one), and a cursor
+# needs a unique sort key to resume from, so results also get search_order:
+# the rank in millionths, then the pk, packed into one bigint. Descending,
+# it gives best match first and ties by ascending pk.
+RANK_STEPS = 10 ** 6
+PK_SPAN = 2 ** 32
+
+
+def trigram_index(field, name):
+    return GinIndex(OpClass(Upper(field), name='gin_trgm_ops'), name=name)
+
+
+def ranked_search(queryset, query, fields):
+    """
+    Filter queryset to rows where any of fields contains query or is
+    similar to it, annotated with search_rank (best similarity, 0-1) and
+    search_order. Order by -search_order for best matches first.
+    """
+    matches = Q()
+    for field in fields:
+        matches |= Q(**{f'{field}__icontains': query})
+
+    if connections[queryset.db].vendor != 'postgresql':
+        return with_search_order(queryset.filter(matches).annotate(search_rank=Value(1.0, output_field=FloatField())))
+
+    term = Value(query.upper())
+    similarities = []
+    for field in fields:
+        matches |= TrigramWordSimilar(Upper(field), term)
+        similarities.append(TrigramWordSimilarity(term, Upper(field)))
+
+    rank = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+    # word_similarity() is a real; as double precision the rank survives a
+    # round trip through a pagination cursor unchanged.
+    return with_search_order(queryset.filter(matches).annotate(search_rank=Cast(rank, FloatField())))
+
+
+def with_search_order(queryset):
+    steps = Cast(F('search_rank') * RANK_STEPS, BigIntegerField())
+    return queryset.annotate(
+        search_order=ExpressionWrapper(steps * PK_SPAN - F('pk'), output_field=BigIntegerField())
+    )
@@ -75,21 +75,32 @@ AUTH_USER_MODEL = 'accounts.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework_api_key.permissions.HasAPIKey',
+        'accounts.permissions.CachedHasAPIKey',
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'connectsphere_backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'connectsphere_backend.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'connectsphere_backend.throttling.RedisUserRateThrottle',
+        'connectsphere_backend.throttling.RedisAnonRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '500/hour',  # 500 requests per hour per user
         'anon': '30/minute',  # 30 requests per minute for anonymous users
+        'autocomplete': '120/minute',  # participant picker, one request per keystroke
+        'document_upload': '3000/hour',  # chunked document uploads, one request per part
     }
 
 }
@@ -103,6 +114,86 @@ SIMPLE_JWT = {
      
 }
 
+# Shared cache for all workers. Throttling talks to Redis directly
+# (connectsphere_backend/throttling.py); this covers everything else.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {'ssl_cert_reqs': None} if REDIS_URL.startswith('rediss://') else {},
+        }
+    }
+
+# How long an authenticated user (with role) stays cached between requests.
+# Only with REDIS_URL set: the per-process fallback cache isn't used for
+# users (see accounts/cache.py).
+AUTH_USER_CACHE_SECONDS = int(os.getenv('AUTH_USER_CACHE_SECONDS', 60))
+
+# Verified API keys are trusted for this long without re-checking the
+# database; the per-process copy (which a revocation can't reach in other
+# workers) for the shorter time.
+API_KEY_CACHE_SECONDS = int(os.getenv('API_KEY_CACHE_SECONDS', 300))
+API_KEY_LOCAL_CACHE_SECONDS = int(os.getenv('API_KEY_LOCAL_CACHE_SECONDS', 5))
+
+# Rows fetched per round trip (and encoded per block) by the CSV / JSONL
+# exports.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Org chart responses are cached this long at most; any change to the
+# reporting hierarchy invalidates them sooner.
+ORG_CHART_CACHE_SECONDS = int(os.getenv('ORG_CHART_CACHE_SECONDS', 600))
+
+# Chat analytics: a message counts as a response to the previous one in
+# its room if someone else sent it within this window. Each day's metrics
+# are cached; past days for CHAT_ANALYTICS_DAY_CACHE_SECONDS, today only
+# briefly since it is still filling up.
+CHAT_ANALYTICS_RESPONSE_WINDOW_SECONDS = int(os.getenv('CHAT_ANALYTICS_RESPONSE_WINDOW_SECONDS', 3600))
+CHAT_ANALYTICS_DAY_CACHE_SECONDS = int(os.getenv('CHAT_ANALYTICS_DAY_CACHE_SECONDS', 86400))
+CHAT_ANALYTICS_TODAY_CACHE_SECONDS = int(os.getenv('CHAT_ANALYTICS_TODAY_CACHE_SECONDS', 300))
+
+# rollup_chat_activity leaves messages younger than this for its next run,
+# so transactions still committing lower message ids aren't skipped.
+CHAT_ROLLUP_LAG_SECONDS = int(os.getenv('CHAT_ROLLUP_LAG_SECONDS', 300))
+
+# Chunked document uploads (employees/uploads.py). Parts are kept in
+# DOCUMENT_UPLOAD_DIR until the upload completes, so it must be shared by
+# every API worker; uploads left incomplete are removed by
+# purge_document_uploads after DOCUMENT_UPLOAD_EXPIRY_HOURS.
+DOCUMENT_UPLOAD_DIR = os.getenv('DOCUMENT_UPLOAD_DIR', os.path.join(BASE_DIR, 'upload_parts'))
+DOCUMENT_UPLOAD_PART_SIZE = int(os.getenv('DOCUMENT_UPLOAD_PART_SIZE', 8 * 1024 * 1024))
+DOCUMENT_UPLOAD_MAX_BYTES = int(os.getenv('DOCUMENT_UPLOAD_MAX_BYTES', 200 * 1024 * 1024))
+DOCUMENT_UPLOAD_EXPIRY_HOURS = int(os.getenv('DOCUMENT_UPLOAD_EXPIRY_HOURS', 24))
+
+# Processes used to hash passwords when management commands create users
+# in bulk (0: one per CPU). Requests always hash in-process.
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0))
+
+# POST /users/bulk/ hashes each password in the request (PBKDF2, a few
+# hundred milliseconds each), so it takes at most this many users and
+# passwords, well inside the worker timeout. Larger batches go through
+# the provision_users management command.
+BULK_PROVISION_MAX_USERS = int(os.getenv('BULK_PROVISION_MAX_USERS', 500))
+BULK_PROVISION_MAX_PASSWORDS = int(os.getenv('BULK_PROVISION_MAX_PASSWORDS', 40))
+
+# Realtime chat events (Server-Sent Events over ASGI)
+CHAT_EVENT_STREAM_MAXLEN = int(os.getenv('CHAT_EVENT_STREAM_MAXLEN', 10000))
+SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+SSE_RETRY_MILLISECONDS = int(os.getenv('SSE_RETRY_MILLISECONDS', 3000))
+SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', 256))
+SSE_REPLAY_LIMIT = int(os.getenv('SSE_REPLAY_LIMIT', 1000))
+
+# Repeated mark_as_read calls by a user in a room within this window are
+# merged into one write and one mark_read event. The merged write is made
+# by a later mark_as_read request (up to READ_RECEIPT_FLUSH_PER_REQUEST
+# pairs each) or by the flush_read_receipts command, whichever comes first.
+# Requests alone leave a merged mark unwritten until someone marks a room
+# read again, so run `manage.py flush_read_receipts --interval 1` next to
+# the web workers (or from cron every minute, at the cost of the delay).
+READ_RECEIPT_COALESCE_MS = int(os.getenv('READ_RECEIPT_COALESCE_MS', 2000))
+READ_RECEIPT_FLUSH_PER_REQUEST = int(os.getenv('READ_RECEIPT_FLUSH_PER_REQUEST', 20))
+
 # CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') 
 CORS_ALLOWED_ORIGINS = [
     origin for origin in os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if origin
@@ -130,6 +221,14 @@ WSGI_APPLICATION = 'connectsphere_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Directory search: the least pg_trgm word similarity (0-1) a name or email
+# needs to match a query it doesn't contain outright. Sent as a PostgreSQL
+# startup parameter, so it costs no extra query. PgBouncer refuses startup
+# parameters: behind it, set DATABASE_STARTUP_OPTIONS=0 and set the threshold
+# on the role instead (ALTER ROLE ... SET pg_trgm.word_similarity_threshold).
+SEARCH_MIN_SIMILARITY = float(os.getenv('SEARCH_MIN_SIMILARITY', 0.4))
+DATABASE_STARTUP_OPTIONS = os.getenv('DATABASE_STARTUP_OPTIONS', '1') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DATABASE_ENGINE'),
@@ -141,9 +240,70 @@ DATABASES = {
         'OPTIONS': {
             'sslmode':os.getenv('DATABASE_SSL_MODE') ,  
         },
+        # Reuse connections across requests instead of opening a new TLS
+        # connection each time; checked before reuse after an error.
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and DATABASE_STARTUP_OPTIONS:
+    DATABASES['default']['OPTIONS']['options'] = f'-c pg_trgm.word_similarity_threshold={SEARCH_MIN_SIMILARITY}'
+
+# Setting DATABASE_POOL_MAX_SIZE switches to psycopg 3's connection pool
+# (needs `pip install "psycopg[binary,pool]"`). Persistent connections
+# and pooling are mutually exclusive. Prefer the pool under ASGI.
+DATABASE_POOL_MAX_SIZE = int(os.getenv('DATABASE_POOL_MAX_SIZE', 0))
+if DATABASE_POOL_MAX_SIZE:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', 2)),
+        'max_size': DATABASE_POOL_MAX_SIZE,
+        'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+    }
+
+
+# Read replicas: comma-separated host[:port] list, same credentials as the
+# primary. Safe requests read from a random replica; writes, and a user's
+# reads for REPLICA_PIN_SECONDS after they write, use the primary. The pin
+# is kept in the default cache: without REDIS_URL that cache is per
+# process, so only the worker that served the write honours it.
+DATABASE_REPLICA_HOSTS = [host for host in os.getenv('DATABASE_REPLICA_HOSTS', '').split(',') if host]
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+for index, replica in enumerate(DATABASE_REPLICA_HOSTS):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': int(port) if port else DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Message shards: comma-separated host[:port] list, one messages_N database
+# each (N from 1; the primary is the first shard). CHAT_MESSAGE_SHARDS is the
+# hash ring actually used to place rooms, by default the primary plus every
+# shard; list a subset while reshard_messages fills a new one.
+CHAT_MESSAGE_SHARD_HOSTS = [host for host in os.getenv('CHAT_MESSAGE_SHARD_HOSTS', '').split(',') if host]
+CHAT_MESSAGE_SHARD_DATABASES = ['default']
+for index, shard in enumerate(CHAT_MESSAGE_SHARD_HOSTS, start=1):
+    host, _, port = shard.partition(':')
+    DATABASES[f'messages_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': int(port) if port else DATABASES['default']['PORT'],
+    }
+    CHAT_MESSAGE_SHARD_DATABASES.append(f'messages_{index}')
+CHAT_MESSAGE_SHARDS = [
+    alias for alias in os.getenv('CHAT_MESSAGE_SHARDS', '').split(',') if alias
+] or CHAT_MESSAGE_SHARD_DATABASES
+
+DATABASE_ROUTERS = []
+if len(CHAT_MESSAGE_SHARD_DATABASES) > 1:
+    DATABASE_ROUTERS.append('chat.sharding.MessageShardRouter')
+if DATABASE_REPLICA_HOSTS:
+    DATABASE_ROUTERS.append('connectsphere_backend.routers.PrimaryReplicaRouter')
+    MIDDLEWARE.append('connectsphere_backend.routers.ReplicaRoutingMiddleware')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
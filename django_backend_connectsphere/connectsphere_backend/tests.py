@@ -0,0 +1,265 @@
+import datetime
+import decimal
+import io
+import json
+import threading
+import time
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+import msgpack
+import redis
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from .parsers import MessagePackParser, ORJSONParser
+from .redis_client import redis_client
+from .renderers import MessagePackRenderer, ORJSONRenderer
+from .routers import PRIMARY, PrimaryReplicaRouter, ReplicaRoutingMiddleware, use_primary_if_pinned
+from .throttling import RedisUserRateThrottle
+
+
+class FiveASecondThrottle(RedisUserRateThrottle):
+    rate = '5/second'
+
+    def __init__(self, key):
+        super().__init__()
+        self.test_key = key
+
+    def get_cache_key(self, request, view):
+        return self.test_key
+
+
+class FiveAMinuteThrottle(FiveASecondThrottle):
+    # Slow enough that no interval is paid back while a test runs.
+    rate = '5/minute'
+
+
+class RedisThrottleTests(SimpleTestCase):
+    # Against the Redis at REDIS_URL, as the throttle itself runs.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            redis_client.ping()
+        except redis.exceptions.RedisError:
+            raise unittest.SkipTest('The GCRA throttle tests need the Redis at REDIS_URL.')
+
+    def setUp(self):
+        self.key = f'throttle:test:{uuid.uuid4().hex}'
+        self.addCleanup(redis_client.delete, self.key)
+
+    def allow(self):
+        return FiveASecondThrottle(self.key).allow_request(None, None)
+
+    def test_allows_the_rate_then_rejects(self):
+        self.assertEqual([self.allow() for _ in range(5)], [True] * 5)
+
+        throttle = FiveASecondThrottle(self.key)
+        self.assertFalse(throttle.allow_request(None, None))
+        # One emission interval (200 ms) until the next request fits.
+        self.assertGreater(throttle.wait(), 0)
+        self.assertLessEqual(throttle.wait(), 0.2)
+
+    def test_allows_again_after_the_wait(self):
+        for _ in range(5):
+            self.allow()
+        throttle = FiveASecondThrottle(self.key)
+        self.assertFalse(throttle.allow_request(None, None))
+
+        time.sleep(throttle.wait() + 0.01)
+        # Exactly one interval has been paid back, so one request fits.
+        self.assertTrue(self.allow())
+        self.assertFalse(self.allow())
+
+    def test_rejected_requests_are_not_counted(self):
+        for _ in range(5):
+            self.allow()
+        for _ in range(20):
+            self.assertFalse(self.allow())
+        time.sleep(0.21)
+        self.assertTrue(self.allow())
+
+    def test_separate_keys(self):
+        for _ in range(5):
+            self.allow()
+        self.assertFalse(self.allow())
+
+        other = f'throttle:test:{uuid.uuid4().hex}'
+        self.addCleanup(redis_client.delete, other)
+        self.assertTrue(FiveASecondThrottle(other).allow_request(None, None))
+
+    def test_parallel_requests_admit_exactly_the_rate(self):
+        start = threading.Barrier(20)
+
+        def allow(_):
+            throttle = FiveAMinuteThrottle(self.key)
+            start.wait()
+            return throttle.allow_request(None, None)
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(allow, range(60)))
+
+        self.assertEqual(results.count(True), 5)
+
+    async def test_async_checks_share_the_limit(self):
+        allowed = [self.allow() for _ in range(3)]
+        for _ in range(3):
+            allowed.append(await FiveASecondThrottle(self.key).aallow_request(None, None))
+        self.assertEqual(allowed, [True] * 5 + [False])
+        self.assertFalse(self.allow())
+
+    def test_no_rate_always_allows(self):
+        throttle = FiveASecondThrottle(self.key)
+        throttle.rate = None
+        self.assertTrue(all(throttle.allow_request(None, None) for _ in range(10)))
+
+
+class ThrottleWithoutRedisTests(SimpleTestCase):
+    def test_lets_requests_through_when_redis_is_down(self):
+        throttle = FiveASecondThrottle(f'throttle:test:{uuid.uuid4().hex}')
+        # Point the shared client at a port nobody listens on.
+        original = redis_client.connection_pool
+        redis_client.connection_pool = redis.ConnectionPool.from_url('redis://127.0.0.1:1/0')
+        try:
+            with self.assertLogs('connectsphere_backend.throttling', 'ERROR'):
+                self.assertTrue(all(throttle.allow_request(None, None) for _ in range(10)))
+        finally:
+            redis_client.connection_pool = original
+
+
+# A private cache: clearing the default one would flush the shared Redis.
+@override_settings(
+    REPLICA_PIN_SECONDS=5,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'replica-router-tests'}},
+)
+@mock.patch('connectsphere_backend.routers.replica_aliases', return_value=['replica_0'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+
+    def request(self, method, user_id, view):
+        # Runs view(router) inside the middleware, as a request by user_id
+        # that the authentication class has already checked for a pin.
+        request = getattr(RequestFactory(), method)('/')
+        request.user = SimpleNamespace(pk=user_id, is_authenticated=True)
+        seen = []
+
+        def get_response(request):
+            use_primary_if_pinned(user_id)
+            seen.extend(view(self.router))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(get_response)(request)
+        return seen
+
+    def read(self, router):
+        return [router.db_for_read(None)]
+
+    def test_outside_a_request_reads_the_primary(self, replicas):
+        self.assertEqual(self.router.db_for_read(None), PRIMARY)
+
+    def test_safe_requests_read_a_replica(self, replicas):
+        self.assertEqual(self.request('get', 1, self.read), ['replica_0'])
+
+    def test_unsafe_requests_read_the_primary(self, replicas):
+        self.assertEqual(self.request('post', 1, self.read), [PRIMARY])
+
+    def test_reads_after_a_write_use_the_primary(self, replicas):
+        def view(router):
+            return [router.db_for_read(None), router.db_for_write(None), router.db_for_read(None)]
+
+        self.assertEqual(self.request('get', 1, view), ['replica_0', PRIMARY, PRIMARY])
+
+    def test_writers_are_pinned_to_the_primary(self, replicas):
+        self.request('post', 1, lambda router: [router.db_for_write(None)])
+
+        self.assertEqual(self.request('get', 1, self.read), [PRIMARY])
+        # Only the user who wrote.
+        self.assertEqual(self.request('get', 2, self.read), ['replica_0'])
+
+    def test_pin_expires(self, replicas):
+        with override_settings(REPLICA_PIN_SECONDS=1):
+            self.request('post', 1, lambda router: [router.db_for_write(None)])
+        time.sleep(1.1)
+        self.assertEqual(self.request('get', 1, self.read), ['replica_0'])
+
+    def test_requests_without_writes_pin_nobody(self, replicas):
+        self.request('post', 1, self.read)
+        self.assertEqual(self.request('get', 1, self.read), ['replica_0'])
+
+
+def api_values():
+    # What serializers and views hand the renderers.
+    return {
+        'aware': datetime.datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        'whole_second': datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        'offset': datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30))),
+        'naive': datetime.datetime(2025, 1, 2, 3, 4, 5, 120000),
+        'date': datetime.date(2025, 1, 2),
+        'time': datetime.time(3, 4, 5, 250000),
+        'decimal': decimal.Decimal('4.50'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'duration': datetime.timedelta(seconds=90),
+        'lazy': gettext_lazy('Other'),
+        'text': 'Zoë \u2028 \u2029 "quoted"',
+        'nested': [{'id': 1, 'rating': 3.75, 'active': True, 'manager': None}],
+    }
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_renders_what_the_drf_renderer_does(self):
+        data = {**api_values(), 7: 'non-string key'}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_output_matches_too(self):
+        data = api_values()
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            ORJSONRenderer().render(data, media_type, {}), JSONRenderer().render(data, media_type, {})
+        )
+
+    def test_nothing_renders_as_an_empty_body(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_round_trips_through_the_parser(self):
+        rendered = ORJSONRenderer().render(api_values())
+        parsed = ORJSONParser().parse(io.BytesIO(rendered))
+        self.assertEqual(parsed, json.loads(JSONRenderer().render(api_values())))
+        self.assertEqual(parsed['aware'], '2025-01-02T03:04:05.123456Z')
+        self.assertEqual(parsed['offset'], '2025-01-02T03:04:05+05:30')
+        self.assertEqual(parsed['decimal'], 4.5)
+        self.assertEqual(parsed['uuid'], '12345678-1234-5678-1234-567812345678')
+
+    def test_invalid_json_is_a_parse_error(self):
+        with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+            ORJSONParser().parse(io.BytesIO(b'{"rating": 4.5,'))
+
+
+class MessagePackTests(SimpleTestCase):
+    def test_values_match_the_json_body(self):
+        body = MessagePackRenderer().render(api_values())
+        self.assertEqual(msgpack.unpackb(body, raw=False), json.loads(ORJSONRenderer().render(api_values())))
+
+    def test_round_trips_through_the_parser(self):
+        body = MessagePackRenderer().render(api_values())
+        parsed = MessagePackParser().parse(io.BytesIO(body))
+        self.assertEqual(parsed['aware'], '2025-01-02T03:04:05.123456Z')
+        self.assertEqual(parsed['decimal'], 4.5)
+        self.assertEqual(parsed['uuid'], '12345678-1234-5678-1234-567812345678')
+        self.assertEqual(parsed['nested'], [{'id': 1, 'rating': 3.75, 'active': True, 'manager': None}])
+
+    def test_nothing_renders_as_an_empty_body(self):
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+    def test_invalid_bodies_are_a_parse_error(self):
+        for body in (b'\xc1', b'\x92\x01'):
+            with self.assertRaisesMessage(ParseError, 'MessagePack parse error'):
+                MessagePackParser().parse(io.BytesIO(body))
@@ -0,0 +1,117 @@
+import math
+import logging
+import redis
+from rest_framework.throttling import AnonRateThrottle, ScopedRateThrottle, UserRateThrottle
+from .redis_client import async_redis_client, redis_client
+
+logger = logging.getLogger(__name__)
+
+# GCRA (generic cell rate algorithm). The key holds a single number, the
+# "theoretical arrival time" (TAT) in ms, so each check is O(1) no matter
+# how busy the user is. A request is allowed while TAT stays within one
+# full period ahead of now; allowing it pushes TAT one emission interval
+# further. Time comes from the Redis server so all workers share a clock.
+# Returns {allowed, retry_after_ms}.
+GCRA_LUA = """
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if now < allow_at then
+    return {0, allow_at - now}
+end
+redis.call('SET', KEYS[1], string.format('%.0f', new_tat), 'PX', string.format('%.0f', new_tat - now))
+return {1, 0}
+"""
+GCRA_SCRIPT = redis_client.register_script(GCRA_LUA)
+
+
+class RedisRateThrottleMixin:
+    """
+    Replaces the per-process history list of SimpleRateThrottle with a GCRA
+    check run atomically in Redis, so a rate holds across every worker and
+    node. Requests are let through if Redis is unavailable.
+    """
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def gcra_args(self):
+        # Whole milliseconds per request; the burst window is rounded up to
+        # match so exactly num_requests fit into it.
+        interval_ms = math.ceil(self.duration * 1000 / self.num_requests)
+        return [interval_ms, interval_ms * self.num_requests]
+
+    def gcra_result(self, allowed, retry_after_ms):
+        self.retry_after = retry_after_ms / 1000
+        if allowed:
+            return self.throttle_success()
+        return self.throttle_failure()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        try:
+            return self.gcra_result(*GCRA_SCRIPT(keys=[self.key], args=self.gcra_args()))
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis throttle check failed, allowing request: {e}")
+            return True
+
+    async def aallow_request(self, request, view):
+        # allow_request() for async views, on the loop's asyncio client.
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        script = async_redis_client().register_script(GCRA_LUA)
+        try:
+            return self.gcra_result(*await script(keys=[self.key], args=self.gcra_args()))
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Redis throttle check failed, allowing request: {e}")
+            return True
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class RedisUserRateThrottle(RedisRateThrottleMixin, UserRateThrottle):
+    pass
+
+
+class RedisAnonRateThrottle(RedisRateThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class RedisScopedRateThrottle(RedisRateThrottleMixin, ScopedRateThrottle):
+    def set_scope(self, view):
+        # As ScopedRateThrottle: the rate comes from the view's throttle_scope.
+        self.scope = getattr(view, self.scope_attr, None)
+        if self.scope:
+            self.rate = self.get_rate()
+            self.num_requests, self.duration = self.parse_rate(self.rate)
+        return self.scope
+
+    def allow_request(self, request, view):
+        if not self.set_scope(view):
+            return True
+        return super().allow_request(request, view)
+
+    async def aallow_request(self, request, view):
+        if not self.set_scope(view):
+            return True
+        return await super().aallow_request(request, view)
@@ -21,6 +21,7 @@ from django.conf.urls.static import static
 from django.http import JsonResponse
 
 import connectsphere_backend.admin_site
+from connectsphere_backend.views import database_metrics
 
 def health_check(request):
     return JsonResponse({"status": "OK"}, status=200)
@@ -31,6 +32,7 @@ urlpatterns = [
     path('api/accounts/', include('accounts.urls')), 
     path('api/', include('employees.urls')),  
     path('api/chat/', include('chat.urls')), 
+    path('api/metrics/database/', database_metrics),
 ]
 
 if settings.DEBUG: 
@@ -0,0 +1,16 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from accounts.permissions import CachedHasAPIKey
+from .db import connection_metrics
+
+
+@api_view(['GET'])
+@permission_classes([CachedHasAPIKey, IsAuthenticated])
+def database_metrics(request):
+    if request.user.role.name != 'CEO':
+        return Response({"error": "Only the CEO can view database metrics."}, status=status.HTTP_403_FORBIDDEN)
+
+    # Connections and pools are per process; each worker reports its own.
+    return Response(connection_metrics(), status=status.HTTP_200_OK)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'connectsphere_backend.settings')
 
 application = get_wsgi_application()
+
+# Start building this worker's participant picker index in the background.
+from accounts import autocomplete  # noqa: E402
+
+autocomplete.start()
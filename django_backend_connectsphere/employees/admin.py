@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Department, Employee, EmployeeDocument
+from .models import Department, Employee, EmployeeDocument, PerformanceReview
 from django.utils.html import format_html
 
 class EmployeeInline(admin.TabularInline):
@@ -68,7 +68,24 @@ class EmployeeDocumentAdmin(admin.ModelAdmin):
         return format_html('<a href="{}" target="_blank">View Document</a>', obj.document.url)
     document_link.short_description = 'Document'
 
+class PerformanceReviewAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'department', 'rating', 'previous_rating', 'reviewed_by', 'reviewed_at')
+    search_fields = ('employee__employee_id',)
+    list_filter = ('department', 'reviewed_at')
+    list_select_related = ('employee', 'department', 'reviewed_by')
+
+    # Append-only history.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 admin.site.register(Department, DepartmentAdmin)
 admin.site.register(Employee, EmployeeAdmin)
 admin.site.register(EmployeeDocument, EmployeeDocumentAdmin)
+admin.site.register(PerformanceReview, PerformanceReviewAdmin)
 
@@ -0,0 +1,45 @@
+from django.db import connections, router
+
+
+def employee_id_prefix(department):
+    return department.name.ljust(3)[:3].upper()
+
+
+def format_employee_id(department, number):
+    return f"{employee_id_prefix(department)}{number:04d}"
+
+
+def reserve_employee_numbers(department, count=1):
+    """
+    Claim count consecutive numbers from the department's counter in one
+    UPDATE ... RETURNING, so concurrent hires never get the same number.
+    The row stays locked until the surrounding transaction ends; reserve
+    before, not inside, long-running work. Numbers from a rolled back
+    transaction are handed out again; numbers reserved and then unused are
+    skipped.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1.")
+
+    Department = type(department)
+    alias = router.db_for_write(Department, instance=department)
+    connection = connections[alias]
+    table = connection.ops.quote_name(Department._meta.db_table)
+    column = connection.ops.quote_name(Department._meta.get_field('last_employee_id').column)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {column} = {column} + %s WHERE id = %s RETURNING {column}",
+            [count, department.pk],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        raise Department.DoesNotExist(f"Department {department.pk} does not exist.")
+
+    last = row[0]
+    department.last_employee_id = last
+    return range(last - count + 1, last + 1)
+
+
+def reserve_employee_ids(department, count=1):
+    return [format_employee_id(department, number) for number in reserve_employee_numbers(department, count)]
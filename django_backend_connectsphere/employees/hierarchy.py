@@ -0,0 +1,215 @@
+import time
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+
+# The reporting hierarchy. Employee.reporting_manager points at a User,
+# whose own Employee row points at theirs, and so on up to someone with no
+# manager (the CEO, who usually has no Employee row at all).
+#
+# Walking it is done in one recursive CTE query (subtree_rows, chain_rows).
+# Each Employee also stores its materialised path, the user ids from the
+# top down to its own: '/1/5/23/'. Everyone under user 5 is then
+# org_path__startswith='/1/5/' - an index range scan, see employees_under().
+
+MAX_DEPTH = 50
+ORG_CHART_VERSION_KEY = 'org_chart:version'
+
+
+def _employee_model():
+    return apps.get_model('employees', 'Employee')
+
+
+def _tables():
+    return {
+        'employee': _employee_model()._meta.db_table,
+        'user': apps.get_model('accounts', 'User')._meta.db_table,
+        'role': apps.get_model('accounts', 'Role')._meta.db_table,
+        'department': apps.get_model('employees', 'Department')._meta.db_table,
+    }
+
+
+# Appended to a CTE named tree(user_id, depth).
+NODE_SELECT = """
+    SELECT t.depth, u.id, u.first_name, u.last_name, u.profile_picture, u.is_active, r.name,
+           e.reporting_manager_id, e.employee_id, e.designation, d.name
+    FROM tree t
+    JOIN {user} u ON u.id = t.user_id
+    JOIN {role} r ON r.id = u.role_id
+    LEFT JOIN {employee} e ON e.user_id = t.user_id
+    LEFT JOIN {department} d ON d.id = e.department_id
+    ORDER BY t.depth, u.first_name, u.last_name, u.id
+"""
+
+
+def _fetch_nodes(cte, params, using=None):
+    using = using or router.db_for_read(_employee_model())
+    connection = connections[using]
+    # The anchor's id needs the column's type, or PostgreSQL can't tell
+    # what the recursive term's rows are.
+    id_type = apps.get_model('accounts', 'User')._meta.pk.rel_db_type(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(cte.replace('{id_type}', id_type) + NODE_SELECT.format(**_tables()), params)
+        rows = cursor.fetchall()
+
+    return [
+        {
+            'depth': depth,
+            'id': user_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'profile_picture': profile_picture or None,
+            'is_active': bool(is_active),
+            'role': role,
+            'reporting_manager_id': manager_id,
+            'employee_id': employee_id,
+            'designation': designation,
+            'department': department,
+        }
+        for (depth, user_id, first_name, last_name, profile_picture, is_active, role,
+             manager_id, employee_id, designation, department) in rows
+    ]
+
+
+def subtree_rows(user_id, depth=MAX_DEPTH, using=None):
+    """The user and everyone under them down to depth levels, shallowest first."""
+    employee = _tables()['employee']
+    cte = f"""
+        WITH RECURSIVE tree(user_id, depth) AS (
+            SELECT CAST(%s AS {{id_type}}), 0
+            UNION ALL
+            SELECT e.user_id, t.depth + 1
+            FROM {employee} e JOIN tree t ON e.reporting_manager_id = t.user_id
+            WHERE t.depth < %s
+        )
+    """
+    return _fetch_nodes(cte, [user_id, depth], using)
+
+
+def chain_rows(user_id, using=None):
+    """The user and their managers up to the top, the user first."""
+    employee = _tables()['employee']
+    cte = f"""
+        WITH RECURSIVE tree(user_id, depth) AS (
+            SELECT CAST(%s AS {{id_type}}), 0
+            UNION ALL
+            SELECT e.reporting_manager_id, t.depth + 1
+            FROM {employee} e JOIN tree t ON e.user_id = t.user_id
+            WHERE e.reporting_manager_id IS NOT NULL AND t.depth < %s
+        )
+    """
+    return _fetch_nodes(cte, [user_id, MAX_DEPTH], using)
+
+
+def nest(rows):
+    # Flat subtree_rows() into the root node with 'reports' lists.
+    if not rows:
+        return None
+    nodes = {}
+    for row in rows:
+        nodes[row['id']] = node = {**row, 'reports': []}
+        manager = nodes.get(row['reporting_manager_id'])
+        if row['depth'] and manager is not None:
+            manager['reports'].append(node)
+    return nodes[rows[0]['id']]
+
+
+def manager_ids_above(user_id, using=None):
+    # The user's managers, nearest first: one recursive query, and right
+    # even where stored paths are not.
+    return [row['id'] for row in chain_rows(user_id, using)[1:]]
+
+
+def path_for(user_id, manager_id, using=None):
+    """
+    org_path for user_id reporting to manager_id. Raises ValidationError if
+    that would make the user their own (indirect) manager.
+    """
+    if manager_id is None:
+        return f'/{user_id}/'
+    if manager_id == user_id:
+        raise ValidationError("An employee can't report to themselves.")
+
+    ancestors = [manager_id, *manager_ids_above(manager_id, using)]
+    if user_id in ancestors:
+        raise ValidationError("An employee can't report to someone in their own reporting line.")
+    if len(ancestors) >= MAX_DEPTH:
+        raise ValidationError(f"Reporting lines are limited to {MAX_DEPTH} levels.")
+    return '/' + '/'.join(str(ancestor) for ancestor in reversed(ancestors)) + f'/{user_id}/'
+
+
+def user_paths(user_ids):
+    # Stored paths for users; those without an Employee row are roots.
+    paths = {user_id: f'/{user_id}/' for user_id in user_ids}
+    paths.update(
+        _employee_model().objects.filter(user_id__in=user_ids).exclude(org_path='').values_list('user_id', 'org_path')
+    )
+    return paths
+
+
+def employees_under(user_id):
+    """Filter kwargs for everyone (directly or not) under user_id."""
+    return {'org_path__startswith': user_paths([user_id])[user_id]}
+
+
+def move_subtree(old_path, new_path, using=None):
+    """Re-point every path under old_path (not old_path itself) at new_path."""
+    Employee = _employee_model()
+    moved = Employee.objects.using(using or router.db_for_write(Employee)).filter(
+        org_path__startswith=old_path
+    ).exclude(org_path=old_path).update(
+        org_path=Concat(Value(new_path), Substr('org_path', len(old_path) + 1))
+    )
+    if moved:
+        invalidate_org_chart()
+    return moved
+
+
+def compute_paths(managers):
+    """
+    org_path for every user in managers ({user_id: manager_id or None}),
+    worked out in memory (rebuild_org_paths backfills with it). A loop is
+    cut where it is found: that user becomes a root.
+    """
+    paths = {}
+    for user_id in managers:
+        line, current = [], user_id
+        while current is not None and current not in paths:
+            if current in line or len(line) >= MAX_DEPTH:
+                break
+            line.append(current)
+            current = managers.get(current)
+        prefix = paths.get(current, '/')
+        for member in reversed(line):
+            prefix = paths[member] = f'{prefix}{member}/'
+    return paths
+
+
+# The org chart endpoint's responses are cached under the current version,
+# which any change to the hierarchy replaces. A timestamp rather than a
+# counter: if the key is evicted, the next version still can't collide
+# with entries cached under an earlier one.
+
+def org_chart_version():
+    version = cache.get(ORG_CHART_VERSION_KEY)
+    if version is None:
+        cache.add(ORG_CHART_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(ORG_CHART_VERSION_KEY)
+    return version
+
+
+def invalidate_org_chart():
+    transaction.on_commit(lambda: cache.set(ORG_CHART_VERSION_KEY, time.time_ns(), None))
+
+
+def cached_org_chart(key, build):
+    cache_key = f'org_chart:{org_chart_version()}:{key}'
+    data = cache.get(cache_key)
+    if data is None:
+        data = build()
+        cache.set(cache_key, data, settings.ORG_CHART_CACHE_SECONDS)
+    return data
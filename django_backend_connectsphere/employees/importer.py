@@ -0,0 +1,281 @@
+import secrets
+import time
+from datetime import date
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from accounts.autocomplete import publish_user_changes, user_entry
+from accounts.models import Role, User
+from accounts.provisioning import hash_passwords
+from connectsphere_backend.exports import batched
+from connectsphere_backend.imports import clean, iter_rows
+from .allocation import reserve_employee_ids
+from .hierarchy import invalidate_org_chart, user_paths
+from .skills import normalise_skills
+from .models import Department, Employee
+
+# Streaming bulk import of users with their employee records from CSV or
+# JSON Lines. Rows are read and validated a chunk at a time and each valid
+# chunk is written with two bulk_create calls, so memory stays flat however
+# long the file is.
+#
+# Columns: email, first_name, last_name, department (name), designation,
+# joining_date (YYYY-MM-DD), contact_number, emergency_contact, address;
+# optional: role (default EMPLOYEE), reporting_manager (email of an
+# existing or earlier imported user), skills (list, or ';'-separated in
+# CSV), performance_rating (0-5), password (otherwise the user has to set
+# one through a reset).
+
+REQUIRED_FIELDS = [
+    'email', 'first_name', 'last_name', 'department', 'designation',
+    'joining_date', 'contact_number', 'emergency_contact', 'address',
+]
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0
+
+    def as_dict(self, max_errors=MAX_REPORTED_ERRORS):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': self.failed,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': self.rows_per_second,
+            'errors': self.errors[:max_errors],
+        }
+
+
+class EmployeeImporter:
+    def __init__(self, approved_by=None, chunk_size=1000, dry_run=False, hash_workers=1):
+        self.approved_by = approved_by
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        # Processes hashing passwords; more than one only outside requests
+        # (see hash_passwords).
+        self.hash_workers = hash_workers
+
+        # Lookup maps, loaded once: there are few departments and roles, and
+        # managers are mostly CEO or MANAGER users. Other manager emails are
+        # looked up a chunk at a time.
+        self.roles = {role.name: role for role in Role.objects.all()}
+        self.departments = {department.name.lower(): department for department in Department.objects.all()}
+        self.users_by_email = {
+            email.lower(): user_id
+            for email, user_id in User.objects.filter(role__name__in=['CEO', 'MANAGER']).values_list('email', 'id')
+        }
+        self.seen_emails = set()
+        # org_path of managers, by user id.
+        self.org_paths = {}
+
+    def run(self, stream, fmt):
+        result = ImportResult()
+        for chunk in batched(iter_rows(stream, fmt), self.chunk_size):
+            result.rows += len(chunk)
+            valid = self.validate_chunk(chunk, result)
+            if valid and not self.dry_run:
+                self.insert(valid, result)
+            result.elapsed = time.perf_counter() - result.started
+        return result
+
+    def validate_chunk(self, chunk, result):
+        rows = [(line, {key: clean(value) for key, value in row.items() if key}) for line, row in chunk]
+
+        emails = {str(row.get('email', '')).lower() for _, row in rows}
+        existing = {email.lower() for email in User.objects.filter(email__in=emails).values_list('email', flat=True)}
+
+        managers = {
+            str(row['reporting_manager']).lower() for _, row in rows if row.get('reporting_manager')
+        } - set(self.users_by_email)
+        if managers:
+            self.users_by_email.update(
+                (email.lower(), user_id) for email, user_id in User.objects.filter(email__in=managers).values_list('email', 'id')
+            )
+
+        valid = []
+        for line, row in rows:
+            errors = self.validate_row(row, existing)
+            if errors:
+                result.add_error(line, errors)
+            else:
+                self.seen_emails.add(row['email'])
+                valid.append((line, row))
+        return valid
+
+    def validate_row(self, row, existing):
+        if '__invalid__' in row:
+            return {'row': row['__invalid__']}
+
+        errors = {}
+        for field in REQUIRED_FIELDS:
+            if row.get(field) in (None, ''):
+                errors[field] = 'This field is required.'
+        if errors:
+            return errors
+
+        email = row['email'] = str(row['email']).lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors['email'] = 'Enter a valid email address.'
+        if len(email) > 150:
+            # It doubles as the username.
+            errors['email'] = 'At most 150 characters.'
+        if email in existing:
+            errors['email'] = 'A user with this email already exists.'
+        elif email in self.seen_emails:
+            errors['email'] = 'Duplicate email in this file.'
+
+        role = str(row.get('role') or 'EMPLOYEE').upper()
+        if role not in self.roles:
+            errors['role'] = f'Unknown role. Allowed: {sorted(self.roles)}'
+        row['role'] = role
+
+        department = self.departments.get(str(row['department']).lower())
+        if department is None:
+            errors['department'] = 'Unknown department.'
+        row['department'] = department
+
+        try:
+            row['joining_date'] = date.fromisoformat(str(row['joining_date']))
+        except ValueError:
+            errors['joining_date'] = 'Use YYYY-MM-DD.'
+
+        for field in ('contact_number', 'emergency_contact'):
+            row[field] = str(row[field])
+            if len(row[field]) > 11:
+                errors[field] = 'At most 11 characters.'
+        for field, limit in (('first_name', 150), ('last_name', 150), ('designation', 100)):
+            if len(str(row[field])) > limit:
+                errors[field] = f'At most {limit} characters.'
+
+        # Managers imported in the same file must come before their reports.
+        manager = row['reporting_manager'] = str(row.get('reporting_manager') or '').lower()
+        if manager and manager not in self.users_by_email and manager not in self.seen_emails:
+            errors['reporting_manager'] = 'No user with this email.'
+
+        skills = row.get('skills') or []
+        if isinstance(skills, str):
+            skills = [skill.strip() for skill in skills.split(';') if skill.strip()]
+        if not isinstance(skills, list):
+            errors['skills'] = 'Must be a list.'
+        row['skills'] = normalise_skills(skills)
+
+        rating = row.get('performance_rating')
+        if rating in (None, ''):
+            row['performance_rating'] = None
+        else:
+            try:
+                row['performance_rating'] = float(rating)
+                if not 0.0 <= row['performance_rating'] <= 5.0:
+                    errors['performance_rating'] = 'Must be between 0.0 and 5.0.'
+            except (TypeError, ValueError):
+                errors['performance_rating'] = 'Must be a number.'
+
+        return errors
+
+    @staticmethod
+    def unusable_password():
+        # What make_password(None) stores, without its per-character
+        # get_random_string(): a fifth of the import time otherwise.
+        return UNUSABLE_PASSWORD_PREFIX + secrets.token_urlsafe(30)
+
+    def build(self, row):
+        user = User(
+            email=row['email'],
+            username=row['email'],
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+            role=self.roles[row['role']],
+            is_approved=True,
+            approved_by=self.approved_by,
+            password=self.unusable_password(),
+        )
+        employee = Employee(
+            department=row['department'],
+            designation=row['designation'],
+            joining_date=row['joining_date'],
+            contact_number=row['contact_number'],
+            emergency_contact=row['emergency_contact'],
+            address=row['address'],
+            skills=row['skills'],
+            performance_rating=row['performance_rating'],
+        )
+        return user, employee, row['reporting_manager']
+
+    def insert(self, valid, result):
+        # Employee ids are reserved (and committed) before the insert, one
+        # block per department, so the department rows aren't locked while
+        # the chunk is written.
+        records = [self.build(row) for _, row in valid]
+        with_password = [(user, row['password']) for (_, row), (user, _, _) in zip(valid, records) if row.get('password')]
+        hashes = hash_passwords((password for _, password in with_password), workers=self.hash_workers)
+        for (user, _), hashed in zip(with_password, hashes):
+            user.password = hashed
+
+        by_department = {}
+        for _, employee, _ in records:
+            by_department.setdefault(employee.department.pk, []).append(employee)
+        for employees in by_department.values():
+            for employee, employee_id in zip(employees, reserve_employee_ids(employees[0].department, len(employees))):
+                employee.employee_id = employee_id
+
+        try:
+            with transaction.atomic():
+                self.write(records)
+        except IntegrityError:
+            # e.g. an email taken since validation: retry row by row to find
+            # the culprits and keep the rest.
+            for user, _, _ in records:
+                self.users_by_email.pop(user.email, None)
+            written = []
+            for (line, _), record in zip(valid, records):
+                user, employee, _ = record
+                user.pk = employee.pk = None
+                try:
+                    with transaction.atomic():
+                        self.write([record])
+                    written.append(record)
+                except IntegrityError as e:
+                    result.add_error(line, {'row': str(e)})
+            records = written
+
+        result.created += len(records)
+        publish_user_changes([user_entry(user) for user, _, _ in records])
+
+    def write(self, records):
+        users = User.objects.bulk_create([user for user, _, _ in records])
+        self.users_by_email.update((user.email, user.pk) for user in users)
+        for user, (_, employee, manager) in zip(users, records):
+            employee.user = user
+            employee.reporting_manager_id = self.users_by_email.get(manager) if manager else None
+
+        # Managers come before their reports, so paths of those imported
+        # earlier are already known.
+        new_ids = {user.pk for user in users}
+        missing = {employee.reporting_manager_id for _, employee, _ in records} - self.org_paths.keys() - new_ids - {None}
+        if missing:
+            self.org_paths.update(user_paths(missing))
+        for user, employee, _ in records:
+            prefix = self.org_paths[employee.reporting_manager_id] if employee.reporting_manager_id else '/'
+            employee.org_path = self.org_paths[user.pk] = f'{prefix}{user.pk}/'
+
+        Employee.objects.bulk_create([employee for _, employee, _ in records])
+        invalidate_org_chart()
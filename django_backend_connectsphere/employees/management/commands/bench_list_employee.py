@@ -0,0 +1,124 @@
+import time
+import statistics
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from accounts.models import Role, User
+from employees.models import Department, Employee
+from employees.pagination import CustomPagination, EmployeeCursorPagination
+from employees.queries import employee_directory_queryset
+from employees.serializers import CustomEmployeeSerializerFor_list_employee_action
+from employees.views import EmployeeViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time GET /employees/list_employee/ (first page and a page near the "
+        "end) as the employee table grows, next to the old approach of "
+        "serialising every employee and paginating the list. Rows are "
+        "created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000',
+                            help='Comma separated employee counts to measure at.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--old-limit', type=int, default=10000,
+                            help='Skip the old approach above this many employees.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        self.factory = APIRequestFactory()
+        self.view = EmployeeViewSet.as_view(
+            {'get': 'list_employee'}, permission_classes=[IsAuthenticated], throttle_classes=[]
+        )
+
+        self.stdout.write(f"{'employees':>10} {'first ms':>9} {'deep ms':>9} {'old ms':>9}")
+        try:
+            with transaction.atomic():
+                role, _ = Role.objects.get_or_create(name='EMPLOYEE')
+                department = Department.objects.create(name='bench_list_employee')
+                self.viewer = User(email='bench_viewer@example.com', username='bench_viewer', role=role)
+                self.viewer.save()
+
+                created = 0
+                for size in sizes:
+                    self.create_employees(role, department, created, size)
+                    created = size
+                    self.measure(size, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_employees(self, role, department, start, stop, batch_size=2000):
+        for offset in range(start, stop, batch_size):
+            numbers = range(offset, min(stop, offset + batch_size))
+            users = User.objects.bulk_create([
+                User(
+                    email=f'bench{n}@example.com', username=f'bench{n}', password='!',
+                    first_name=f'First{n}', last_name=f'Last{n}', role=role,
+                )
+                for n in numbers
+            ])
+            Employee.objects.bulk_create([
+                Employee(
+                    user=user, department=department, employee_id=f'BENCH{n}',
+                    designation='Engineer', joining_date=date(2024, 1, 1),
+                    contact_number='0', emergency_contact='0', address='',
+                )
+                for n, user in zip(numbers, users)
+            ])
+
+    def request(self, query=''):
+        request = self.factory.get(f'/api/employees/list_employee/{query}')
+        force_authenticate(request, user=self.viewer)
+        response = self.view(request)
+        response.render()
+        assert response.status_code == 200, response.content
+        return response
+
+    def old_request(self):
+        # list_employee before keyset pagination: serialise everything,
+        # then slice one page out of the list.
+        request = Request(self.factory.get('/api/employees/list_employee/'))
+        paginator = CustomPagination()
+        serializer = CustomEmployeeSerializerFor_list_employee_action(
+            employee_directory_queryset(), many=True, context={'request': request}
+        )
+        paginator.get_paginated_response(paginator.paginate_queryset(serializer.data, request))
+
+    def timed(self, func, repeat):
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return statistics.median(latencies)
+
+    def measure(self, size, options):
+        repeat = options['repeat']
+        # A cursor positioned a page before the last employee.
+        paginator = EmployeeCursorPagination()
+        paginator.base_url = '/api/employees/list_employee/'
+        paginator.cursor_query_param = 'cursor'
+        last_ids = list(employee_directory_queryset().order_by('-id').values_list('id', flat=True)[:paginator.page_size + 1])
+        cursor = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(last_ids[-1])))
+        deep_query = cursor[len(paginator.base_url):]
+
+        assert len(self.request(deep_query).data['results']) == paginator.page_size
+
+        first = self.timed(lambda: self.request(), repeat)
+        deep = self.timed(lambda: self.request(deep_query), repeat)
+        if size <= options['old_limit']:
+            old = f"{self.timed(self.old_request, max(1, repeat // 5)):>9.1f}"
+        else:
+            old = f"{'skipped':>9}"
+        self.stdout.write(f"{size:>10} {first:>9.1f} {deep:>9.1f} {old}")
@@ -0,0 +1,70 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from employees.allocation import reserve_employee_numbers
+from employees.models import Department
+
+
+def hammer(department_id, threads, rounds, max_block):
+    department = Department.objects.get(pk=department_id)
+
+    def reserve(seed):
+        rng = random.Random(seed)
+        numbers = []
+        try:
+            for _ in range(rounds):
+                numbers.extend(reserve_employee_numbers(department, rng.randint(1, max_block)))
+        finally:
+            connections.close_all()
+        return numbers
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return [number for numbers in pool.map(reserve, range(threads)) for number in numbers]
+
+
+class Command(BaseCommand):
+    help = (
+        "Reserve employee numbers for one department from several processes "
+        "and threads at once, in blocks of random size, and check that no "
+        "number is handed out twice and none is skipped. Uses a temporary "
+        "department."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--rounds', type=int, default=50, help='Reservations per thread.')
+        parser.add_argument('--max-block', type=int, default=500)
+
+    def handle(self, *args, **options):
+        department = Department.objects.create(name=f'check_employee_ids_{time.time_ns()}')
+        # Forked workers must not share this process's connection.
+        connections.close_all()
+
+        try:
+            started = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=options['processes']) as pool:
+                futures = [
+                    pool.submit(hammer, department.pk, options['threads'], options['rounds'], options['max_block'])
+                    for _ in range(options['processes'])
+                ]
+                numbers = [number for future in futures for number in future.result()]
+            elapsed = time.perf_counter() - started
+
+            department.refresh_from_db()
+            reservations = options['processes'] * options['threads'] * options['rounds']
+            self.stdout.write(
+                f"{len(numbers)} numbers in {reservations} reservations in {elapsed:.2f}s, "
+                f"counter at {department.last_employee_id}"
+            )
+
+            duplicates = len(numbers) - len(set(numbers))
+            if duplicates:
+                raise CommandError(f"{duplicates} numbers were handed out more than once.")
+            if sorted(numbers) != list(range(1, department.last_employee_id + 1)):
+                raise CommandError("Reserved numbers don't match the department counter.")
+            self.stdout.write(self.style.SUCCESS("Every number was reserved exactly once."))
+        finally:
+            department.delete()
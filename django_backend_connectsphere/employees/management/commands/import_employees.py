@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from accounts.provisioning import hash_workers
+from connectsphere_backend.imports import detect_format
+from employees.importer import EmployeeImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users and their employee records from a CSV or JSON Lines "
+        "file, streamed in chunks. See employees/importer.py for the columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--approved-by', help='Email of the user recorded as approving the imported users.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only.')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Password hashing processes (default: PASSWORD_HASH_WORKERS, or one per CPU).')
+
+    def handle(self, *args, **options):
+        approved_by = None
+        if options['approved_by']:
+            try:
+                approved_by = User.objects.get(email=options['approved_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user with email {options['approved_by']}.")
+
+        importer = EmployeeImporter(
+            approved_by=approved_by, chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+            hash_workers=options['workers'] or hash_workers(options['chunk_size']),
+        )
+        with open(options['path'], 'rb') as stream:
+            result = importer.run(stream, options['format'] or detect_format(options['path']))
+
+        for error in result.errors:
+            details = '; '.join(f"{field}: {message}" for field, message in error['errors'].items())
+            self.stderr.write(f"line {error['line']}: {details}")
+        if result.failed > len(result.errors):
+            self.stderr.write(f"... and {result.failed - len(result.errors)} more rows with errors")
+
+        action = 'validated' if options['dry_run'] else 'created'
+        self.stdout.write(
+            f"{result.rows} rows in {result.elapsed:.2f}s ({result.rows_per_second} rows/s): "
+            f"{result.created if not options['dry_run'] else result.rows - result.failed} {action}, "
+            f"{result.failed} failed"
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from employees.models import Employee
+from employees.skills import normalise_skills
+
+
+class Command(BaseCommand):
+    help = (
+        "Normalise every employee's skills (trimmed, single-spaced, case "
+        "folded, no duplicates) so skill search finds them. Employee.save() "
+        "normalises from now on; run this once for existing rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        changed, updated = [], 0
+
+        for pk, skills in Employee.objects.order_by('id').values_list('id', 'skills').iterator(chunk_size=batch_size):
+            normalised = normalise_skills(skills)
+            if normalised != skills:
+                changed.append(Employee(id=pk, skills=normalised))
+            if len(changed) >= batch_size:
+                updated += self.save(changed, options['dry_run'])
+                changed = []
+        updated += self.save(changed, options['dry_run'])
+
+        self.stdout.write(f"{updated} employees' skills normalised")
+
+    def save(self, employees, dry_run):
+        if employees and not dry_run:
+            Employee.objects.bulk_update(employees, ['skills'])
+        return len(employees)
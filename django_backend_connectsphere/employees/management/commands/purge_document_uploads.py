@@ -0,0 +1,32 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from employees.models import DocumentUpload
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete chunked document uploads that were started more than "
+        "DOCUMENT_UPLOAD_EXPIRY_HOURS ago and never completed, with the "
+        "parts received for them. Run it daily (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None,
+                            help='Age in hours (default: DOCUMENT_UPLOAD_EXPIRY_HOURS).')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        hours = options['hours'] if options['hours'] is not None else settings.DOCUMENT_UPLOAD_EXPIRY_HOURS
+        expired = DocumentUpload.objects.filter(
+            completed_at__isnull=True, created_at__lt=timezone.now() - timedelta(hours=hours)
+        )
+        count = expired.count()
+        if options['dry_run']:
+            self.stdout.write(f"{count} incomplete uploads older than {hours}h")
+            return
+
+        # post_delete removes each upload's parts.
+        expired.delete()
+        self.stdout.write(self.style.SUCCESS(f"{count} incomplete uploads deleted"))
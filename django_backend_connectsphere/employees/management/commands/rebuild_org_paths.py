@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from employees.hierarchy import compute_paths, invalidate_org_chart
+from employees.models import Employee
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every employee's org_path (the materialised reporting "
+        "line) from reporting_manager. Run once after the migration adding "
+        "it; Employee.save() keeps it up to date afterwards, but bulk "
+        "updates of reporting_manager bypass save() and need a re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        rows = list(Employee.objects.values_list('id', 'user_id', 'reporting_manager_id', 'org_path'))
+        paths = compute_paths({user_id: manager_id for _, user_id, manager_id, _ in rows})
+
+        changed = [
+            Employee(id=pk, org_path=paths[user_id])
+            for pk, user_id, _, org_path in rows
+            if paths[user_id] != org_path
+        ]
+        self.stdout.write(f"{len(rows)} employees, {len(changed)} paths to update")
+        if options['dry_run'] or not changed:
+            return
+
+        with transaction.atomic():
+            Employee.objects.bulk_update(changed, ['org_path'], batch_size=options['batch_size'])
+            invalidate_org_chart()
+        self.stdout.write(self.style.SUCCESS("org_path rebuilt"))
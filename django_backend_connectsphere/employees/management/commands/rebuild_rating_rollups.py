@@ -0,0 +1,49 @@
+from datetime import datetime, time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from employees.models import Employee, PerformanceReview, RatingRollup
+from employees.ratings import rollups_from_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-department, per-quarter rating rollups from the "
+        "review history. With --backfill-current, first record the current "
+        "rating of every rated employee without any review as a review on "
+        "their last_review_date, so ratings given before the history "
+        "existed are counted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill-current', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['backfill_current']:
+                self.backfill(options['batch_size'])
+
+            rollups = rollups_from_history()
+            RatingRollup.objects.all().delete()
+            RatingRollup.objects.bulk_create(rollups, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"{len(rollups)} rollups rebuilt"))
+
+    def backfill(self, batch_size):
+        employees = Employee.objects.filter(
+            performance_rating__isnull=False, performance_reviews__isnull=True
+        ).values_list('id', 'department_id', 'performance_rating', 'last_review_date')
+
+        now = timezone.now()
+        reviews = [
+            PerformanceReview(
+                employee_id=pk,
+                department_id=department_id,
+                rating=rating,
+                reviewed_at=timezone.make_aware(datetime.combine(reviewed, time())) if reviewed else now,
+            )
+            for pk, department_id, rating, reviewed in employees.iterator(chunk_size=batch_size)
+        ]
+        PerformanceReview.objects.bulk_create(reviews, batch_size=batch_size)
+        self.stdout.write(f"{len(reviews)} current ratings recorded as reviews")
@@ -1,5 +1,11 @@
-from django.db import models
+import uuid
+from django.db import models, router, transaction
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.core.exceptions import ValidationError
+from .allocation import reserve_employee_ids
+from .hierarchy import invalidate_org_chart, move_subtree, path_for
+from .skills import normalise_skills
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -8,6 +14,16 @@ class Department(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        # last_employee_id only moves through reserve_employee_numbers(); an
+        # edit saved from a stale copy (e.g. the admin) must not wind it back.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'last_employee_id'
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -29,6 +45,18 @@ class Employee(models.Model):
     skills = models.JSONField(default=list)
     performance_rating = models.FloatField(null=True, blank=True)
     last_review_date = models.DateField(null=True, blank=True)
+    # User ids from the top of the reporting line down to this employee's,
+    # kept up to date by save(); see employees/hierarchy.py.
+    org_path = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # Prefix (LIKE 'x%') lookups need the pattern opclass unless the
+            # database collation is C.
+            models.Index(fields=['org_path'], name='employee_org_path_idx', opclasses=['varchar_pattern_ops']),
+            # Skill search (employees/skills.py): @> and ?| on the array.
+            GinIndex(fields=['skills'], name='employee_skills_gin'),
+        ]
 
     @property
     def full_name(self):
@@ -48,14 +76,45 @@ class Employee(models.Model):
             return f"{self.user.role.name}"
         return "Unknown"
 
+    def clean(self):
+        super().clean()
+        if self.user_id and self.reporting_manager_id:
+            try:
+                path_for(self.user_id, self.reporting_manager_id)
+            except ValidationError as e:
+                raise ValidationError({'reporting_manager': e.messages})
+
     def save(self, *args, **kwargs):
         if not self.employee_id: 
-            dept_code = self.department.name.ljust(3)[:3].upper()
-            self.department.last_employee_id += 1
-            self.department.save()
-            self.employee_id = f"{dept_code}{self.department.last_employee_id:04d}"
+            self.employee_id = reserve_employee_ids(self.department)[0]
 
-        super().save(*args, **kwargs)
+        if 'skills' not in self.get_deferred_fields():
+            self.skills = normalise_skills(self.skills)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'reporting_manager', 'reporting_manager_id'} & set(update_fields):
+            super().save(*args, **kwargs)
+            invalidate_org_chart()
+            return
+
+        using = kwargs.get('using') or router.db_for_write(Employee, instance=self)
+        old_path, old_manager_id = '', None
+        if not self._state.adding:
+            old_path, old_manager_id = Employee.objects.using(using).filter(pk=self.pk).values_list(
+                'org_path', 'reporting_manager_id'
+            ).first() or ('', None)
+        if old_path and old_manager_id == self.reporting_manager_id:
+            self.org_path = old_path
+        else:
+            self.org_path = path_for(self.user_id, self.reporting_manager_id, using)
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'org_path'}
+
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if old_path and old_path != self.org_path:
+                move_subtree(old_path, self.org_path, using)
+        invalidate_org_chart()
 
     def __str__(self):
         return f"{self.employee_id} - {self.user.get_full_name()}"
@@ -77,3 +136,92 @@ class EmployeeDocument(models.Model):
 
     def __str__(self):
         return f"{self.employee.employee_id} - {self.document_type}"
+
+class DocumentUpload(models.Model):
+    # An EmployeeDocument being uploaded in parts: each part is written to
+    # DOCUMENT_UPLOAD_DIR as it arrives, and the file is assembled when the
+    # upload is completed. See employees/uploads.py.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='document_uploads')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    document_type = models.CharField(max_length=20, choices=EmployeeDocument.DOCUMENT_TYPES)
+    description = models.TextField(blank=True)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    part_size = models.PositiveIntegerField()
+    # Of the whole file, checked on completion when the client gave one.
+    sha256 = models.CharField(max_length=64, blank=True)
+    document = models.OneToOneField(EmployeeDocument, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def part_count(self):
+        return max(1, -(-self.size // self.part_size))
+
+    def __str__(self):
+        return f"{self.filename} for {self.employee_id} ({self.size} bytes)"
+
+class DocumentUploadPart(models.Model):
+    upload = models.ForeignKey(DocumentUpload, on_delete=models.CASCADE, related_name='parts')
+    number = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'number'], name='document_upload_part_number'),
+        ]
+
+class PerformanceReview(models.Model):
+    # Append-only: one row per rating given through update_performance, so
+    # earlier ratings survive the next one. See employees/ratings.py.
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='performance_reviews')
+    # The employee's department when reviewed, which the rollups count under.
+    department = models.ForeignKey(Department, on_delete=models.PROTECT)
+    rating = models.FloatField()
+    previous_rating = models.FloatField(null=True, blank=True)
+    reviewed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    reviewed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', '-reviewed_at'], name='review_employee_time_idx'),
+            models.Index(fields=['department', 'reviewed_at'], name='review_department_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Performance reviews are append-only.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.employee.employee_id} - {self.rating} ({self.reviewed_at:%Y-%m-%d})"
+
+class RatingRollup(models.Model):
+    # Reviews given in one department in one quarter, summed as they are
+    # written, so analytics read a handful of rows however many reviews
+    # there are. Bucket counts follow stats.RATING_BUCKETS.
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    quarter = models.DateField()
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.FloatField(default=0)
+    rating_min = models.FloatField(null=True)
+    rating_max = models.FloatField(null=True)
+    count_0_1 = models.PositiveIntegerField(default=0)
+    count_1_2 = models.PositiveIntegerField(default=0)
+    count_2_3 = models.PositiveIntegerField(default=0)
+    count_3_4 = models.PositiveIntegerField(default=0)
+    count_4_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'quarter'], name='rating_rollup_department_quarter'),
+        ]
+        indexes = [
+            models.Index(fields=['quarter'], name='rating_rollup_quarter_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.department.name} {self.quarter:%Y-%m}: {self.review_count} reviews"
@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.response import Response
 from urllib.parse import urlparse
 
@@ -26,3 +26,34 @@ class CustomPagination(PageNumberPagination):
             'previous': previous_page,  
             'results': data
         })
+
+
+class EmployeeCursorPagination(CursorPagination):
+    # Keyset pagination on id: each page is WHERE id > <last id> LIMIT n,
+    # so deep pages cost the same as the first and no COUNT(*) is needed.
+    page_size = 10
+    page_size_query_param = 'size'
+    max_page_size = 30
+    ordering = 'id'
+
+    def get_ordering(self, request, queryset, view):
+        # Search results page by rank, best match first. The cursor only
+        # keeps the first ordering field, so it has to be unique on its own.
+        if 'search_order' in queryset.query.annotations:
+            return ('-search_order',)
+        return (self.ordering,)
+
+    def _make_relative_url(self, link):
+        if not link:
+            return None
+        parsed = urlparse(link)
+        relative_url = parsed.path
+        if parsed.query:
+            relative_url += f'?{parsed.query}'
+        return relative_url
+
+    def get_next_link(self):
+        return self._make_relative_url(super().get_next_link())
+
+    def get_previous_link(self):
+        return self._make_relative_url(super().get_previous_link())
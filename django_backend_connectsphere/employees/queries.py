@@ -0,0 +1,48 @@
+from connectsphere_backend.search import ranked_search
+from .models import Employee
+
+# Columns of the employee export, as (column, values_list lookup).
+EMPLOYEE_EXPORT_FIELDS = [
+    ('employee_id', 'employee_id'),
+    ('user_id', 'user_id'),
+    ('email', 'user__email'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('role', 'user__role__name'),
+    ('is_active', 'user__is_active'),
+    ('department', 'department__name'),
+    ('designation', 'designation'),
+    ('joining_date', 'joining_date'),
+    ('reporting_manager_id', 'reporting_manager_id'),
+    ('reporting_manager_email', 'reporting_manager__email'),
+    ('reporting_manager_first_name', 'reporting_manager__first_name'),
+    ('reporting_manager_last_name', 'reporting_manager__last_name'),
+    ('contact_number', 'contact_number'),
+    ('emergency_contact', 'emergency_contact'),
+    ('address', 'address'),
+    ('skills', 'skills'),
+    ('performance_rating', 'performance_rating'),
+    ('last_review_date', 'last_review_date'),
+]
+
+
+def employee_directory_queryset(department_name=None, search_query=None):
+    employees = Employee.objects.select_related('user__role', 'department').only(
+        'id', 'user__id', 'user__first_name', 'user__last_name', 'user__role__name',
+        'user__is_active', 'user__profile_picture', 'designation', 'department__name'
+    )
+
+    if department_name:
+        employees = employees.filter(department__name__iexact=department_name)
+    if search_query:
+        employees = ranked_search(employees, search_query, ['user__first_name', 'user__last_name'])
+        return employees.order_by('-search_order')
+
+    return employees.order_by('id')
+
+
+def employee_export_queryset(department_name=None):
+    employees = Employee.objects.order_by('id')
+    if department_name:
+        employees = employees.filter(department__name__iexact=department_name)
+    return employees
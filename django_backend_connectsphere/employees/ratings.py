@@ -0,0 +1,160 @@
+from datetime import date
+from django.db import transaction
+from django.db.models import Count, DateField, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, TruncQuarter
+from django.utils import timezone
+from .models import Employee, PerformanceReview, RatingRollup
+from .stats import RATING_BUCKETS
+
+# Performance rating history. update_performance appends a PerformanceReview
+# and adds it to its department's RatingRollup for the quarter in the same
+# transaction; analytics only ever read the rollups.
+
+
+def quarter_start(day):
+    return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+
+
+def quarter_starts(quarters, today=None):
+    quarter = quarter_start(today or timezone.localdate())
+    starts = []
+    for _ in range(quarters):
+        starts.append(quarter)
+        quarter = date(quarter.year - 1, 10, 1) if quarter.month == 1 else date(quarter.year, quarter.month - 3, 1)
+    return starts[::-1]
+
+
+def quarter_label(quarter):
+    return f'{quarter.year}-Q{(quarter.month - 1) // 3 + 1}'
+
+
+def bucket_field(name):
+    return 'count_' + name.replace('-', '_')
+
+
+def bucket_for(rating):
+    for name, _, high in RATING_BUCKETS:
+        if rating < high:
+            return bucket_field(name)
+    # 5.0 belongs to the top bucket.
+    return bucket_field(RATING_BUCKETS[-1][0])
+
+
+def add_to_rollup(department_id, day, rating):
+    quarter = quarter_start(day)
+    RatingRollup.objects.bulk_create(
+        [RatingRollup(department_id=department_id, quarter=quarter)], ignore_conflicts=True
+    )
+    bucket = bucket_for(rating)
+    RatingRollup.objects.filter(department_id=department_id, quarter=quarter).update(
+        review_count=F('review_count') + 1,
+        rating_sum=F('rating_sum') + rating,
+        # LEAST/GREATEST skip NULLs on PostgreSQL but not on SQLite.
+        rating_min=Least(Coalesce('rating_min', Value(rating)), Value(rating)),
+        rating_max=Greatest(Coalesce('rating_max', Value(rating)), Value(rating)),
+        **{bucket: F(bucket) + 1},
+    )
+
+
+def record_review(employee, rating, reviewed_by=None):
+    now = timezone.now()
+    with transaction.atomic():
+        # Locked, so concurrent reviews of one employee each see the other's
+        # rating as the previous one.
+        previous = Employee.objects.select_for_update().filter(pk=employee.pk).values_list(
+            'performance_rating', flat=True
+        ).first()
+        review = PerformanceReview.objects.create(
+            employee=employee,
+            department_id=employee.department_id,
+            rating=rating,
+            previous_rating=previous,
+            reviewed_by=reviewed_by,
+            reviewed_at=now,
+        )
+        employee.performance_rating = rating
+        employee.last_review_date = timezone.localdate(now)
+        employee.save(update_fields=['performance_rating', 'last_review_date'])
+        add_to_rollup(employee.department_id, employee.last_review_date, rating)
+    return review
+
+
+def rollups_from_history():
+    """RatingRollup rows recomputed from every review, in one grouped query."""
+    buckets = {}
+    for name, low, high in RATING_BUCKETS:
+        upper = 'lte' if high == RATING_BUCKETS[-1][2] else 'lt'
+        buckets[bucket_field(name)] = Count('id', filter=Q(rating__gte=low, **{f'rating__{upper}': high}))
+
+    rows = PerformanceReview.objects.annotate(
+        quarter=TruncQuarter('reviewed_at', output_field=DateField())
+    ).values('department_id', 'quarter').annotate(
+        review_count=Count('id'),
+        rating_sum=Sum('rating'),
+        rating_min=Min('rating'),
+        rating_max=Max('rating'),
+        **buckets,
+    ).order_by()
+    return [RatingRollup(**row) for row in rows]
+
+
+def _summary(quarter, rows):
+    reviews = sum(row['review_count'] for row in rows)
+    mins = [row['rating_min'] for row in rows if row['rating_min'] is not None]
+    maxes = [row['rating_max'] for row in rows if row['rating_max'] is not None]
+    return {
+        'quarter': quarter_label(quarter),
+        'reviews': reviews,
+        'average': round(sum(row['rating_sum'] for row in rows) / reviews, 2) if reviews else None,
+        'min': min(mins) if mins else None,
+        'max': max(maxes) if maxes else None,
+        'distribution': {
+            name: sum(row[bucket_field(name)] for row in rows) for name, _, _ in RATING_BUCKETS
+        },
+    }
+
+
+def _trend(quarters, rows_by_quarter):
+    trend, previous = [], None
+    for quarter in quarters:
+        summary = _summary(quarter, rows_by_quarter.get(quarter, []))
+        summary['change'] = (
+            round(summary['average'] - previous, 2)
+            if summary['average'] is not None and previous is not None else None
+        )
+        previous = summary['average'] if summary['average'] is not None else previous
+        trend.append(summary)
+    return trend
+
+
+def rating_analytics(quarters=8, department_id=None):
+    """
+    Average, range and rating distribution of the reviews given in each of
+    the last `quarters` quarters, company-wide and per department, with the
+    change in average since the previous quarter that had reviews. Reads
+    departments x quarters rollup rows, not the reviews.
+    """
+    starts = quarter_starts(quarters)
+    rollups = RatingRollup.objects.filter(quarter__gte=starts[0])
+    if department_id:
+        rollups = rollups.filter(department_id=department_id)
+
+    company, departments = {}, {}
+    for row in rollups.values(
+        'department_id', 'department__name', 'quarter', 'review_count', 'rating_sum', 'rating_min',
+        'rating_max', *[bucket_field(name) for name, _, _ in RATING_BUCKETS]
+    ).order_by('department__name', 'quarter'):
+        company.setdefault(row['quarter'], []).append(row)
+        department = departments.setdefault(
+            row['department_id'], {'id': row['department_id'], 'name': row['department__name'], 'quarters': {}}
+        )
+        department['quarters'].setdefault(row['quarter'], []).append(row)
+
+    return {
+        'quarters': [quarter_label(quarter) for quarter in starts],
+        'company': _trend(starts, company),
+        'departments': [
+            {'id': department['id'], 'name': department['name'], 'trend': _trend(starts, department['quarters'])}
+            for department in departments.values()
+        ],
+    }
@@ -1,7 +1,12 @@
 from rest_framework import serializers
-from .models import Department, Employee, EmployeeDocument
+import os
+import re
+from django.conf import settings
+from .models import Department, DocumentUpload, DocumentUploadPart, Employee, EmployeeDocument, PerformanceReview
 from accounts.models import User
 from django.db.models import F
+from .allocation import reserve_employee_ids
+from .uploads import MAX_PART_SIZE, MIN_PART_SIZE, missing_parts
 
 class UserSerializer(serializers.ModelSerializer):
     role = serializers.CharField(source='role.name')
@@ -10,19 +15,13 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'first_name','last_name','role','profile_picture','is_approved','is_deleted','is_active']
 
 class DepartmentSerializer(serializers.ModelSerializer):
-    employee_count = serializers.SerializerMethodField()
-    designations = serializers.SerializerMethodField()
+    # Annotated by DepartmentViewSet.get_queryset().
+    employee_count = serializers.IntegerField(read_only=True)
+    designations = serializers.ListField(child=serializers.CharField(), read_only=True)
     class Meta:
         model = Department
         fields = ['id','name','description','employee_count', 'designations']
 
-    def get_employee_count(self, obj):
-        return Employee.objects.filter(department=obj).count()
-
-    def get_designations(self, obj):
-        designations = Employee.objects.filter(department=obj).values_list('designation', flat=True).distinct()
-        return list(designations)
-
 class DepartmentSerializerForEmployeeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Department
@@ -87,16 +86,69 @@ class EmployeeSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         department = validated_data.get('department')
+        validated_data['employee_id'] = reserve_employee_ids(department)[0]
+        return super().create(validated_data)
+
+
+class PerformanceReviewSerializer(serializers.ModelSerializer):
+    department = serializers.CharField(source='department.name', read_only=True)
+    reviewed_by_name = serializers.SerializerMethodField()
 
-        with transaction.atomic():
-            department.refresh_from_db()
-            department.last_employee_id = F('last_employee_id') + 1
-            department.save(update_fields=['last_employee_id'])  
+    class Meta:
+        model = PerformanceReview
+        fields = ['id', 'rating', 'previous_rating', 'department', 'reviewed_by', 'reviewed_by_name', 'reviewed_at']
+
+    def get_reviewed_by_name(self, obj):
+        reviewer = obj.reviewed_by
+        return f"{reviewer.first_name} {reviewer.last_name}" if reviewer else None
 
-            dept_code = department.name.ljust(3)[:3].upper()
-            validated_data['employee_id'] = f"{dept_code}{department.last_employee_id:04d}"
 
-            return super().create(validated_data)
+class DocumentUploadPartSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DocumentUploadPart
+        fields = ['number', 'size', 'sha256', 'received_at']
+
+
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    part_size = serializers.IntegerField(required=False, min_value=MIN_PART_SIZE, max_value=MAX_PART_SIZE)
+    part_count = serializers.IntegerField(read_only=True)
+    parts = DocumentUploadPartSerializer(many=True, read_only=True)
+    missing_parts = serializers.SerializerMethodField()
+    document = EmployeeDocumentSerializer(read_only=True)
+
+    class Meta:
+        model = DocumentUpload
+        fields = [
+            'id', 'employee', 'document_type', 'description', 'filename', 'size', 'part_size', 'sha256',
+            'part_count', 'parts', 'missing_parts', 'document', 'created_at', 'completed_at',
+        ]
+        read_only_fields = ('employee', 'document', 'created_at', 'completed_at')
+
+    def get_missing_parts(self, obj):
+        return [] if obj.completed_at else missing_parts(obj)
+
+    def validate_filename(self, value):
+        # Only the name; the storage decides the directory.
+        name = os.path.basename(value.replace('\\', '/')).strip()
+        if not name or name in ('.', '..'):
+            raise serializers.ValidationError("A file name is required.")
+        return name
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.DOCUMENT_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(
+                f"Size must be between 1 and {settings.DOCUMENT_UPLOAD_MAX_BYTES} bytes."
+            )
+        return value
+
+    def validate_sha256(self, value):
+        if value and not re.fullmatch(r'[0-9a-fA-F]{64}', value):
+            raise serializers.ValidationError("sha256 must be 64 hex digits.")
+        return value.lower()
+
+    def create(self, validated_data):
+        validated_data.setdefault('part_size', settings.DOCUMENT_UPLOAD_PART_SIZE)
+        return super().create(validated_data)
 
 
 class CustomEmployeeSerializerFor_list_employee_action(serializers.ModelSerializer):
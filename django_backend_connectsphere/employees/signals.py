@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from .hierarchy import invalidate_org_chart, move_subtree, user_paths
+from .models import DocumentUpload, Employee
+from .uploads import discard_parts
+
+
+@receiver(post_delete, sender=Employee)
+def reroot_reports_of_deleted_employee(sender, instance, using, **kwargs):
+    # The user stays their reports' manager, but without an Employee row
+    # they are the top of their own line.
+    if instance.org_path:
+        move_subtree(instance.org_path, f'/{instance.user_id}/', using)
+    invalidate_org_chart()
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def reroot_reports_of_deleted_user(sender, instance, using, **kwargs):
+    # Their reports' reporting_manager is set to NULL by the delete, which
+    # makes each of them the top of a line.
+    move_subtree(user_paths([instance.pk])[instance.pk], '/', using)
+
+
+@receiver(post_delete, sender=DocumentUpload)
+def discard_parts_of_deleted_upload(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: discard_parts(instance), using=using)
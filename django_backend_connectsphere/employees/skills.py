@@ -0,0 +1,97 @@
+import json
+from django.apps import apps
+from django.db import connections, router
+from django.db.models import Q
+
+# Employee.skills is a JSON array of skill names, stored normalised (see
+# normalise_skills) so a search for 'Django' finds ' django' as entered. On PostgreSQL
+# the column has a GIN index (jsonb_ops), which serves both @> (all of)
+# and ?| (any of).
+
+MAX_SEARCH_SKILLS = 20
+
+
+def normalise_skill(skill):
+    # Case-insensitive, single-spaced: ' Machine  Learning' -> 'machine learning'.
+    return ' '.join(str(skill).split()).casefold()
+
+
+def normalise_skills(skills):
+    if not isinstance(skills, (list, tuple)):
+        return skills
+    normalised = []
+    for skill in skills:
+        skill = normalise_skill(skill)
+        if skill and skill not in normalised:
+            normalised.append(skill)
+    return normalised
+
+
+def parse_skills(values):
+    # ?skills=python,django or ?skills=python&skills=django
+    return normalise_skills([skill for value in values for skill in value.split(',')])
+
+
+def filter_by_skills(queryset, skills, match_all=False):
+    if connections[queryset.db].vendor == 'postgresql':
+        if match_all:
+            return queryset.filter(skills__contains=skills)
+        return queryset.filter(skills__has_any_keys=skills)
+
+    # Elsewhere (SQLite locally): match the quoted names in the JSON text.
+    matches = [Q(skills__icontains=json.dumps(skill)) for skill in skills]
+    combined = matches[0]
+    for match in matches[1:]:
+        combined = (combined & match) if match_all else (combined | match)
+    return queryset.filter(combined)
+
+
+def _skills_from(connection, table):
+    # FROM clause with one row per (employee e, skill s.value).
+    if connection.vendor == 'postgresql':
+        return (
+            f"{table} e CROSS JOIN LATERAL jsonb_array_elements_text("
+            f"CASE WHEN jsonb_typeof(e.skills) = 'array' THEN e.skills ELSE '[]' END) AS s(value)"
+        )
+    return f"{table} e, json_each(e.skills) AS s"
+
+
+def skill_facets(department_id=None, limit=20, using=None):
+    """
+    The most common skills company-wide and in each department, with how
+    many employees have them: two grouped queries, however many employees.
+    """
+    Employee = apps.get_model('employees', 'Employee')
+    Department = apps.get_model('employees', 'Department')
+    connection = connections[using or router.db_for_read(Employee)]
+    skills_from = _skills_from(connection, Employee._meta.db_table)
+    where, params = ('WHERE e.department_id = %s', [department_id]) if department_id else ('', [])
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT s.value, COUNT(*) FROM {skills_from} {where}
+            GROUP BY s.value ORDER BY COUNT(*) DESC, s.value LIMIT %s
+        """, [*params, limit])
+        company = [{'skill': skill, 'count': count} for skill, count in cursor.fetchall()]
+
+        cursor.execute(f"""
+            WITH counts AS (
+                SELECT e.department_id, s.value AS skill, COUNT(*) AS employees
+                FROM {skills_from} {where}
+                GROUP BY e.department_id, s.value
+            ), ranked AS (
+                SELECT department_id, skill, employees,
+                       ROW_NUMBER() OVER (PARTITION BY department_id ORDER BY employees DESC, skill) AS position
+                FROM counts
+            )
+            SELECT d.id, d.name, r.skill, r.employees
+            FROM ranked r JOIN {Department._meta.db_table} d ON d.id = r.department_id
+            WHERE r.position <= %s
+            ORDER BY d.name, r.position
+        """, [*params, limit])
+        departments = {}
+        for department_id, name, skill, count in cursor.fetchall():
+            department = departments.setdefault(department_id, {'id': department_id, 'name': name, 'skills': []})
+            department['skills'].append({'skill': skill, 'count': count})
+
+    return {'company': company, 'departments': list(departments.values())}
@@ -0,0 +1,95 @@
+from datetime import date
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import Department, Employee
+
+# Performance ratings run from 0.0 to 5.0; 5.0 goes in the top bucket.
+RATING_BUCKETS = [('0-1', 0, 1), ('1-2', 1, 2), ('2-3', 2, 3), ('3-4', 3, 4), ('4-5', 4, 5)]
+
+
+def rating_bucket_filter(low, high):
+    upper = 'lte' if high == 5 else 'lt'
+    return Q(**{'employee__performance_rating__gte': low, f'employee__performance_rating__{upper}': high})
+
+
+def month_starts(months, today=None):
+    today = today or timezone.localdate()
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return starts[::-1]
+
+
+def department_stats(months=12):
+    """
+    Headcount, average rating, designation histogram, rating distribution
+    and monthly headcount trend for every department and the whole company,
+    in three queries however many departments there are.
+
+    The trend counts current employees by joining date. Employees who have
+    left are no longer in the table, so earlier months can read low.
+    """
+    months = month_starts(months)
+
+    # Totals and rating buckets per department.
+    departments = Department.objects.annotate(
+        employee_count=Count('employee'),
+        rated_count=Count('employee__performance_rating'),
+        average_rating=Avg('employee__performance_rating'),
+        joined_before=Count('employee', filter=Q(employee__joining_date__lt=months[0])),
+        **{
+            f'rating_{name}': Count('employee', filter=rating_bucket_filter(low, high))
+            for name, low, high in RATING_BUCKETS
+        },
+    ).order_by('id').values()
+
+    designations = {}
+    for row in Employee.objects.values('department_id', 'designation').annotate(count=Count('id')).order_by('-count', 'designation'):
+        designations.setdefault(row['department_id'], {})[row['designation']] = row['count']
+
+    joined = {}
+    for row in (
+        Employee.objects.filter(joining_date__gte=months[0])
+        .annotate(month=TruncMonth('joining_date'))
+        .values('department_id', 'month')
+        .annotate(count=Count('id'))
+    ):
+        joined[(row['department_id'], row['month'])] = row['count']
+
+    def summary(rows, designation_counts):
+        employee_count = sum(row['employee_count'] for row in rows)
+        rated_count = sum(row['rated_count'] for row in rows)
+        rating_total = sum(row['average_rating'] * row['rated_count'] for row in rows if row['rated_count'])
+
+        distribution = {name: sum(row[f'rating_{name}'] for row in rows) for name, _, _ in RATING_BUCKETS}
+        distribution['unrated'] = employee_count - rated_count
+
+        headcount, trend = sum(row['joined_before'] for row in rows), []
+        for month in months:
+            headcount += sum(joined.get((row['id'], month), 0) for row in rows)
+            trend.append({'month': month.strftime('%Y-%m'), 'headcount': headcount})
+
+        return {
+            'employee_count': employee_count,
+            'average_rating': round(rating_total / rated_count, 2) if rated_count else None,
+            'designations': designation_counts,
+            'rating_distribution': distribution,
+            'headcount_trend': trend,
+        }
+
+    departments = list(departments)
+    company_designations = {}
+    for counts in designations.values():
+        for designation, count in counts.items():
+            company_designations[designation] = company_designations.get(designation, 0) + count
+
+    return {
+        'company': summary(departments, dict(sorted(company_designations.items(), key=lambda item: (-item[1], item[0])))),
+        'departments': [
+            {'id': row['id'], 'name': row['name'], **summary([row], designations.get(row['id'], {}))}
+            for row in departments
+        ],
+    }
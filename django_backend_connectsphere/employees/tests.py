@@ -1,3 +1,503 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import msgpack
+import orjson
+from urllib.parse import parse_qs, urlparse
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_api_key.models import APIKey
+from accounts.models import Role, User
+from connectsphere_backend.throttling import RedisScopedRateThrottle, RedisUserRateThrottle
+from .hierarchy import compute_paths, move_subtree, path_for
+from .importer import EmployeeImporter
+from .skills import filter_by_skills, normalise_skills, parse_skills, skill_facets
+from .models import Department, DocumentUpload, Employee, EmployeeDocument, RatingRollup
+from .pagination import EmployeeCursorPagination
+from .queries import employee_directory_queryset
+from .ratings import record_review, rollups_from_history
+from .uploads import MIN_PART_SIZE, complete_upload
 
-# Create your tests here.
+
+def make_users(count, prefix='user'):
+    role, _ = Role.objects.get_or_create(name='EMPLOYEE')
+    return [
+        User.objects.create_user(
+            username=f'{prefix}{i}@example.com', email=f'{prefix}{i}@example.com', password=None, role=role,
+            first_name=prefix.title(), last_name=str(i),
+        )
+        for i in range(count)
+    ]
+
+
+def make_employee(user, department, **fields):
+    return Employee.objects.create(
+        user=user, department=department, designation='Engineer', joining_date=datetime.date(2024, 1, 1),
+        contact_number='0123456789', emergency_contact='0123456789', address='1 Main St', **fields
+    )
+
+
+class EmployeeIdAllocationTests(TransactionTestCase):
+    # Real threads and connections, so not inside TestCase's transaction.
+
+    def test_concurrent_hires_get_distinct_consecutive_ids(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Shared-cache in-memory SQLite fails concurrent writers at once
+            # with "table is locked" instead of waiting for the lock.
+            self.skipTest('Concurrent writes need a database file or server.')
+        department = Department.objects.create(name='Engineering')
+        users = make_users(24)
+
+        def hire(user):
+            try:
+                return make_employee(user, Department.objects.get(pk=department.pk)).employee_id
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ids = list(pool.map(hire, users))
+
+        self.assertEqual(len(set(ids)), len(users))
+        self.assertEqual(sorted(ids), [f'ENG{number:04d}' for number in range(1, len(users) + 1)])
+        department.refresh_from_db()
+        self.assertEqual(department.last_employee_id, len(users))
+
+    def test_saving_a_stale_department_keeps_the_counter(self):
+        department = Department.objects.create(name='Sales')
+        stale = Department.objects.get(pk=department.pk)
+        for user in make_users(3, prefix='sales'):
+            make_employee(user, department)
+
+        stale.description = 'Edited from an old copy'
+        stale.save()
+
+        department.refresh_from_db()
+        self.assertEqual(department.last_employee_id, 3)
+        self.assertEqual(department.description, 'Edited from an old copy')
+
+
+class DirectorySearchPaginationTests(TestCase):
+    def test_pages_through_tied_ranks_without_gaps_or_repeats(self):
+        department = Department.objects.create(name='Support')
+        for user in make_users(25, prefix='tied'):
+            make_employee(user, department)
+        # Every row matches 'tied' as a substring, so every rank ties.
+        queryset = employee_directory_queryset(search_query='tied')
+
+        seen, cursor = [], None
+        while True:
+            params = {'search': 'tied', **({'cursor': cursor} if cursor else {})}
+            request = Request(APIRequestFactory().get('/api/employees/list_employee/', params))
+            paginator = EmployeeCursorPagination()
+            seen.extend(employee.id for employee in paginator.paginate_queryset(queryset, request))
+            next_link = paginator.get_next_link()
+            if not next_link:
+                break
+            cursor = parse_qs(urlparse(next_link).query)['cursor'][0]
+
+        self.assertEqual(seen, sorted(Employee.objects.values_list('id', flat=True)))
+
+
+class RatingRollupTests(TestCase):
+    ROLLUP_FIELDS = [
+        'department_id', 'quarter', 'review_count', 'rating_sum', 'rating_min', 'rating_max',
+        'count_0_1', 'count_1_2', 'count_2_3', 'count_3_4', 'count_4_5',
+    ]
+
+    def review(self, employee, rating, day):
+        reviewed_at = datetime.datetime.combine(day, datetime.time(12), tzinfo=datetime.timezone.utc)
+        with mock.patch.object(timezone, 'now', return_value=reviewed_at):
+            record_review(employee, rating)
+
+    def rows(self, rollups):
+        return sorted(
+            tuple(round(value, 6) if isinstance(value, float) else value for value in
+                  (getattr(rollup, field) for field in self.ROLLUP_FIELDS))
+            for rollup in rollups
+        )
+
+    def test_rollups_match_the_review_history(self):
+        engineering, sales = Department.objects.create(name='Engineering'), Department.objects.create(name='Sales')
+        ann, bo = [make_employee(user, engineering) for user in make_users(2, prefix='eng')]
+        cy = make_employee(make_users(1, prefix='sales')[0], sales)
+
+        # Every bucket, both edges of one, 5.0, across a year boundary.
+        self.review(ann, 0.5, datetime.date(2024, 11, 3))
+        self.review(ann, 1.0, datetime.date(2024, 12, 31))
+        self.review(bo, 5.0, datetime.date(2024, 10, 1))
+        self.review(bo, 2.99, datetime.date(2025, 1, 1))
+        self.review(ann, 3.0, datetime.date(2025, 3, 31))
+        self.review(bo, 4.0, datetime.date(2025, 4, 1))
+        self.review(cy, 5.0, datetime.date(2025, 2, 14))
+        self.review(cy, 4.99, datetime.date(2025, 2, 15))
+
+        stored = RatingRollup.objects.all()
+        self.assertEqual(self.rows(stored), self.rows(rollups_from_history()))
+        self.assertEqual(stored.count(), 4)
+
+        top = RatingRollup.objects.get(department=sales, quarter=datetime.date(2025, 1, 1))
+        self.assertEqual((top.review_count, top.count_4_5, top.rating_min, top.rating_max), (2, 2, 4.99, 5.0))
+        first = RatingRollup.objects.get(department=engineering, quarter=datetime.date(2024, 10, 1))
+        self.assertEqual(
+            [first.count_0_1, first.count_1_2, first.count_2_3, first.count_3_4, first.count_4_5], [1, 1, 0, 0, 1]
+        )
+        self.assertEqual((first.rating_min, first.rating_max), (0.5, 5.0))
+
+
+@mock.patch.object(RedisUserRateThrottle, 'THROTTLE_RATES', {'user': None})
+@mock.patch.object(RedisScopedRateThrottle, 'THROTTLE_RATES', {'document_upload': None})
+class ChunkedDocumentUploadTests(TestCase):
+    def setUp(self):
+        media, parts = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.addCleanup(shutil.rmtree, parts)
+        settings = override_settings(MEDIA_ROOT=media, DOCUMENT_UPLOAD_DIR=parts)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media = media
+
+        ceo = User.objects.create_user(
+            username='ceo@example.com', email='ceo@example.com', password=None, role=Role.objects.create(name='CEO')
+        )
+        self.employee = make_employee(make_users(1)[0], Department.objects.create(name='Legal'))
+        _, key = APIKey.objects.create_key(name='upload-tests')
+        self.client = APIClient(headers={'X-Api-Key': key})
+        self.client.force_authenticate(ceo)
+
+        # Two whole parts and a short last one.
+        self.content = os.urandom(2 * MIN_PART_SIZE + 100)
+        self.parts = [self.content[start:start + MIN_PART_SIZE] for start in range(0, len(self.content), MIN_PART_SIZE)]
+
+    def start(self, **fields):
+        response = self.client.post(f'/api/employees/{self.employee.pk}/uploads/', {
+            'filename': 'contract.pdf', 'size': len(self.content), 'part_size': MIN_PART_SIZE,
+            'document_type': 'OTHER', **fields,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['part_count'], 3)
+        return response.data['id']
+
+    def put(self, upload_id, number, data, sha256=None):
+        return self.client.put(
+            f'/api/document-uploads/{upload_id}/parts/{number}/', data,
+            content_type='application/octet-stream', headers={'X-Part-SHA256': sha256} if sha256 else {},
+        )
+
+    def complete(self, upload_id):
+        return self.client.post(f'/api/document-uploads/{upload_id}/complete/')
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media) for name in names]
+
+    def test_parts_of_the_wrong_size_are_refused(self):
+        upload_id = self.start()
+        response = self.put(upload_id, 1, self.parts[0][:-1])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': f'Part 1 must be {MIN_PART_SIZE} bytes.'})
+        self.assertEqual(self.put(upload_id, 3, self.parts[2] + b'x').status_code, 400)
+        self.assertEqual(self.put(upload_id, 4, b'x').status_code, 400)
+        self.assertFalse(DocumentUpload.objects.get(pk=upload_id).parts.exists())
+
+    def test_checksum_mismatches_are_refused(self):
+        upload_id = self.start(sha256=hashlib.sha256(b'something else').hexdigest())
+        response = self.put(upload_id, 1, self.parts[0], sha256=hashlib.sha256(b'x').hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Part 1 does not match its SHA-256 checksum.'})
+
+        for number, part in enumerate(self.parts, start=1):
+            response = self.put(upload_id, number, part, sha256=hashlib.sha256(part).hexdigest())
+            self.assertEqual(response.status_code, 200)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('SHA-256', response.data['error'])
+        self.assertFalse(EmployeeDocument.objects.exists())
+        self.assertIsNone(DocumentUpload.objects.get(pk=upload_id).completed_at)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_resumes_from_the_parts_received(self):
+        upload_id = self.start(sha256=hashlib.sha256(self.content).hexdigest())
+        self.put(upload_id, 1, self.parts[0])
+        self.put(upload_id, 3, self.parts[2])
+
+        response = self.client.get(f'/api/document-uploads/{upload_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['missing_parts'], [2])
+        self.assertEqual([part['number'] for part in response.data['parts']], [1, 3])
+        self.assertEqual(self.complete(upload_id).data, {'error': 'Parts not received yet: [2]'})
+
+        self.put(upload_id, 2, self.parts[1])
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['missing_parts'], [])
+        document = EmployeeDocument.objects.get()
+        with document.document.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_completing_twice_returns_the_same_document(self):
+        upload_id = self.start()
+        for number, part in enumerate(self.parts, start=1):
+            self.put(upload_id, number, part)
+        first, second = self.complete(upload_id), self.complete(upload_id)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.data['document']['id'], second.data['document']['id'])
+        self.assertEqual(EmployeeDocument.objects.count(), 1)
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(self.put(upload_id, 1, self.parts[0]).status_code, 409)
+
+    def test_a_failed_completion_leaves_no_file_behind(self):
+        upload_id = self.start()
+        for number, part in enumerate(self.parts, start=1):
+            self.put(upload_id, number, part)
+        upload = DocumentUpload.objects.get(pk=upload_id)
+        with mock.patch.object(DocumentUpload, 'save', side_effect=RuntimeError('lost the database')):
+            with self.assertRaises(RuntimeError):
+                complete_upload(upload)
+        self.assertFalse(EmployeeDocument.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+
+@mock.patch.object(RedisUserRateThrottle, 'THROTTLE_RATES', {'user': None})
+class MessagePackNegotiationTests(TestCase):
+    def setUp(self):
+        ceo = User.objects.create_user(
+            username='ceo@example.com', email='ceo@example.com', password=None, role=Role.objects.create(name='CEO')
+        )
+        self.employee = make_employee(make_users(1)[0], Department.objects.create(name='Finance'))
+        _, key = APIKey.objects.create_key(name='msgpack-tests')
+        self.client = APIClient(headers={'X-Api-Key': key})
+        self.client.force_authenticate(ceo)
+
+    def test_msgpack_bodies_in_and_out(self):
+        url = f'/api/employees/{self.employee.pk}/update_performance/'
+        response = self.client.post(
+            url, msgpack.packb({'rating': 4.5}), content_type='application/msgpack',
+            headers={'Accept': 'application/msgpack'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(response.content, raw=False)
+        self.assertEqual(data['employee']['performance_rating'], 4.5)
+
+        # The same values as the JSON response, datetimes included.
+        json_response = self.client.get(f'/api/employees/{self.employee.pk}/')
+        msgpack_response = self.client.get(f'/api/employees/{self.employee.pk}/', headers={'Accept': 'application/msgpack'})
+        self.assertEqual(msgpack_response.status_code, 200)
+        self.assertIn('joining_date', orjson.loads(json_response.content))
+        self.assertEqual(msgpack.unpackb(msgpack_response.content, raw=False), orjson.loads(json_response.content))
+
+    def test_json_stays_the_default(self):
+        response = self.client.get(f'/api/employees/{self.employee.pk}/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+def import_csv(lines):
+    header = 'email,first_name,last_name,department,designation,joining_date,contact_number,emergency_contact,address'
+    return io.BytesIO('\n'.join([header + ',role,reporting_manager,skills,performance_rating', *lines]).encode())
+
+
+class EmployeeImporterTests(TestCase):
+    def setUp(self):
+        for name in ('EMPLOYEE', 'MANAGER'):
+            Role.objects.create(name=name)
+        self.department = Department.objects.create(name='Engineering')
+        make_users(1, prefix='taken')
+
+    def row(self, email, **fields):
+        values = {
+            'department': 'engineering', 'joining_date': '2024-02-01', 'role': '', 'reporting_manager': '',
+            'skills': 'Python;django', 'performance_rating': '', **fields,
+        }
+        return (
+            f"{email},Ada,Lovelace,{values['department']},Engineer,{values['joining_date']},0123456789,0123456789,"
+            f"1 Main St,{values['role']},{values['reporting_manager']},{values['skills']},{values['performance_rating']}"
+        )
+
+    def test_reports_each_bad_row_and_imports_the_rest(self):
+        stream = import_csv([
+            self.row('lead@example.com', role='manager'),
+            self.row('dev@example.com', reporting_manager='LEAD@example.com', performance_rating='4.5'),
+            self.row('DEV@example.com'),
+            self.row('taken0@example.com'),
+            self.row('not-an-email'),
+            self.row('ops@example.com', department='Operations', joining_date='01/02/2024'),
+            self.row('qa@example.com', role='intern', performance_rating='5.5'),
+            self.row('late@example.com', reporting_manager='later@example.com'),
+            self.row('later@example.com'),
+            'missing@example.com,Ada',
+        ])
+        result = EmployeeImporter(chunk_size=3).run(stream, 'csv').as_dict()
+
+        self.assertEqual((result['rows'], result['created'], result['failed']), (10, 3, 7))
+        self.assertEqual({error['line']: error['errors'] for error in result['errors']}, {
+            4: {'email': 'Duplicate email in this file.'},
+            5: {'email': 'A user with this email already exists.'},
+            6: {'email': 'Enter a valid email address.'},
+            7: {'department': 'Unknown department.', 'joining_date': 'Use YYYY-MM-DD.'},
+            8: {'role': "Unknown role. Allowed: ['EMPLOYEE', 'MANAGER']", 'performance_rating': 'Must be between 0.0 and 5.0.'},
+            9: {'reporting_manager': 'No user with this email.'},
+            11: {field: 'This field is required.' for field in [
+                'last_name', 'department', 'designation', 'joining_date', 'contact_number', 'emergency_contact', 'address',
+            ]},
+        })
+
+        lead = Employee.objects.get(user__email='lead@example.com')
+        dev = Employee.objects.get(user__email='dev@example.com')
+        self.assertEqual(lead.user.role.name, 'MANAGER')
+        self.assertEqual(dev.reporting_manager_id, lead.user_id)
+        self.assertEqual(dev.org_path, f'/{lead.user_id}/{dev.user_id}/')
+        self.assertEqual(dev.performance_rating, 4.5)
+        self.assertEqual(dev.skills, ['python', 'django'])
+        self.assertEqual(
+            sorted(Employee.objects.values_list('employee_id', flat=True)), ['ENG0001', 'ENG0002', 'ENG0003']
+        )
+
+    def test_invalid_json_lines_are_reported(self):
+        stream = io.BytesIO(b'{"email": "a@example.com"}\n\n[1, 2]\nnot json\n')
+        result = EmployeeImporter().run(stream, 'jsonl').as_dict()
+        self.assertEqual(result['failed'], 3)
+        self.assertEqual(result['errors'][0]['line'], 1)
+        self.assertIn('address', result['errors'][0]['errors'])
+        self.assertEqual(result['errors'][1:], [
+            {'line': 3, 'errors': {'row': 'Not a JSON object.'}},
+            {'line': 4, 'errors': {'row': 'Not a JSON object.'}},
+        ])
+
+    def test_dry_runs_only_validate(self):
+        result = EmployeeImporter(dry_run=True).run(import_csv([self.row('dev@example.com')]), 'csv')
+        self.assertEqual((result.rows, result.created, result.failed), (1, 0, 0))
+        self.assertFalse(User.objects.filter(email='dev@example.com').exists())
+
+    def test_rows_taken_after_validation_are_reported_not_fatal(self):
+        class RacingImporter(EmployeeImporter):
+            def validate_chunk(self, chunk, result):
+                valid = super().validate_chunk(chunk, result)
+                make_users(1, prefix='raced')
+                return valid
+
+        stream = import_csv([self.row('first@example.com'), self.row('raced0@example.com'), self.row('last@example.com')])
+        result = RacingImporter().run(stream, 'csv')
+
+        self.assertEqual((result.created, result.failed), (2, 1))
+        self.assertEqual(result.errors[0]['line'], 3)
+        self.assertIn('row', result.errors[0]['errors'])
+        self.assertTrue(Employee.objects.filter(user__email='last@example.com').exists())
+
+
+class ReportingHierarchyTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name='Engineering')
+        # The CEO has no Employee row; a, b and c form a line under them.
+        self.ceo, a, b, c = make_users(4, prefix='line')
+        self.a = make_employee(a, department, reporting_manager=self.ceo)
+        self.b = make_employee(b, department, reporting_manager=a)
+        self.c = make_employee(c, department, reporting_manager=b)
+
+    def paths(self):
+        return dict(Employee.objects.values_list('user_id', 'org_path'))
+
+    def test_paths_follow_the_reporting_line(self):
+        ceo, a, b, c = self.ceo.pk, self.a.user_id, self.b.user_id, self.c.user_id
+        self.assertEqual(self.paths(), {a: f'/{ceo}/{a}/', b: f'/{ceo}/{a}/{b}/', c: f'/{ceo}/{a}/{b}/{c}/'})
+        self.assertEqual(path_for(c, None), f'/{c}/')
+
+    def test_cycles_are_rejected(self):
+        with self.assertRaisesMessage(ValidationError, "can't report to themselves"):
+            path_for(self.a.user_id, self.a.user_id)
+        with self.assertRaisesMessage(ValidationError, 'their own reporting line'):
+            path_for(self.a.user_id, self.c.user_id)
+
+        self.a.reporting_manager = self.c.user
+        with self.assertRaises(ValidationError) as raised:
+            self.a.full_clean()
+        self.assertIn('reporting_manager', raised.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            self.a.save()
+        self.assertEqual(Employee.objects.get(pk=self.a.pk).reporting_manager_id, self.ceo.pk)
+
+    def test_moving_a_manager_moves_their_reports(self):
+        ceo, a, b, c = self.ceo.pk, self.a.user_id, self.b.user_id, self.c.user_id
+        self.b.reporting_manager = self.ceo
+        self.b.save()
+        self.assertEqual(self.paths(), {a: f'/{ceo}/{a}/', b: f'/{ceo}/{b}/', c: f'/{ceo}/{b}/{c}/'})
+
+        # Only what is under the old path, not the path itself.
+        self.assertEqual(move_subtree(f'/{ceo}/{b}/', f'/{b}/'), 1)
+        self.assertEqual(self.paths()[c], f'/{b}/{c}/')
+        self.assertEqual(self.paths()[b], f'/{ceo}/{b}/')
+
+    def test_deleting_an_employee_reroots_their_reports(self):
+        b, c = self.b.user_id, self.c.user_id
+        self.b.delete()
+        self.assertEqual(self.paths()[c], f'/{b}/{c}/')
+
+    def test_compute_paths_matches_the_stored_paths_and_cuts_loops(self):
+        managers = dict(Employee.objects.values_list('user_id', 'reporting_manager_id'))
+        computed = compute_paths(managers)
+        self.assertEqual({user_id: computed[user_id] for user_id in managers}, self.paths())
+
+        self.assertEqual(compute_paths({1: None, 2: 1, 3: 2}), {1: '/1/', 2: '/1/2/', 3: '/1/2/3/'})
+        # 4 and 5 manage each other: the loop is cut at 5, which becomes a root.
+        self.assertEqual(compute_paths({4: 5, 5: 4, 6: 4}), {5: '/5/', 4: '/5/4/', 6: '/5/4/6/'})
+
+
+@mock.patch.object(RedisUserRateThrottle, 'THROTTLE_RATES', {'user': None})
+class SkillSearchTests(TestCase):
+    def setUp(self):
+        engineering, data = Department.objects.create(name='Engineering'), Department.objects.create(name='Data')
+        users = make_users(4, prefix='skilled')
+        self.web = make_employee(users[0], engineering, skills=[' Python', 'DJANGO', 'python'])
+        self.ml = make_employee(users[1], data, skills=['python', 'Machine  Learning'])
+        self.c = make_employee(users[2], engineering, skills=['C', 'c++'])
+        self.none = make_employee(users[3], data)
+
+        _, key = APIKey.objects.create_key(name='skills-tests')
+        self.client = APIClient(headers={'X-Api-Key': key})
+        self.client.force_authenticate(users[0])
+
+    def test_skills_are_stored_normalised(self):
+        self.assertEqual(normalise_skills([' Machine  Learning', 'PYTHON', 'python ', '', 'Zoë']), [
+            'machine learning', 'python', 'zoë',
+        ])
+        self.assertEqual(parse_skills(['Python,django', ' DJANGO ']), ['python', 'django'])
+        self.web.refresh_from_db()
+        self.assertEqual(self.web.skills, ['python', 'django'])
+
+    def search(self, **params):
+        response = self.client.get('/api/employees/skills/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['id'] for row in response.data['results'])
+
+    def test_any_and_all(self):
+        self.assertEqual(self.search(skills='Python'), sorted([self.web.pk, self.ml.pk]))
+        self.assertEqual(self.search(skills='django,machine learning'), sorted([self.web.pk, self.ml.pk]))
+        self.assertEqual(self.search(skills='python,DJANGO', match='all'), [self.web.pk])
+        self.assertEqual(self.search(skills='python,c', match='all'), [])
+        self.assertEqual(self.search(skills='python', department='Data'), [self.ml.pk])
+
+    def test_whole_names_only(self):
+        self.assertEqual(self.search(skills='c'), [self.c.pk])
+        self.assertEqual(self.search(skills='machine'), [])
+        self.assertEqual(list(filter_by_skills(Employee.objects.all(), ['learning'])), [])
+
+    def test_bad_searches_are_refused(self):
+        for params in ({}, {'skills': ' , '}, {'skills': 'python', 'match': 'some'}):
+            self.assertEqual(self.client.get('/api/employees/skills/search/', params).status_code, 400)
+
+    def test_facets_count_employees_per_skill(self):
+        facets = skill_facets()
+        self.assertEqual(facets['company'][0], {'skill': 'python', 'count': 2})
+        self.assertEqual(len(facets['company']), 5)
+        self.assertEqual([department['name'] for department in facets['departments']], ['Data', 'Engineering'])
+        self.assertEqual(facets['departments'][0]['skills'], [
+            {'skill': 'machine learning', 'count': 1}, {'skill': 'python', 'count': 1},
+        ])
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import shutil
+import uuid
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from .models import DocumentUpload, DocumentUploadPart, EmployeeDocument
+
+# Chunked, resumable employee document uploads:
+#
+#   POST   /employees/{id}/uploads/                start: filename, size, document_type
+#   PUT    /document-uploads/{upload}/parts/{n}/   the raw bytes of part n (from 1)
+#   GET    /document-uploads/{upload}/             parts received so far, to resume
+#   POST   /document-uploads/{upload}/complete/    assemble the EmployeeDocument
+#   DELETE /document-uploads/{upload}/             give up
+#
+# Parts are streamed from the request to their own file in
+# DOCUMENT_UPLOAD_DIR, READ_SIZE bytes at a time, so no worker holds a
+# whole file in memory or is busy for longer than one part, and only
+# failed parts are sent again. DOCUMENT_UPLOAD_DIR must be shared by all
+# the workers serving the API.
+
+READ_SIZE = 64 * 1024
+MIN_PART_SIZE = 1024 * 1024
+MAX_PART_SIZE = 64 * 1024 * 1024
+
+
+def upload_dir(upload):
+    return os.path.join(settings.DOCUMENT_UPLOAD_DIR, str(upload.pk))
+
+
+def part_path(upload, number):
+    return os.path.join(upload_dir(upload), f'{number}.part')
+
+
+def expected_part_size(upload, number):
+    if number < upload.part_count:
+        return upload.part_size
+    return upload.size - upload.part_size * (upload.part_count - 1)
+
+
+def write_part(upload, number, stream, sha256=''):
+    """
+    Stream part `number` to disk, checking its size and, if given, its
+    SHA-256 (hex). Sending a part again replaces it.
+    """
+    if not 1 <= number <= upload.part_count:
+        raise ValidationError(f'Part number must be between 1 and {upload.part_count}.')
+
+    expected = expected_part_size(upload, number)
+    os.makedirs(upload_dir(upload), exist_ok=True)
+    path = part_path(upload, number)
+    # Its own temporary file, so a retry racing the original can't mix
+    # their bytes; the part only appears once complete and checked.
+    temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+    digest, received = hashlib.sha256(), 0
+    try:
+        with open(temporary, 'wb') as f:
+            while chunk := (stream.read(min(READ_SIZE, expected - received + 1)) if stream else b''):
+                received += len(chunk)
+                if received > expected:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+
+        if received != expected:
+            raise ValidationError(f'Part {number} must be {expected} bytes.')
+        if sha256 and sha256.lower() != digest.hexdigest():
+            raise ValidationError(f'Part {number} does not match its SHA-256 checksum.')
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    part, _ = DocumentUploadPart.objects.update_or_create(
+        upload=upload, number=number, defaults={'size': received, 'sha256': digest.hexdigest()}
+    )
+    return part
+
+
+def missing_parts(upload):
+    received = set(upload.parts.values_list('number', flat=True))
+    return [number for number in range(1, upload.part_count + 1) if number not in received]
+
+
+class _AssembledFile(File):
+    # Like TemporaryUploadedFile: FileSystemStorage moves the file into
+    # place instead of copying it.
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def complete_upload(upload):
+    """
+    Assemble the parts into the upload's EmployeeDocument. Completing an
+    upload again returns the same document.
+    """
+    document = None
+    try:
+        with transaction.atomic():
+            upload = DocumentUpload.objects.select_for_update().get(pk=upload.pk)
+            if upload.completed_at:
+                return upload.document
+
+            missing = missing_parts(upload)
+            if missing:
+                raise ValidationError(f'Parts not received yet: {missing[:50]}')
+
+            path = os.path.join(upload_dir(upload), 'assembled')
+            digest = hashlib.sha256()
+            with open(path, 'wb') as assembled:
+                for number in range(1, upload.part_count + 1):
+                    with open(part_path(upload, number), 'rb') as part:
+                        while chunk := part.read(READ_SIZE):
+                            digest.update(chunk)
+                            assembled.write(chunk)
+            if upload.sha256 and upload.sha256 != digest.hexdigest():
+                os.remove(path)
+                raise ValidationError('The assembled file does not match the SHA-256 checksum given at the start.')
+
+            # The row first, so nothing is stored for a document that
+            # can't be inserted.
+            document = EmployeeDocument.objects.create(
+                employee_id=upload.employee_id,
+                document_type=upload.document_type,
+                description=upload.description,
+            )
+            with open(path, 'rb') as assembled:
+                document.document.save(upload.filename, _AssembledFile(assembled), save=False)
+            document.save(update_fields=['document'])
+
+            upload.document = document
+            upload.completed_at = timezone.now()
+            upload.save(update_fields=['document', 'completed_at'])
+            transaction.on_commit(lambda: discard_parts(upload))
+    except Exception:
+        # The row is rolled back; the stored file has to go by hand.
+        if document is not None and document.document:
+            document.document.delete(save=False)
+        raise
+    return document
+
+
+def discard_parts(upload):
+    shutil.rmtree(upload_dir(upload), ignore_errors=True)
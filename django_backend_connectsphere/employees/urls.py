@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DepartmentViewSet, EmployeeViewSet
+from .views import DepartmentViewSet, DocumentUploadViewSet, EmployeeViewSet
 
 router = DefaultRouter()
 router.register(r'departments', DepartmentViewSet)
 router.register(r'employees', EmployeeViewSet)
+router.register(r'document-uploads', DocumentUploadViewSet, basename='document-upload')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -17,6 +18,10 @@ urlpatterns = [
     path('employees/<int:pk>/documents/', EmployeeViewSet.as_view({'get': 'documents'}), name='employee_documents_for_CEO_and_requestUser'),
     path('employees/<int:pk>/update_performance/', EmployeeViewSet.as_view({'post': 'update_performance'}), name='update_performance_of_employee_for_CEO'),
     path('employees/<int:pk>/upload_document/', EmployeeViewSet.as_view({'post': 'upload_document'}), name='upload_document_of_employee_for_CEO_and_department_manager'),
+    path('employees/<int:pk>/uploads/', EmployeeViewSet.as_view({'post': 'start_upload'}), name='start_chunked_document_upload_for_CEO_and_department_manager'),
+    path('document-uploads/<uuid:pk>/', DocumentUploadViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'}), name='chunked_document_upload_status_for_uploader'),
+    path('document-uploads/<uuid:pk>/parts/<int:number>/', DocumentUploadViewSet.as_view({'put': 'upload_part'}), name='upload_document_part_for_uploader'),
+    path('document-uploads/<uuid:pk>/complete/', DocumentUploadViewSet.as_view({'post': 'complete'}), name='complete_chunked_document_upload_for_uploader'),
 
     path('departments/', DepartmentViewSet.as_view({'get': 'list'}), name='department_list_for_CEO'), 
     path('departments/departments_list_for_request_user/', DepartmentViewSet.as_view({'get': 'departments_list_for_request_user'}), name='departments_list_for_request_user'),
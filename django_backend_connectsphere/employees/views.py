@@ -1,33 +1,75 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import Department, Employee, EmployeeDocument
+from .models import Department, DocumentUpload, Employee, EmployeeDocument
 from .serializers import (
     DepartmentSerializer,
     EmployeeSerializer,
     EmployeeDocumentSerializer,
     DepartmentSerializerForEmployeeSerializer,
-    CustomEmployeeSerializerFor_list_employee_action
+    CustomEmployeeSerializerFor_list_employee_action,
+    DocumentUploadSerializer,
+    PerformanceReviewSerializer
 )
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import NotFound
-from rest_framework.throttling import UserRateThrottle
-from rest_framework_api_key.permissions import HasAPIKey
-from .pagination import CustomPagination
+from rest_framework.exceptions import NotFound, ValidationError
+from connectsphere_backend.throttling import RedisScopedRateThrottle, RedisUserRateThrottle
+from rest_framework.settings import api_settings
+from connectsphere_backend.renderers import MessagePackRenderer
+from connectsphere_backend.parsers import MessagePackParser
+from connectsphere_backend.exports import ExportContentNegotiation, export_format, export_queryset
+from connectsphere_backend.imports import detect_format
+from accounts.permissions import CachedHasAPIKey
+from .pagination import CustomPagination, EmployeeCursorPagination
+from .queries import EMPLOYEE_EXPORT_FIELDS, employee_directory_queryset, employee_export_queryset
+from .stats import department_stats
+from .ratings import rating_analytics, record_review
+from .skills import MAX_SEARCH_SKILLS, filter_by_skills, parse_skills, skill_facets
+from .hierarchy import MAX_DEPTH, cached_org_chart, chain_rows, employees_under, nest, subtree_rows
+from .importer import EmployeeImporter
+from .uploads import complete_upload, write_part
 from rest_framework.exceptions import PermissionDenied
 from django.db.models import Count,F,Value,Q
 from django.db.models.functions import Concat
 from django.utils import timezone
 from django.contrib.postgres.aggregates import ArrayAgg
-from django.db.models.functions import Coalesce
+from django.core.exceptions import ValidationError as DjangoValidationError
+
+def check_can_upload_documents(user, employee):
+    if not (hasattr(user, 'role')):
+        raise PermissionDenied("You do not have permission to upload documents.")
+
+    is_ceo = user.role.name == 'CEO'
+    is_manager = user.role.name == 'Manager'
+
+    if is_manager:
+        try:
+            manager_employee = user.employee  
+            same_department = manager_employee.department == employee.department
+        except AttributeError:
+            same_department = False
+
+    if not (is_ceo or (is_manager and same_department)):
+        raise PermissionDenied("Only CEO or department managers can upload documents.")
+
+def under_filter(user_id):
+    # ?under=<user id>: everyone in that user's reporting line, not them.
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        raise ValidationError({"under": "A valid user id is required."})
+    return Q(**employees_under(user_id)) & ~Q(user_id=user_id)
+
 
 class DepartmentViewSet(viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     pagination_class = CustomPagination
-    permission_classes = [HasAPIKey,IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    permission_classes = [CachedHasAPIKey,IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
 
     # def get_permissions(self):
     #     if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -38,13 +80,7 @@ class DepartmentViewSet(viewsets.ModelViewSet):
         if request.user.role.name != 'CEO':
             raise PermissionDenied("You do not have permission to view department list.")
         
-        departments = Department.objects.annotate(
-        employee_count=Count('employee', distinct=True),
-        designations=Coalesce(
-            ArrayAgg('employee__designation', distinct=True), 
-            Value([])
-            )
-        ).order_by('id')
+        departments = self.get_queryset().order_by('id')
 
         paginator = CustomPagination()
         paginated_departments = paginator.paginate_queryset(departments, request)
@@ -56,6 +92,16 @@ class DepartmentViewSet(viewsets.ModelViewSet):
         return Response({"error": "Unable to paginate departments."}, status=status.HTTP_400_BAD_REQUEST)
 
 
+    def get_queryset(self):
+        # Everything DepartmentSerializer shows, in one query.
+        return Department.objects.annotate(
+            employee_count=Count('employee', distinct=True),
+            designations=ArrayAgg(
+                'employee__designation', distinct=True, ordering='employee__designation',
+                filter=Q(employee__isnull=False), default=Value([])
+            )
+        )
+
     def retrieve(self, request, *args, **kwargs):
         employee = self.get_object()
 
@@ -81,6 +127,20 @@ class DepartmentViewSet(viewsets.ModelViewSet):
         status=status.HTTP_405_METHOD_NOT_ALLOWED
         )
 
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        if request.user.role.name != 'CEO':
+            raise PermissionDenied("You do not have permission to view department statistics.")
+
+        try:
+            months = int(request.query_params.get('months', 12))
+        except ValueError:
+            return Response({"error": "months must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= months <= 60:
+            return Response({"error": "months must be between 1 and 60."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(department_stats(months), status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'])
     def departments_list_for_request_user(self, request):
         departments = Department.objects.all().order_by('id')
@@ -91,8 +151,10 @@ class EmployeeViewSet(viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     pagination_class = CustomPagination
-    permission_classes = [HasAPIKey,IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    permission_classes = [CachedHasAPIKey,IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
 
     def list(self, request, *args, **kwargs):
         if request.user.role.name != 'CEO':
@@ -116,29 +178,154 @@ class EmployeeViewSet(viewsets.ModelViewSet):
 
         department_name = request.GET.get('department', None)
         search_query = request.GET.get('search', None)
+        under = request.GET.get('under', None)
 
-        employeesList = Employee.objects.select_related('user', 'department').only(
-           'id', 'user__id', 'user__first_name','user__last_name', 'user__role__name','user__is_active','user__profile_picture', 'designation', 'department__name'
-        )
+        employeesList = employee_directory_queryset(department_name, search_query)
+        if under:
+            employeesList = employeesList.filter(under_filter(under))
 
-        filters = Q()
-        if department_name:
-            filters &= Q(department__name__iexact=department_name) 
-        if search_query:
-            filters &= Q(user__first_name__icontains=search_query) | Q(user__last_name__icontains=search_query)
+        # Paginate the queryset before serialising so only one page of rows
+        # is fetched and turned into JSON.
+        paginator = EmployeeCursorPagination()
+        paginated_employees = paginator.paginate_queryset(employeesList, request)
 
-        employeesList = employeesList.filter(filters).order_by('id') 
+        if paginated_employees is not None:
+            serializer = CustomEmployeeSerializerFor_list_employee_action(paginated_employees, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+
+        return Response({"error": "Unable to paginate employees."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+    @action(detail=False, methods=['get'], url_path='performance/analytics')
+    def performance_analytics(self, request):
+        if request.user.role.name != 'CEO':
+            raise PermissionDenied("You do not have permission to view performance analytics.")
+
+        try:
+            quarters = int(request.query_params.get('quarters', 8))
+            department_id = int(request.query_params['department_id']) if request.query_params.get('department_id') else None
+        except ValueError:
+            return Response({"error": "quarters and department_id must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= quarters <= 40:
+            return Response({"error": "quarters must be between 1 and 40."}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = CustomEmployeeSerializerFor_list_employee_action(employeesList, many=True,context={'request': request} )
+        return Response(rating_analytics(quarters, department_id), status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def performance_history(self, request, pk=None):
+        employee = self.get_object()
+
+        if not (request.user.role.name == 'CEO' or employee.user == request.user):
+            raise PermissionDenied("You do not have permission to view this employee's performance history.")
+
+        reviews = employee.performance_reviews.select_related('department', 'reviewed_by').order_by('-reviewed_at', '-id')
         paginator = CustomPagination()
-        paginated_employees = paginator.paginate_queryset(serializer.data, request)
+        page = paginator.paginate_queryset(reviews, request)
+        serializer = PerformanceReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        if paginated_employees is not None:
-            return paginator.get_paginated_response(paginated_employees)
+    @action(detail=False, methods=['get'], url_path='skills/search')
+    def skills_search(self, request):
+        # ?skills=python,django&match=any|all, optionally ?department=<name>.
+        if not hasattr(request.user, 'role') or request.user.role is None:
+            raise PermissionDenied("You do not have permission to search employees.")
 
-        return Response({"error": "Unable to paginate employees."}, status=status.HTTP_400_BAD_REQUEST)
+        skills = parse_skills(request.query_params.getlist('skills'))
+        if not skills:
+            return Response({"error": "skills is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(skills) > MAX_SEARCH_SKILLS:
+            return Response({"error": f"At most {MAX_SEARCH_SKILLS} skills."}, status=status.HTTP_400_BAD_REQUEST)
+
+        match = request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            return Response({"error": "match must be any or all."}, status=status.HTTP_400_BAD_REQUEST)
+
+        employees = employee_directory_queryset(request.GET.get('department', None))
+        employees = filter_by_skills(employees, skills, match_all=match == 'all')
+
+        paginator = EmployeeCursorPagination()
+        page = paginator.paginate_queryset(employees, request)
+        serializer = CustomEmployeeSerializerFor_list_employee_action(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='skills/facets')
+    def skills_facets(self, request):
+        if not hasattr(request.user, 'role') or request.user.role is None:
+            raise PermissionDenied("You do not have permission to view skill counts.")
+
+        try:
+            department_id = int(request.query_params['department_id']) if request.query_params.get('department_id') else None
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({"error": "department_id and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= 100:
+            return Response({"error": "limit must be between 1 and 100."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(skill_facets(department_id, limit), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def org_chart(self, request):
+        # ?user_id= (default: you), ?direction=down (their reports, nested,
+        # ?depth levels deep) or up (their managers to the top).
+        if not hasattr(request.user, 'role') or request.user.role is None:
+            raise PermissionDenied("You do not have permission to view the org chart.")
+
+        try:
+            user_id = int(request.query_params.get('user_id', request.user.id))
+            depth = int(request.query_params.get('depth', MAX_DEPTH))
+        except ValueError:
+            return Response({"error": "user_id and depth must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= depth <= MAX_DEPTH:
+            return Response({"error": f"depth must be between 1 and {MAX_DEPTH}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        direction = request.query_params.get('direction', 'down')
+        if direction == 'down':
+            data = cached_org_chart(f'down:{user_id}:{depth}', lambda: nest(subtree_rows(user_id, depth)))
+        elif direction == 'up':
+            data = cached_org_chart(f'up:{user_id}', lambda: chain_rows(user_id) or None)
+        else:
+            return Response({"error": "direction must be down or up."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if data is None:
+            return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], content_negotiation_class=ExportContentNegotiation)
+    def export(self, request):
+        if request.user.role.name != 'CEO':
+            raise PermissionDenied("Only the CEO can export employees.")
+
+        fmt = export_format(request)
+        if fmt is None:
+            return Response({"error": "file_format must be csv or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+
+        employees = employee_export_queryset(request.GET.get('department', None))
+        under = request.GET.get('under', None)
+        if under:
+            employees = employees.filter(under_filter(under))
+        return export_queryset(request, employees, EMPLOYEE_EXPORT_FIELDS, fmt, 'employees')
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        if request.user.role.name != 'CEO':
+            raise PermissionDenied("Only the CEO can import employees.")
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'A CSV or JSON Lines file is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fmt = request.data.get('format') or detect_format(upload.name)
+        if fmt not in ('csv', 'jsonl'):
+            return Response({'error': 'format must be csv or jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Large uploads are spooled to disk by Django and read from there a
+        # chunk at a time.
+        importer = EmployeeImporter(
+            approved_by=request.user, dry_run=request.data.get('dry_run') in ('true', '1', True)
+        )
+        result = importer.run(upload.open('rb'), fmt)
+
+        return Response(result.as_dict(max_errors=100), status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
         employee = self.get_object()
@@ -261,6 +448,7 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         department = self.request.query_params.get('department')
         designation = self.request.query_params.get('designation')
         performance_rating = self.request.query_params.get('performance_rating')
+        under = self.request.query_params.get('under')
 
         if department:
             queryset = queryset.filter(department_id=department)
@@ -272,6 +460,8 @@ class EmployeeViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(performance_rating=rating)
             except ValueError:
                 raise ValidationError({"performance_rating": "Must be a numeric value."})
+        if under:
+            queryset = queryset.filter(under_filter(under))
 
         return queryset
 
@@ -281,24 +471,9 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         document = request.FILES.get('document')
         document_type = request.data.get('document_type')
 
-        user = request.user
         allowed_document_types = ['ID_PROOF', 'ADDRESS_PROOF', 'RESUME', 'CERTIFICATE', 'OTHER']
 
-        if not (hasattr(user, 'role')):
-            raise PermissionDenied("You do not have permission to upload documents.")
-
-        is_ceo = user.role.name == 'CEO'
-        is_manager = user.role.name == 'Manager'
-
-        if is_manager:
-            try:
-                manager_employee = user.employee  
-                same_department = manager_employee.department == employee.department
-            except AttributeError:
-                same_department = False
-
-        if not (is_ceo or (is_manager and same_department)):
-            raise PermissionDenied("Only CEO or department managers can upload documents.")
+        check_can_upload_documents(request.user, employee)
 
         if not document or not document_type:
             return Response(
@@ -329,6 +504,16 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=True, methods=['post'], url_path='uploads')
+    def start_upload(self, request, pk=None):
+        employee = self.get_object()
+        check_can_upload_documents(request.user, employee)
+
+        serializer = DocumentUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(employee=employee, created_by=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
     @action(detail=True, methods=['post'])
     def update_performance(self, request, pk=None):
@@ -359,9 +544,7 @@ class EmployeeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        employee.performance_rating = rating
-        employee.last_review_date = timezone.now().date()
-        employee.save()
+        record_review(employee, rating, request.user)
 
         serializer = self.get_serializer(employee)
         return Response(
@@ -369,3 +552,45 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         status=status.HTTP_200_OK
     )
 
+
+class DocumentUploadViewSet(mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    # Chunked document uploads, see employees/uploads.py. Only whoever
+    # started an upload can see or continue it.
+    queryset = DocumentUpload.objects.all()
+    serializer_class = DocumentUploadSerializer
+    permission_classes = [CachedHasAPIKey,IsAuthenticated]
+    # One request per part: throttled on its own rate, not the general one.
+    throttle_classes = [RedisScopedRateThrottle]
+    throttle_scope = 'document_upload'
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+
+    def get_queryset(self):
+        return DocumentUpload.objects.filter(created_by=self.request.user).select_related('document')
+
+    @action(detail=True, methods=['put'], url_path=r'parts/(?P<number>[0-9]+)')
+    def upload_part(self, request, pk=None, number=None):
+        upload = self.get_object()
+        if upload.completed_at:
+            return Response({'error': 'This upload is already complete'}, status=status.HTTP_409_CONFLICT)
+
+        # The body is read straight from the request stream, never parsed.
+        try:
+            part = write_part(upload, int(number), request.stream, request.headers.get('X-Part-SHA256', ''))
+        except DjangoValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {'number': part.number, 'size': part.size, 'sha256': part.sha256},
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        upload = self.get_object()
+        try:
+            complete_upload(upload)
+        except DjangoValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload.refresh_from_db()
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
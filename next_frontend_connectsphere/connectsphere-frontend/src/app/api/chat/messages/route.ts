@@ -10,18 +10,18 @@ export async function GET(req: NextRequest) {
       return NextResponse.json({ error: "Unauthorized" }, { status: 401 })
     }
 
-    const cursor = req.nextUrl.searchParams.get('cursor')
-    let url: string
-
-    if (cursor) {
-      url = `${process.env.BACKEND_URL}/api/chat/messages/?cursor=${cursor}`
-    } else {
-      const roomId = req.nextUrl.searchParams.get('room_id')
-      if (!roomId) {
-        return NextResponse.json({ error: "Missing room identifier" }, { status: 400 })
-      }
-      url = `${process.env.BACKEND_URL}/api/chat/messages/?room_id=${roomId}`
+    // Always send the room: with sharded messages the backend can't list
+    // them without it, cursor or not.
+    const roomId = req.nextUrl.searchParams.get('room_id')
+    if (!roomId) {
+      return NextResponse.json({ error: "Missing room identifier" }, { status: 400 })
     }
+    const cursor = req.nextUrl.searchParams.get('cursor')
+    const queryParams = new URLSearchParams({
+      room_id: roomId,
+      ...(cursor && { cursor })
+    }).toString()
+    const url = `${process.env.BACKEND_URL}/api/chat/messages/?${queryParams}`
 
     const response = await axios.get(url, {
       headers: {
@@ -12,12 +12,14 @@ export async function GET(request: NextRequest) {
     }
 
     const searchParams = request.nextUrl.searchParams;
-    const page = searchParams.get('page') || '1';
+    // The backend pages by cursor: pass the opaque cursor from its next /
+    // previous links straight through.
+    const cursor = searchParams.get('cursor');
     const department = searchParams.get('department');
     const search = searchParams.get('search');
 
     const queryParams = new URLSearchParams({
-      page,
+      ...(cursor && { cursor }),
       ...(department && { department }),
       ...(search && { search })
     }).toString();
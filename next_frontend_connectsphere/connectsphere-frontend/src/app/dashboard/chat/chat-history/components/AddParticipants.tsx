@@ -4,8 +4,7 @@ import { useState, useRef, useEffect, useCallback } from "react"
 import { useAppDispatch, useAppSelector } from "@/app/redux/store"
 import {
   fetchEmployees,
-  resetEmployees,
-  setCurrentPage
+  resetEmployees
 } from "@/app/redux/slices/employeeListForUserSlice"
 import { fetchDepartments } from "@/app/redux/slices/DepartmentListSliceForUser"
 import { addParticipants } from "@/app/redux/slices/chatRoomSlice"
@@ -59,13 +58,11 @@ export function AddParticipants({ onBack, roomId, existingParticipants }: AddPar
     loading: departmentListLoading,
   } = useAppSelector((state) => state.departments)
 
-  const currentPageNumber = parseInt(currentPage[filterKey] || "1")
-  const pageData = pages[filterKey]?.[currentPage[filterKey] || "1"]
+  const currentPageNumber = currentPage[filterKey] || 1
+  const pageData = pages[filterKey]
   const employees = pageData ? pageData.results : []
   const nextPageUrl = pageData?.next
   const previousPageUrl = pageData?.previous
-  const pageSize = 10
-  const totalPages = pageData ? Math.ceil(pageData.count / pageSize) : 1
 
   useEffect(() => {
     if (status === "authenticated") {
@@ -110,46 +107,28 @@ export function AddParticipants({ onBack, roomId, existingParticipants }: AddPar
   }, [status, dispatch])
 
   const handlePreviousPage = useCallback(() => {
-    if (previousPageUrl && !employeeListLoading && !departmentListLoading) {
-      const prevPageNumber = new URL(previousPageUrl, window.location.origin).searchParams.get("page") || "1"
-
-      if (!pages[filterKey]?.[prevPageNumber]) {
-        if (status === "authenticated") {
-          dispatch(fetchEmployees({
-            pageUrl: previousPageUrl,
-            department,
-            search: searchTerm,
-            component: componentKey
-          }))
-        }
-      } else {
-        if (status === "authenticated") {
-          dispatch(setCurrentPage({ [filterKey]: prevPageNumber }))
-        }
-      }
+    if (previousPageUrl && !employeeListLoading && !departmentListLoading && status === "authenticated") {
+      dispatch(fetchEmployees({
+        pageUrl: previousPageUrl,
+        department,
+        search: searchTerm,
+        component: componentKey,
+        direction: "previous"
+      }))
     }
-  }, [status, previousPageUrl, employeeListLoading, departmentListLoading, dispatch, pages, filterKey, department, searchTerm])
+  }, [status, previousPageUrl, employeeListLoading, departmentListLoading, dispatch, department, searchTerm])
 
   const handleNextPage = useCallback(() => {
-    if (nextPageUrl && !employeeListLoading && !departmentListLoading) {
-      const nextPageNumber = new URL(nextPageUrl, window.location.origin).searchParams.get("page") || "1"
-
-      if (!pages[filterKey]?.[nextPageNumber]) {
-        if (status === "authenticated") {
-          dispatch(fetchEmployees({
-            pageUrl: nextPageUrl,
-            department,
-            search: searchTerm,
-            component: componentKey
-          }))
-        }
-      } else {
-        if (status === "authenticated") {
-          dispatch(setCurrentPage({ [filterKey]: nextPageNumber }))
-        }
-      }
+    if (nextPageUrl && !employeeListLoading && !departmentListLoading && status === "authenticated") {
+      dispatch(fetchEmployees({
+        pageUrl: nextPageUrl,
+        department,
+        search: searchTerm,
+        component: componentKey,
+        direction: "next"
+      }))
     }
-  }, [status, nextPageUrl, employeeListLoading, departmentListLoading, dispatch, pages, filterKey, department, searchTerm])
+  }, [status, nextPageUrl, employeeListLoading, departmentListLoading, dispatch, department, searchTerm])
 
   const handleSubmit = useCallback(async () => {
     if (selectedParticipants.length === 0) return
@@ -295,7 +274,7 @@ export function AddParticipants({ onBack, roomId, existingParticipants }: AddPar
               Previous
             </Button>
             <span className="text-sm text-muted-foreground">
-              Page {currentPageNumber} of {totalPages}
+              Page {currentPageNumber}
             </span>
             <Button
               onClick={handleNextPage}
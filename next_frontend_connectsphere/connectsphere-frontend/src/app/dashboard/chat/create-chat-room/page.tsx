@@ -5,8 +5,7 @@ import { useAppDispatch, useAppSelector } from "@/app/redux/store"
 import { createChatRoom } from "@/app/redux/slices/chatRoomsSlice"
 import {
   fetchEmployees,
-  resetEmployees,
-  setCurrentPage
+  resetEmployees
 } from "@/app/redux/slices/employeeListForUserSlice"
 import { fetchDepartments } from "@/app/redux/slices/DepartmentListSliceForUser"
 import { Input } from "@/components/ui/input"
@@ -60,13 +59,11 @@ export default function CreateChatRoom() {
   } = useAppSelector((state) => state.departments)
 
   const filterKey = getFilterKey(department, searchTerm, "createChatRoom")
-  const currentPageNumber = parseInt(currentPage[filterKey] || "1")
-  const pageData = pages[filterKey]?.[currentPage[filterKey] || "1"]
+  const currentPageNumber = currentPage[filterKey] || 1
+  const pageData = pages[filterKey]
   const employees = pageData ? pageData.results : []
   const nextPageUrl = pageData?.next
   const previousPageUrl = pageData?.previous
-  const pageSize = 10
-  const totalPages = pageData ? Math.ceil(pageData.count / pageSize) : 1
 
   useEffect(() => {
     if (createdRoomId) {
@@ -125,50 +122,28 @@ export default function CreateChatRoom() {
   }, [dispatch]);
 
   const handlePreviousPage = useCallback(() => {
-    if (previousPageUrl && !employeeListLoading && !departmentListLoading) {
-      const prevPageNumber = new URL(previousPageUrl, window.location.origin).searchParams.get("page") || "1"
-
-      if (!pages[filterKey]?.[prevPageNumber]) {
-        if (status === "authenticated") {
-          dispatch(
-            fetchEmployees({
-              pageUrl: previousPageUrl,
-              department,
-              search: searchTerm,
-              component: "createChatRoom"
-            })
-          )
-        }
-      } else {
-        if (status === "authenticated") {
-          dispatch(setCurrentPage({ [filterKey]: prevPageNumber }))
-        }
-      }
+    if (previousPageUrl && !employeeListLoading && !departmentListLoading && status === "authenticated") {
+      dispatch(fetchEmployees({
+        pageUrl: previousPageUrl,
+        department,
+        search: searchTerm,
+        component: "createChatRoom",
+        direction: "previous"
+      }))
     }
-  }, [status, previousPageUrl, employeeListLoading, departmentListLoading, dispatch, pages, filterKey, department, searchTerm])
+  }, [status, previousPageUrl, employeeListLoading, departmentListLoading, dispatch, department, searchTerm])
 
   const handleNextPage = useCallback(() => {
-    if (nextPageUrl && !employeeListLoading && !departmentListLoading) {
-      const nextPageNumber = new URL(nextPageUrl, window.location.origin).searchParams.get("page") || "1"
-
-      if (!pages[filterKey]?.[nextPageNumber]) {
-        if (status === "authenticated") {
-          dispatch(
-            fetchEmployees({
-              pageUrl: nextPageUrl,
-              department,
-              search: searchTerm,
-              component: "createChatRoom"
-            })
-          )
-        }
-      } else {
-        if (status === "authenticated") {
-          dispatch(setCurrentPage({ [filterKey]: nextPageNumber }))
-        }
-      }
+    if (nextPageUrl && !employeeListLoading && !departmentListLoading && status === "authenticated") {
+      dispatch(fetchEmployees({
+        pageUrl: nextPageUrl,
+        department,
+        search: searchTerm,
+        component: "createChatRoom",
+        direction: "next"
+      }))
     }
-  }, [status, nextPageUrl, employeeListLoading, departmentListLoading, dispatch, pages, filterKey, department, searchTerm])
+  }, [status, nextPageUrl, employeeListLoading, departmentListLoading, dispatch, department, searchTerm])
 
   const handleSubmit = useCallback(async (e: FormEvent) => {
     e.preventDefault();
@@ -395,7 +370,7 @@ export default function CreateChatRoom() {
             Previous
           </Button>
           <span className="text-sm md:text-base">
-            Page {currentPageNumber} of {totalPages}
+            Page {currentPageNumber}
           </span>
           <Button onClick={handleNextPage} disabled={!nextPageUrl} className="text-sm md:text-base">
             Next
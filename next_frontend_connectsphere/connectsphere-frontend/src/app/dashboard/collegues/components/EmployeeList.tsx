@@ -6,8 +6,7 @@ import { useRouter } from "next/navigation";
 import { useAppSelector, useAppDispatch } from "@/app/redux/store";
 import {
   fetchEmployees,
-  resetEmployees,
-  setCurrentPage
+  resetEmployees
 } from "@/app/redux/slices/employeeListForUserSlice";
 import { getFilterKey } from "@/app/dashboard/collegues/types/employeeListTypes";
 import { Button } from "@/components/ui/button";
@@ -60,13 +59,11 @@ export default function EmployeeList() {
   const { toast } = useToast();
 
   const filterKey = getFilterKey(department, searchTerm, "employeeList");
-  const currentPageNumber = parseInt(currentPage[filterKey] || "1");
-  const pageData = pages[filterKey]?.[currentPage[filterKey] || "1"];
+  const currentPageNumber = currentPage[filterKey] || 1;
+  const pageData = pages[filterKey];
   const employees: Employee[] = pageData ? pageData.results : [];
   const nextPageUrl = pageData?.next;
   const previousPageUrl = pageData?.previous;
-  const pageSize = 10;
-  const totalPages = pageData ? Math.ceil(pageData.count / pageSize) : 1;
 
   useEffect(() => {
     if (status === "authenticated" && employees.length === 0) {
@@ -82,73 +79,28 @@ export default function EmployeeList() {
   }, [dispatch, status, departmentListLoading, departmentListError, list.length]);
 
   const handlePreviousPage = useCallback(() => {
-    if (previousPageUrl && !employeeListLoading && !departmentListLoading) {
-      const prevPageNumber =
-        new URL(previousPageUrl, window.location.origin).searchParams.get(
-          "page"
-        ) || "1";
-
-      if (!pages[filterKey]?.[prevPageNumber]) {
-        if (status === "authenticated") {
-          dispatch(
-            fetchEmployees({
-              pageUrl: previousPageUrl,
-              department,
-              search: searchTerm,
-              component: "employeeList"
-            })
-          );
-        }
-      } else {
-        if (status === "authenticated") {
-          dispatch(setCurrentPage({ [filterKey]: prevPageNumber }));
-        }
-      }
+    if (previousPageUrl && !employeeListLoading && !departmentListLoading && status === "authenticated") {
+      dispatch(fetchEmployees({
+        pageUrl: previousPageUrl,
+        department,
+        search: searchTerm,
+        component: "employeeList",
+        direction: "previous"
+      }));
     }
-  }, [
-    status,
-    previousPageUrl,
-    employeeListLoading,
-    dispatch,
-    pages,
-    department,
-    searchTerm,
-    filterKey,
-  ]);
-
+  }, [status, previousPageUrl, employeeListLoading, departmentListLoading, dispatch, department, searchTerm]);
 
   const handleNextPage = useCallback(() => {
-    if (nextPageUrl && !employeeListLoading && !departmentListLoading) {
-      const nextPageNumber =
-        new URL(nextPageUrl, window.location.origin).searchParams.get("page") ||
-        "1";
-      if (!pages[filterKey]?.[nextPageNumber]) {
-        if (status === "authenticated") {
-          dispatch(
-            fetchEmployees({
-              pageUrl: nextPageUrl,
-              department,
-              search: searchTerm,
-              component: "employeeList"
-            })
-          );
-        }
-      } else {
-        if (status === "authenticated") {
-          dispatch(setCurrentPage({ [filterKey]: nextPageNumber }));
-        }
-      }
+    if (nextPageUrl && !employeeListLoading && !departmentListLoading && status === "authenticated") {
+      dispatch(fetchEmployees({
+        pageUrl: nextPageUrl,
+        department,
+        search: searchTerm,
+        component: "employeeList",
+        direction: "next"
+      }));
     }
-  }, [
-    status,
-    nextPageUrl,
-    employeeListLoading,
-    dispatch,
-    pages,
-    department,
-    searchTerm,
-    filterKey,
-  ]);
+  }, [status, nextPageUrl, employeeListLoading, departmentListLoading, dispatch, department, searchTerm]);
 
   const handleSearch = useCallback(() => {
     if (searchInputRef.current) {
@@ -374,7 +326,7 @@ export default function EmployeeList() {
           Previous
         </Button>
         <span>
-          Page {currentPageNumber} of {totalPages}
+          Page {currentPageNumber}
         </span>
         <Button onClick={handleNextPage} disabled={!nextPageUrl}>
           Next
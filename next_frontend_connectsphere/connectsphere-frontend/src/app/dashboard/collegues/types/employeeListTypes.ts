@@ -10,23 +10,24 @@ export interface Employee {
   department__name: string | null;
 }
 
+// list_employee pages with a cursor: next / previous are links carrying an
+// opaque ?cursor=, and there is no total count.
 export interface EmployeeResponse {
   results: Employee[];
   next: string | null;
   previous: string | null;
-  count: number;
 }
 
 export interface PageData {
   results: Employee[];
   next: string | null;
   previous: string | null;
-  count: number;
 }
 
 export interface EmployeeState {
-  pages: { [key: string]: { [page: string]: PageData } };
-  currentPage: { [key: string]: string };
+  // The page currently shown for each filter, and its position (from 1).
+  pages: { [key: string]: PageData };
+  currentPage: { [key: string]: number };
   loading: boolean;
   error: string | null;
 }
@@ -36,6 +37,7 @@ export interface FetchEmployeeParams {
   department: string;
   search: string;
   component: string;
+  direction?: "next" | "previous";
 }
 
 export const getFilterKey = (component: string, department: string, search: string) => {
@@ -32,10 +32,11 @@ export const fetchMessages = createAsyncThunk<
         cursor = url.searchParams.get('cursor') || 'initial';
       }
 
-      let url = pageUrl;
-      if (!url) {
-        url = `/api/chat/messages/?room_id=${roomId}`;
-      }
+      // The room goes with every page, not just the first: the backend
+      // needs it to find the room's messages shard.
+      const params = new URLSearchParams({ room_id: roomId });
+      if (cursor !== 'initial') params.set('cursor', cursor);
+      const url = `/api/chat/messages/?${params.toString()}`;
 
       const response = await axios.get<MessageResponse>(url);
 
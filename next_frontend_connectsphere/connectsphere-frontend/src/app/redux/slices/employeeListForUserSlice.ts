@@ -9,8 +9,6 @@ import {
 } from "@/app/dashboard/collegues/types/employeeListTypes";
 import { RootState } from "@/app/redux/store";
 
-const MAX_PAGES = 10;
-
 const initialState: EmployeeState = {
   pages: {},
   currentPage: {},
@@ -19,29 +17,22 @@ const initialState: EmployeeState = {
 };
 
 export const fetchEmployees = createAsyncThunk<
-  { filterKey: string; page: string; data: PageData },
+  { filterKey: string; pageNumber: number; data: PageData },
   FetchEmployeeParams,
   { rejectValue: string; state: RootState }
 >(
   "employees/fetch",
-  async ({ pageUrl, department, search, component }, { getState, rejectWithValue }) => {
+  async ({ pageUrl, department, search, component, direction }, { getState, rejectWithValue }) => {
     try {
       const state = getState().employees;
       const filterKey = getFilterKey(department, search, component);
-      const page = pageUrl
-        ? new URL(pageUrl, window.location.origin).searchParams.get("page") || "1"
-        : "1";
-
-      if (state.pages[filterKey]?.[page]) {
-        return {
-          filterKey,
-          page,
-          data: state.pages[filterKey][page],
-        };
-      }
+      // Follow the backend's next / previous link by passing its cursor on.
+      const cursor = pageUrl
+        ? new URL(pageUrl, window.location.origin).searchParams.get("cursor")
+        : null;
 
       const params = new URLSearchParams();
-      params.set("page", page);
+      if (cursor) params.set("cursor", cursor);
       if (department) params.set("department", department);
       if (search) params.set("search", search);
 
@@ -53,13 +44,14 @@ export const fetchEmployees = createAsyncThunk<
         results: response.data.results,
         next: response.data.next,
         previous: response.data.previous,
-        count: response.data.count,
-      };
-      return {
-        filterKey,
-        page: params.get("page") || "1",
-        data,
       };
+
+      const currentPageNumber = state.currentPage[filterKey] || 1;
+      let pageNumber = 1;
+      if (cursor && direction === "next") pageNumber = currentPageNumber + 1;
+      if (cursor && direction === "previous") pageNumber = Math.max(1, currentPageNumber - 1);
+
+      return { filterKey, pageNumber, data };
     } catch (error) {
       if (axios.isAxiosError(error)) {
         const message =
@@ -99,9 +91,6 @@ const employeeListForUserSlice = createSlice({
         state.currentPage = {};
       }
     },
-    setCurrentPage: (state, action: PayloadAction<Record<string, string>>) => {
-      state.currentPage = { ...state.currentPage, ...action.payload };
-    },
   },
   extraReducers: (builder) => {
     builder
@@ -111,30 +100,9 @@ const employeeListForUserSlice = createSlice({
       })
       .addCase(fetchEmployees.fulfilled, (state, action) => {
         state.loading = false;
-        const { filterKey, page, data } = action.payload;
-        if (!state.pages[filterKey]) {
-          state.pages[filterKey] = {};
-          state.currentPage[filterKey] = "1";
-        }
-
-        state.pages[filterKey][page] = data;
-        state.currentPage[filterKey] = page;
-
-        const cachedPageKeys = Object.keys(state.pages[filterKey])
-          .map(Number)
-          .sort((a, b) => a - b);
-
-        // If there are too many pages, find candidates that are not the current page.
-        const currentPageNumber = Number(state.currentPage[filterKey]);
-        const pagesToEvict = cachedPageKeys.filter((pageNum) => pageNum !== currentPageNumber);
-
-        // Evict the oldest candidate until the number of cached pages is at most MAX_PAGES.
-        while (Object.keys(state.pages[filterKey]).length > MAX_PAGES && pagesToEvict.length > 0) {
-          const oldestPage = pagesToEvict.shift()?.toString();
-          if (oldestPage) {
-            delete state.pages[filterKey][oldestPage];
-          }
-        }
+        const { filterKey, pageNumber, data } = action.payload;
+        state.pages[filterKey] = data;
+        state.currentPage[filterKey] = pageNumber;
       })
       .addCase(fetchEmployees.rejected, (state, action) => {
         state.loading = false;
@@ -143,5 +111,5 @@ const employeeListForUserSlice = createSlice({
   },
 });
 
-export const { resetEmployees, setCurrentPage } = employeeListForUserSlice.actions;
-export default employeeListForUserSlice.reducer;
\ No newline at end of file
+export const { resetEmployees } = employeeListForUserSlice.actions;
+export default employeeListForUserSlice.reducer;